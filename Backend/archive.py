@@ -0,0 +1,153 @@
+import hashlib
+import os
+
+from sqlalchemy.orm import Session
+
+from models import ChainEntry, ChainHead, ChainMerkleRoot, ChainSegment
+from blockchain import iter_chain_rows, load_checkpoint, rehash_columns, verify_chain
+from merkle import merkle_root
+from segments import INDEX_ENTRY, encode_frame, segment_paths
+from config import CHAIN_ARCHIVE_DIR, CHAIN_ARCHIVE_FRAME, CHAIN_ARCHIVE_KEEP_RANGES
+
+# Moves old chain blocks out of chain_entries into the vendor's segment files.
+# Only whole sealed Merkle ranges (chain_merkle_roots) that are already covered by a
+# valid checkpoint are archived, and each one is re-verified against its sealed root
+# and the previous segment's terminal hash before its rows are deleted.
+
+
+def _committed_ends(db: Session, vendor_id: int):
+    # drops whatever an interrupted run appended past the last committed segment
+    last = (
+        db.query(ChainSegment)
+        .filter(ChainSegment.vendor_id == vendor_id)
+        .order_by(ChainSegment.epoch.desc())
+        .first()
+    )
+    offset = last.offset_end if last else 0
+    index_pos = last.index_first + last.index_count if last else 0
+    seg_path, idx_path = segment_paths(vendor_id)
+    for path, size in ((seg_path, offset), (idx_path, index_pos * INDEX_ENTRY.size)):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+    return last, offset, index_pos
+
+
+def _check_range(vendor_id: int, sealed: ChainMerkleRoot, rows: list, prev: str):
+    if len(rows) != sealed.leaf_count:
+        raise ValueError(f"vendor {vendor_id} range {sealed.epoch}: {len(rows)} rows, sealed {sealed.leaf_count}")
+    ids, actions, payload_hashes, prev_hashes, hashes, created = zip(*rows)
+    if merkle_root(list(hashes)) != sealed.root:
+        raise ValueError(f"vendor {vendor_id} range {sealed.epoch}: root mismatch")
+    if prev_hashes != (prev,) + hashes[:-1]:
+        raise ValueError(f"vendor {vendor_id} range {sealed.epoch}: broken prev_hash link")
+    if rehash_columns(vendor_id, actions, payload_hashes, prev_hashes, created) != list(hashes):
+        raise ValueError(f"vendor {vendor_id} range {sealed.epoch}: block hash mismatch")
+
+
+def _append(path: str, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def archivable_ranges(db: Session, vendor_id: int, keep_ranges: int = CHAIN_ARCHIVE_KEEP_RANGES) -> list:
+    """
+    Sealed ranges that may move to the archive: not archived yet, covered by the
+    vendor's checkpoint, older than the newest `keep_ranges`, and never the head block.
+    """
+    head = db.get(ChainHead, vendor_id)
+    cp = load_checkpoint(db, vendor_id)
+    if not head or not cp or head.last_block_id is None:
+        return []
+    last = (
+        db.query(ChainSegment.epoch)
+        .filter(ChainSegment.vendor_id == vendor_id)
+        .order_by(ChainSegment.epoch.desc())
+        .first()
+    )
+    sealed = (
+        db.query(ChainMerkleRoot)
+        .filter(ChainMerkleRoot.vendor_id == vendor_id)
+        .order_by(ChainMerkleRoot.epoch.asc())
+        .all()
+    )
+    out, epoch = [], last.epoch + 1 if last else 0
+    for r in sealed[:max(len(sealed) - keep_ranges, 0)]:
+        if r.epoch < epoch:
+            continue
+        # the newest block stays live: SQLite would otherwise reuse max(id) for the next block
+        if r.epoch != epoch or r.last_block_id > cp.last_block_id or r.last_block_id >= head.last_block_id:
+            break
+        out.append(r)
+        epoch += 1
+    return out
+
+
+def archive_vendor(db: Session, vendor_id: int, keep_ranges: int = CHAIN_ARCHIVE_KEEP_RANGES) -> int:
+    """
+    Verifies the vendor chain (advancing its checkpoint and sealed ranges), then
+    archives every eligible range, one commit per range. Returns the number of
+    blocks moved; raises ValueError if the chain or a range fails verification.
+    """
+    ok, info = verify_chain(db, vendor_id)
+    if not ok:
+        raise ValueError(f"vendor {vendor_id}: chain does not verify {info}")
+    ranges = archivable_ranges(db, vendor_id, keep_ranges)
+    if not ranges:
+        return 0
+    os.makedirs(CHAIN_ARCHIVE_DIR, exist_ok=True)
+    seg_path, idx_path = segment_paths(vendor_id)
+    last, offset, index_pos = _committed_ends(db, vendor_id)
+    prev = last.terminal_hash if last else "GENESIS"
+
+    moved = 0
+    for sealed in ranges:
+        rows = [r for chunk in iter_chain_rows(db, vendor_id, sealed.first_block_id - 1, sealed.last_block_id)
+                for r in chunk]
+        _check_range(vendor_id, sealed, rows, prev)
+
+        data, index = bytearray(), bytearray()
+        for i in range(0, len(rows), CHAIN_ARCHIVE_FRAME):
+            frame = rows[i:i + CHAIN_ARCHIVE_FRAME]
+            index += INDEX_ENTRY.pack(frame[0][0], offset + len(data))
+            data += encode_frame(frame)
+        _append(seg_path, bytes(data))
+        _append(idx_path, bytes(index))
+
+        db.add(ChainSegment(
+            vendor_id=vendor_id,
+            epoch=sealed.epoch,
+            first_block_id=sealed.first_block_id,
+            last_block_id=sealed.last_block_id,
+            block_count=len(rows),
+            prev_hash=prev,
+            terminal_hash=rows[-1][4],
+            root=sealed.root,
+            offset_start=offset,
+            offset_end=offset + len(data),
+            index_first=index_pos,
+            index_count=len(index) // INDEX_ENTRY.size,
+            sha256=hashlib.sha256(data).hexdigest(),
+        ))
+        db.query(ChainEntry).filter(
+            ChainEntry.vendor_id == vendor_id,
+            ChainEntry.id >= sealed.first_block_id,
+            ChainEntry.id <= sealed.last_block_id,
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        offset += len(data)
+        index_pos += len(index) // INDEX_ENTRY.size
+        prev = rows[-1][4]
+        moved += len(rows)
+    return moved
+
+
+def archive_all(db: Session, vendor_ids=None, keep_ranges: int = CHAIN_ARCHIVE_KEEP_RANGES) -> dict:
+    """
+    vendor_id -> blocks archived, for the given vendors or every vendor with sealed ranges.
+    """
+    if vendor_ids is None:
+        vendor_ids = [v for (v,) in db.query(ChainMerkleRoot.vendor_id).distinct().order_by(ChainMerkleRoot.vendor_id)]
+    return {vid: archive_vendor(db, vid, keep_ranges) for vid in vendor_ids}
@@ -0,0 +1,65 @@
+"""
+Async counterparts of crud.py for DB_MODE=async.
+
+Reads only: native async selects. Writes go through the chain writer with the
+sync *_tx functions (routes.py), so vendor_stats bookkeeping stays in one place.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+from models import Customer, Credit, Sale, VendorStats
+
+
+async def _page(db: AsyncSession, stmt, id_col, limit: int | None, after: int | None):
+    # same keyset rules as crud._page
+    if after is not None:
+        stmt = stmt.where(id_col < after)
+    stmt = stmt.order_by(id_col.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return (await db.execute(stmt)).all()
+
+
+async def list_customers(db: AsyncSession, vendor_id: int, limit: int | None = None, after: int | None = None):
+    stmt = select(Customer.id, Customer.vendorId, Customer.name, Customer.phone, Customer.notes).where(
+        Customer.vendorId == vendor_id
+    )
+    return await _page(db, stmt, Customer.id, limit, after)
+
+
+async def list_credits(db: AsyncSession, vendor_id: int, limit: int | None = None, after: int | None = None,
+                       status: str | None = None, due_from: str | None = None, due_to: str | None = None):
+    stmt = select(
+        Credit.id, Credit.vendorId, Credit.customerId, Credit.amount, Credit.dueDate, Credit.status, Credit.paidDate
+    ).where(Credit.vendorId == vendor_id)
+    if status:
+        stmt = stmt.where(Credit.status == status)
+    if due_from:
+        stmt = stmt.where(Credit.dueDate >= due_from)
+    if due_to:
+        stmt = stmt.where(Credit.dueDate <= due_to)
+    return await _page(db, stmt, Credit.id, limit, after)
+
+
+async def list_sales(db: AsyncSession, vendor_id: int, limit: int | None = None, after: int | None = None,
+                     date_from: str | None = None, date_to: str | None = None, mode: str | None = None):
+    stmt = select(Sale.id, Sale.vendorId, Sale.date, Sale.mode, Sale.amount).where(Sale.vendorId == vendor_id)
+    if date_from:
+        stmt = stmt.where(Sale.date >= date_from)
+    if date_to:
+        stmt = stmt.where(Sale.date <= date_to)
+    if mode:
+        stmt = stmt.where(Sale.mode == mode)
+    return await _page(db, stmt, Sale.id, limit, after)
+
+
+async def kpis(db: AsyncSession, vendor_id: int):
+    st = await db.get(VendorStats, vendor_id)
+    if not st:
+        return await db.run_sync(crud.kpis, vendor_id)
+    return {
+        "totalSales": float(st.totalSales),
+        "pendingUdhaar": float(st.pendingUdhaar),
+        "recovered": float(st.recovered),
+    }
@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import zip_longest
+from typing import Iterator, List
+from sqlalchemy import text
+
+from database import SessionLocal, shard_engines, shard_sessions
+from models import VendorShard
+from config import AUDIT_WORKERS, AUDIT_CHUNK_SIZE, AUDIT_MAX_CONCURRENT
+
+# one worker pool per process, forked on the first parallel audit and shut down with the app;
+# the semaphore caps how many audits share it
+_pool = None
+_pool_lock = threading.Lock()
+audit_slots = threading.BoundedSemaphore(max(AUDIT_MAX_CONCURRENT, 1))
+
+
+def _init_worker():
+    # forked child must not reuse the parent's pooled SQLite connections
+    for eng in shard_engines:
+        eng.dispose(close=False)
+
+
+def audit_vendors(vendor_ids: List[int], full: bool = False, shard: int = 0):
+    """
+    Runs in a worker process: verifies a chunk of vendors of one shard with its own
+    session. Returns (results, blocks_checked).
+    """
+    from tamper import verify_chain_for_vendor  # lazy: tamper imports this module
+
+    db = shard_sessions[shard]()
+    try:
+        results, blocks = [], 0
+        for vid in vendor_ids:
+            r = verify_chain_for_vendor(db, vid, full=full)
+            results.append(r)
+            blocks += r.get("checked_entries", r["total_entries"])
+        return results, blocks
+    finally:
+        db.close()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=AUDIT_WORKERS, initializer=_init_worker)
+        return _pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor):
+    # a worker died: the next audit forks a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def audit_stream(full: bool = False) -> Iterator[bytes]:
+    """
+    stream_audit() for a caller that holds one of audit_slots; releases it when the
+    stream ends or is closed. Prime it with next() so the release also runs if the
+    response is dropped before its body starts.
+    """
+    try:
+        yield b""
+        yield from stream_audit(full=full)
+    finally:
+        audit_slots.release()
+
+
+def _line(obj: dict) -> bytes:
+    return (json.dumps(obj, default=str) + "\n").encode("utf-8")
+
+
+def _vendor_chunks(db, size: int, placement: dict | None = None, shard: int = 0) -> Iterator[List[int]]:
+    rows = db.execute(text("""
+        SELECT vendor_id FROM chain_entries
+        UNION
+        SELECT vendor_id FROM chain_segments
+        ORDER BY vendor_id
+    """))
+    chunk = []
+    for vid in rows.scalars():
+        # a vendor just moved away may still have rows here until the move cleans up
+        if placement is not None and placement.get(vid, 0) != shard:
+            continue
+        chunk.append(vid)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _all_chunks(size: int) -> list:
+    """
+    (shard, vendor_ids) chunks of every shard, interleaved so the pool works on all
+    shards at once.
+    """
+    placement = None
+    if len(shard_sessions) > 1:
+        db = SessionLocal()
+        try:
+            placement = dict(db.query(VendorShard.vendorId, VendorShard.shard).all())
+        finally:
+            db.close()
+    per_shard = []
+    for shard, factory in enumerate(shard_sessions):
+        db = factory()
+        try:
+            per_shard.append([(shard, c) for c in _vendor_chunks(db, size, placement, shard)])
+        finally:
+            db.close()
+    return [c for group in zip_longest(*per_shard) for c in group if c is not None]
+
+
+def stream_audit(full: bool = False, workers: int = AUDIT_WORKERS, chunk_size: int = AUDIT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    NDJSON audit of every vendor chain.
+    Lines: {"type": "result", ...} per vendor, {"type": "progress", ...} per finished chunk,
+    and one final {"type": "summary", ...} with throughput.
+    """
+    started = time.perf_counter()
+    chunks = _all_chunks(chunk_size)
+
+    total = sum(len(ids) for _, ids in chunks)
+
+    done, blocks, overall_ok = 0, 0, True
+
+    def emit(results, n_blocks):
+        nonlocal done, blocks, overall_ok
+        done += len(results)
+        blocks += n_blocks
+        for r in results:
+            if not r["is_valid"]:
+                overall_ok = False
+            yield _line({"type": "result", **r})
+        yield _line({"type": "progress", "vendors_done": done, "vendors_total": total})
+
+    if workers <= 1 or len(chunks) <= 1:
+        for shard, ids in chunks:
+            yield from emit(*audit_vendors(ids, full, shard))
+    else:
+        pool = _get_pool()
+        pending = set()
+        try:
+            queue = iter(chunks)
+            # keep at most 2 chunks per worker in flight -> bounded memory
+            for shard, ids in queue:
+                pending.add(pool.submit(audit_vendors, ids, full, shard))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    yield from emit(*fut.result())
+                    nxt = next(queue, None)
+                    if nxt is not None:
+                        pending.add(pool.submit(audit_vendors, nxt[1], full, nxt[0]))
+        except BrokenProcessPool:
+            _drop_pool(pool)
+            raise
+        finally:
+            # client disconnect -> drop this audit's queued chunks instead of finishing them
+            for fut in pending:
+                fut.cancel()
+
+    elapsed = time.perf_counter() - started
+    yield _line({
+        "type": "summary",
+        "overall_valid": overall_ok,
+        "vendors_checked": done,
+        "blocks_checked": blocks,
+        "elapsed_sec": round(elapsed, 3),
+        "blocks_per_sec": round(blocks / elapsed, 1) if elapsed > 0 else None,
+    })
@@ -1,48 +1,179 @@
+import asyncio
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from config import SECRET_KEY, ALGORITHM, TOKEN_EXPIRE_DAYS
-from database import get_db
+from config import (
+    SECRET_KEY, ALGORITHM, TOKEN_EXPIRE_DAYS,
+    AUTH_CACHE_TTL, AUTH_CACHE_SIZE, BCRYPT_WORKERS, BCRYPT_MAX_PENDING, LENDER_API_KEYS
+)
+from database import get_db, get_async_db
 from models import Vendor
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 bearer = HTTPBearer(auto_error=False)
+lender_key = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 DEMO_VENDOR_ID = 1  # demo vendor fix id (optional)
 
+# bcrypt (~250 ms) runs here, not on Starlette's shared threadpool
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_pending = 0
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
+async def _run_bcrypt(fn, *args):
+    global _bcrypt_pending
+    if _bcrypt_pending >= BCRYPT_MAX_PENDING:
+        raise HTTPException(status_code=503, detail="Too many login requests, retry shortly")
+    _bcrypt_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, fn, *args)
+    finally:
+        _bcrypt_pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bcrypt(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _run_bcrypt(verify_password, password, hashed)
+
 def create_token(vendor_id: int) -> str:
     exp = datetime.utcnow() + timedelta(days=TOKEN_EXPIRE_DAYS)
     payload = {"sub": str(vendor_id), "exp": exp}
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_vendor(
-    creds: HTTPAuthorizationCredentials = Depends(bearer),
-    db: Session = Depends(get_db)
-) -> Vendor:
+@dataclass(frozen=True)
+class VendorPrincipal:
+    """
+    Detached, read-only view of the logged-in vendor. Load the ORM Vendor
+    (db.get(Vendor, v.id)) when a route needs to modify it.
+    """
+    id: int
+    ownerName: str
+    mobile: str
+    businessType: str
+    city: str
+    upi: Optional[str] = None
+    profilePhotoUrl: Optional[str] = None
+
+    @classmethod
+    def from_vendor(cls, v: Vendor) -> "VendorPrincipal":
+        return cls(
+            id=v.id, ownerName=v.ownerName, mobile=v.mobile, businessType=v.businessType,
+            city=v.city, upi=v.upi, profilePhotoUrl=v.profilePhotoUrl
+        )
+
+class PrincipalCache:
+    """
+    TTL + LRU cache of VendorPrincipal keyed by vendor id (token sub).
+    """
+
+    def __init__(self, ttl: int = AUTH_CACHE_TTL, maxsize: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, vendor_id: int) -> Optional[VendorPrincipal]:
+        with self._lock:
+            item = self._data.get(vendor_id)
+            if not item:
+                return None
+            principal, expires = item
+            if expires < time.monotonic():
+                del self._data[vendor_id]
+                return None
+            self._data.move_to_end(vendor_id)
+            return principal
+
+    def put(self, principal: VendorPrincipal):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._data.move_to_end(principal.id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, vendor_id: int):
+        with self._lock:
+            self._data.pop(vendor_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+principal_cache = PrincipalCache()
+
+def _invalidate_vendor(mapper, connection, target):
+    principal_cache.invalidate(target.id)
+
+# any vendor write (profile photo, future profile edits) drops the cached principal
+event.listen(Vendor, "after_update", _invalidate_vendor)
+event.listen(Vendor, "after_delete", _invalidate_vendor)
+
+def _token_vendor_id(creds: Optional[HTTPAuthorizationCredentials]) -> int:
     if not creds or not creds.credentials:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     token = creds.credentials
     try:
         data = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        vendor_id = int(data.get("sub"))
-    except (JWTError, ValueError):
+        return int(data.get("sub"))
+    except (JWTError, ValueError, TypeError):
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    vendor = db.query(Vendor).filter(Vendor.id == vendor_id).first()
+def _principal_for(vendor: Optional[Vendor]) -> VendorPrincipal:
     if not vendor:
         raise HTTPException(status_code=401, detail="User not found")
-    return vendor
+    principal = VendorPrincipal.from_vendor(vendor)
+    principal_cache.put(principal)
+    return principal
+
+def get_current_vendor(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db: Session = Depends(get_db)
+) -> VendorPrincipal:
+    vendor_id = _token_vendor_id(creds)
+    principal = principal_cache.get(vendor_id)
+    if principal:
+        return principal
+    return _principal_for(db.query(Vendor).filter(Vendor.id == vendor_id).first())
+
+async def get_current_vendor_async(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db=Depends(get_async_db)
+) -> VendorPrincipal:
+    vendor_id = _token_vendor_id(creds)
+    principal = principal_cache.get(vendor_id)
+    if principal:
+        return principal
+    return _principal_for(await db.get(Vendor, vendor_id))
+
+def require_lender(key: Optional[str] = Depends(lender_key)):
+    """
+    Portfolio (all-vendor) endpoints: a configured lender key, never a vendor token.
+    """
+    if not LENDER_API_KEYS:
+        raise HTTPException(status_code=403, detail="Portfolio API is disabled, set LENDER_API_KEYS")
+    if not key or not any(hmac.compare_digest(key.encode(), k.encode()) for k in LENDER_API_KEYS):
+        raise HTTPException(status_code=401, detail="Invalid API key")
 
 def auth_response(vendor: Vendor):
     """
@@ -55,4 +186,4 @@ def auth_response(vendor: Vendor):
         "vendor_id": vendor.id,
         "ownerName": getattr(vendor, "ownerName", None) or getattr(vendor, "owner_name", None),
         "mobile": getattr(vendor, "mobile", None),
-    }
\ No newline at end of file
+    }
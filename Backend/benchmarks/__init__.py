@@ -0,0 +1,7 @@
+"""
+Stand-alone benchmarks, run from the Backend folder:
+
+    python -m benchmarks.run --out bench.json           # seed + API + micro-benchmarks
+    python -m benchmarks.compare base.json bench.json   # diff two runs
+    python -m benchmarks.write_throughput               # SQLite storage profiles
+"""
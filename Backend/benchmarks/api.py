@@ -0,0 +1,62 @@
+"""
+Endpoint latency/throughput through an in-process ASGI client (no network, no server).
+"""
+import asyncio
+import itertools
+import time
+
+import httpx
+
+from benchmarks.common import latency_summary
+
+ENDPOINTS = [
+    ("POST", "/sales"),
+    ("GET", "/kpis"),
+    ("GET", "/trustscore"),
+    ("GET", "/chain/verify/me"),
+    ("GET", "/chain/verify/me?full=true"),
+    ("GET", "/chain/verify"),
+]
+
+
+async def _measure(client: httpx.AsyncClient, method: str, path: str, tokens: list,
+                   requests: int, concurrency: int) -> dict:
+    token_cycle = itertools.cycle(tokens)
+    sem = asyncio.Semaphore(concurrency)
+    samples, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        headers = {"Authorization": f"Bearer {next(token_cycle)}"}
+        body = {"date": "2024-06-01", "mode": "cash", "amount": 10 + i % 90} if method == "POST" else None
+        async with sem:
+            t = time.perf_counter()
+            r = await client.request(method, path, headers=headers, json=body)
+            await r.aread()
+            samples.append(time.perf_counter() - t)
+            if r.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    out = {"endpoint": f"{method} {path}", "concurrency": concurrency, "errors": errors}
+    out.update(latency_summary(samples, time.perf_counter() - started))
+    return out
+
+
+async def _run(app, tokens: list, requests: int, concurrency: int, global_requests: int) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = []
+        for method, path in ENDPOINTS:
+            # the all-vendor audit is far heavier than a single request, run it fewer times
+            n = global_requests if path == "/chain/verify" else requests
+            await _measure(client, method, path, tokens, min(n, concurrency), concurrency)  # warm-up
+            results.append(await _measure(client, method, path, tokens, n, concurrency))
+        return results
+
+
+def bench_api(tokens: list, requests: int = 200, concurrency: int = 8, global_requests: int = 5) -> list:
+    from main import app  # imported late: DATABASE_URL must point at the bench database first
+
+    return asyncio.run(_run(app, tokens, requests, concurrency, global_requests))
@@ -0,0 +1,133 @@
+"""
+chain_entries in text (hex / ISO) and binary (32-byte BLOB / integer microsecond)
+storage: table and index size from SQLite's dbstat, full verify_chain time and
+hash-index point lookups on the same blocks, migrated from one form to the other.
+
+    python -m benchmarks.chain_storage --vendors 10 --blocks 5000 --out chain_storage.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+TABLES = ("chain_entries", "ix_chain_entries_hash", "ix_chain_entries_vendor_id")
+
+
+def _seed_chain(vendors: int, blocks: int) -> list:
+    from benchmarks.seed import seed
+    from database import SessionLocal
+    from blockchain import add_block
+
+    vendor_ids = seed(vendors, 0, 0, 0)["vendor_ids"]
+    db = SessionLocal()
+    try:
+        for vid in vendor_ids:
+            for i in range(blocks):
+                add_block(db, vid, "ADD_SALE", {"vendorId": vid, "id": i, "amount": i % 997, "mode": "cash"})
+            db.commit()
+    finally:
+        db.close()
+    return vendor_ids
+
+
+def _sizes(conn) -> dict:
+    from sqlalchemy import text
+
+    names = ", ".join(f"'{t}'" for t in TABLES)
+    rows = conn.execute(text(
+        f"SELECT name, SUM(pgsize), SUM(payload) FROM dbstat WHERE name IN ({names}) GROUP BY name"
+    )).all()
+    return {name: {"bytes": pages, "payload_bytes": payload} for name, pages, payload in rows}
+
+
+def _median(samples: list) -> float:
+    return sorted(samples)[len(samples) // 2]
+
+
+def measure(mode: str, vendor_ids: list, repeat: int, lookups: int) -> dict:
+    from sqlalchemy import text
+    from database import engine, SessionLocal
+    from blockchain import verify_chain
+    from chain_storage import digest_to_db, migrate_chain_storage
+
+    converted = migrate_chain_storage(engine, mode)
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        sizes = _sizes(conn)
+        rows = conn.execute(text("SELECT COUNT(*) FROM chain_entries")).scalar()
+        hashes = [h for (h,) in conn.execute(text(f"SELECT hash FROM chain_entries ORDER BY id LIMIT {lookups}"))]
+
+    db = SessionLocal()
+    try:
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            for vid in vendor_ids:
+                ok, _ = verify_chain(db, vid, full=True)
+                assert ok, vid
+            samples.append(time.perf_counter() - t)
+
+        # lookups bind the stored representation directly, whatever CHAIN_STORAGE says
+        lookup = text("SELECT id FROM chain_entries WHERE hash = :h")
+        binary = mode == "binary"
+        keys = [digest_to_db(h if isinstance(h, str) else h.hex(), binary) for h in hashes]
+        t = time.perf_counter()
+        for k in keys:
+            assert db.execute(lookup, {"h": k}).scalar()
+        lookup_sec = time.perf_counter() - t
+    finally:
+        db.close()
+
+    verify = _median(samples)
+    table = sizes.get("chain_entries", {})
+    return {
+        "storage": mode,
+        "rows_converted": converted,
+        "rows": rows,
+        "sizes": sizes,
+        "table_bytes_per_row": round(table.get("bytes", 0) / rows, 1) if rows else None,
+        "payload_bytes_per_row": round(table.get("payload_bytes", 0) / rows, 1) if rows else None,
+        "index_bytes": sum(v["bytes"] for k, v in sizes.items() if k != "chain_entries"),
+        "verify_full_ms": round(verify * 1000, 2),
+        "verify_blocks_per_sec": round(rows / verify, 1) if verify > 0 else None,
+        "hash_lookup_us": round(lookup_sec / len(keys) * 1e6, 2) if keys else None,
+    }
+
+
+def bench_chain_storage(vendor_ids: list, repeat: int = 3, lookups: int = 2000) -> list:
+    return [measure(mode, vendor_ids, repeat, lookups) for mode in ("text", "binary")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="chain_entries text vs binary storage")
+    parser.add_argument("--vendors", type=int, default=10)
+    parser.add_argument("--blocks", type=int, default=5000, help="per vendor")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="trustchain_storage_"), "storage.db")
+    # must be set before anything imports config/database
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(os.path.dirname(path), "uploads"))
+
+    from database import engine, Base
+    import models  # noqa: F401  (registers tables on Base)
+    from benchmarks.common import run_meta, write_json
+
+    Base.metadata.create_all(bind=engine)
+    vendor_ids = _seed_chain(args.vendors, args.blocks)
+    results = bench_chain_storage(vendor_ids, args.repeat, args.lookups)
+    for r in results:
+        print(f"{r['storage']:<7} table {r['sizes']['chain_entries']['bytes']:>10} B ({r['table_bytes_per_row']} B/row)"
+              f"  indexes {r['index_bytes']:>10} B  verify {r['verify_full_ms']:>9} ms"
+              f"  lookup {r['hash_lookup_us']} us", file=sys.stderr)
+    if args.out:
+        write_json(args.out, {"meta": run_meta(vars(args)), "chain_storage": results})
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
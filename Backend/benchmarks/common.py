@@ -0,0 +1,55 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+
+def percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def latency_summary(samples_sec: list, elapsed_sec: float) -> dict:
+    """
+    Per-request latencies (seconds) + wall time -> p50/p99/mean/max in ms and requests/sec.
+    """
+    ms = sorted(s * 1000 for s in samples_sec)
+    return {
+        "requests": len(ms),
+        "p50_ms": round(percentile(ms, 0.50), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 0.99), 3) if ms else None,
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "max_ms": round(ms[-1], 3) if ms else None,
+        "elapsed_sec": round(elapsed_sec, 3),
+        "rps": round(len(ms) / elapsed_sec, 1) if elapsed_sec > 0 else None,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_meta(params: dict) -> dict:
+    return {
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+    }
+
+
+def write_json(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,59 @@
+"""
+Diff two benchmark JSON files (python -m benchmarks.compare base.json new.json).
+Latency rows are marked when they got slower than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _index(report: dict) -> dict:
+    rows = {}
+    for r in report.get("api", []):
+        rows[f"api  {r['endpoint']}"] = ("p99_ms", r.get("p99_ms"))
+    for r in report.get("micro", []):
+        rows[f"micro {r['name']}"] = ("median_ms", r.get("median_ms"))
+    for r in report.get("serialization", []):
+        rows[f"ser  {r['name']}"] = ("median_ms", r.get("median_ms"))
+    return rows
+
+
+def _pct(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"base {base['meta'].get('commit')}  ->  new {new['meta'].get('commit')}")
+    old_rows, new_rows = _index(base), _index(new)
+    regressions = 0
+    for key in sorted(set(old_rows) | set(new_rows)):
+        if key not in old_rows or key not in new_rows:
+            print(f"  {key:<44} only in {'base' if key in old_rows else 'new'}")
+            continue
+        metric, old = old_rows[key]
+        _, cur = new_rows[key]
+        change = _pct(old, cur)
+        flag = ""
+        if change is not None and change > args.threshold:
+            flag = "  <-- slower"
+            regressions += 1
+        shown = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"  {key:<44} {metric} {old} -> {cur} ({shown}){flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
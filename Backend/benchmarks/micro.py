@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks for the hashing, chain verification and scoring hot paths.
+"""
+import time
+from datetime import datetime
+
+from database import SessionLocal
+from blockchain import sha256, block_raw, rehash_columns, iter_chain_columns, verify_chain
+from models import ChainEntry, Vendor
+from trustscore import compute_trust_score
+
+
+def _timed(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return sorted(samples)
+
+
+def _result(name: str, samples: list, ops_per_call: int = 1) -> dict:
+    best, median = samples[0], samples[len(samples) // 2]
+    return {
+        "name": name,
+        "calls": len(samples),
+        "ops_per_call": ops_per_call,
+        "best_ms": round(best * 1000, 4),
+        "median_ms": round(median * 1000, 4),
+        "ops_per_sec": round(ops_per_call / median, 1) if median > 0 else None,
+    }
+
+
+def bench_sha256(n: int = 100_000, repeat: int = 5) -> dict:
+    ts = datetime(2024, 1, 1, 12, 0, 0)
+    raws = [block_raw(1, "ADD_SALE", "a" * 64, "b" * 64, ts) + str(i) for i in range(n)]
+
+    def run():
+        for r in raws:
+            sha256(r)
+    return _result("sha256(block_raw)", _timed(run, repeat), n)
+
+
+def bench_rehash(vendor_id: int, repeat: int = 5) -> dict:
+    db = SessionLocal()
+    try:
+        chunks = [(cols[1], cols[2], cols[3], cols[5]) for cols in iter_chain_columns(db, vendor_id)]
+    finally:
+        db.close()
+    blocks = sum(len(c[0]) for c in chunks)
+
+    def run():
+        for actions, payload_hashes, prev_hashes, created in chunks:
+            rehash_columns(vendor_id, actions, payload_hashes, prev_hashes, created)
+    return _result("rehash_columns", _timed(run, repeat), blocks)
+
+
+def bench_verify_chain(vendor_id: int, repeat: int = 5) -> list:
+    db = SessionLocal()
+    try:
+        blocks = db.query(ChainEntry).filter(ChainEntry.vendor_id == vendor_id).count()
+        full = _timed(lambda: verify_chain(db, vendor_id, full=True), repeat)
+        incremental = _timed(lambda: verify_chain(db, vendor_id), repeat)
+    finally:
+        db.close()
+    return [
+        _result("verify_chain(full=True)", full, blocks),
+        _result("verify_chain(checkpoint)", incremental, 1),
+    ]
+
+
+def bench_trust_score(vendor_ids: list, repeat: int = 200) -> dict:
+    db = SessionLocal()
+    try:
+        vendors = db.query(Vendor.id, Vendor.businessType).filter(Vendor.id.in_(vendor_ids)).all()
+        state = {"i": 0}
+
+        def run():
+            vid, btype = vendors[state["i"] % len(vendors)]
+            state["i"] += 1
+            compute_trust_score(db, vid, btype)
+        return _result("compute_trust_score", _timed(run, repeat))
+    finally:
+        db.close()
+
+
+def bench_micro(vendor_ids: list) -> list:
+    sample = vendor_ids[0]
+    return [
+        bench_sha256(),
+        bench_rehash(sample),
+        *bench_verify_chain(sample),
+        bench_trust_score(vendor_ids),
+    ]
@@ -0,0 +1,73 @@
+"""
+Full benchmark run: seed a fresh database, measure the API and the hot paths,
+write everything to one JSON file.
+
+    python -m benchmarks.run --vendors 20 --customers 20 --credits 50 --sales 100 --out bench.json
+    python -m benchmarks.compare old.json bench.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TrustChain benchmark suite")
+    parser.add_argument("--vendors", type=int, default=20)
+    parser.add_argument("--customers", type=int, default=20, help="per vendor")
+    parser.add_argument("--credits", type=int, default=50, help="per vendor")
+    parser.add_argument("--sales", type=int, default=100, help="per vendor")
+    parser.add_argument("--requests", type=int, default=200, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--global-requests", type=int, default=5, help="GET /chain/verify calls")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default=None, help="SQLite file to create (default: temp dir)")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--out", default="bench.json")
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="trustchain_bench_"), "bench.db")
+    if os.path.exists(path):
+        parser.error(f"{path} already exists, the suite needs an empty database")
+    # must be set before anything imports config/database
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(os.path.dirname(path), "uploads"))
+
+    from database import engine, Base
+    import models  # noqa: F401  (registers tables on Base)
+    from benchmarks.common import run_meta, write_json
+    from benchmarks.seed import seed
+
+    Base.metadata.create_all(bind=engine)
+    params = {k: v for k, v in vars(args).items() if k not in ("out", "skip_api", "skip_micro")}
+    report = {"meta": run_meta(params)}
+
+    seeded = seed(args.vendors, args.customers, args.credits, args.sales, args.seed)
+    report["seed"] = {"vendors": len(seeded["vendor_ids"]), "elapsed_sec": seeded["elapsed_sec"]}
+    print(f"seeded {args.vendors} vendors in {seeded['elapsed_sec']} s", file=sys.stderr)
+
+    if not args.skip_micro:
+        from benchmarks.micro import bench_micro
+        report["micro"] = bench_micro(seeded["vendor_ids"])
+        for r in report["micro"]:
+            print(f"{r['name']:<28} median {r['median_ms']:>10} ms  {r['ops_per_sec']} ops/s", file=sys.stderr)
+        from benchmarks.serialization import bench_serialization
+        report["serialization"] = bench_serialization()
+        for r in report["serialization"]:
+            print(f"{r['name']:<28} median {r['median_ms']:>10} ms  {r['mb_per_sec']} MB/s", file=sys.stderr)
+
+    if not args.skip_api:
+        from benchmarks.api import bench_api
+        report["api"] = bench_api(seeded["tokens"], args.requests, args.concurrency, args.global_requests)
+        for r in report["api"]:
+            print(f"{r['endpoint']:<34} p50 {r['p50_ms']:>9} ms  p99 {r['p99_ms']:>9} ms  {r['rps']} req/s"
+                  f"{'  errors=' + str(r['errors']) if r['errors'] else ''}", file=sys.stderr)
+
+    write_json(args.out, report)
+    print(f"results -> {args.out}", file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,72 @@
+"""
+Deterministic data set for the benchmarks: N vendors, each with M customers,
+credits and sales, written through the same crud + add_block code as the API
+(one chain block per record).
+"""
+import random
+import time
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from auth import hash_password, create_token
+from crud import create_vendor
+from blockchain import add_block
+from schemas import SignupRequest, CustomerCreate, CreditCreate, SaleCreate
+from routes import add_customer_tx, add_credit_tx, pay_credit_tx, add_sale_tx
+from trustscore import DEFAULT_POLICIES
+
+BENCH_PASSWORD = "bench-pass"
+
+
+def seed_vendor(db: Session, n: int, customers: int, credits: int, sales: int, password_hash: str, rnd: random.Random) -> int:
+    v = create_vendor(db, SignupRequest(
+        ownerName=f"Bench Vendor {n}",
+        mobile=f"8{n:09d}",
+        businessType=rnd.choice(list(DEFAULT_POLICIES)),
+        city="Bench",
+        password=BENCH_PASSWORD,
+    ), password_hash)
+    add_block(db, v.id, "SIGNUP", {"mobile": v.mobile, "ownerName": v.ownerName,
+                                   "businessType": v.businessType, "city": v.city, "upi": v.upi})
+
+    customer_ids = [
+        add_customer_tx(db, v.id, CustomerCreate(name=f"Customer {i}", phone=f"7{i:09d}"))["id"]
+        for i in range(customers)
+    ]
+    for i in range(credits if customer_ids else 0):
+        cr = add_credit_tx(db, v.id, CreditCreate(
+            customerId=rnd.choice(customer_ids), amount=round(rnd.uniform(50, 5000), 2),
+            dueDate=f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        ))
+        if rnd.random() < 0.6:
+            pay_credit_tx(db, v.id, cr["id"])
+    for i in range(sales):
+        add_sale_tx(db, v.id, SaleCreate(
+            date=f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            mode=rnd.choice(["cash", "upi"]), amount=round(rnd.uniform(20, 2000), 2)
+        ))
+    return v.id
+
+
+def seed(vendors: int, customers: int, credits: int, sales: int, random_seed: int = 42) -> dict:
+    """
+    Returns {"vendor_ids", "tokens", "elapsed_sec"}; one commit per vendor.
+    """
+    rnd = random.Random(random_seed)
+    password_hash = hash_password(BENCH_PASSWORD)  # bcrypt once, not per vendor
+    started = time.perf_counter()
+    vendor_ids = []
+    db = SessionLocal()
+    try:
+        for n in range(vendors):
+            vendor_ids.append(seed_vendor(db, n, customers, credits, sales, password_hash, rnd))
+            db.commit()
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "vendor_ids": vendor_ids,
+        "tokens": [create_token(vid) for vid in vendor_ids],
+        "elapsed_sec": round(elapsed, 3),
+    }
@@ -0,0 +1,102 @@
+"""
+Response encoding throughput for a large /sales page: the response_model path
+(dicts -> Pydantic validation -> jsonable_encoder -> json) against the direct
+row -> bytes path (orjson, MessagePack when installed).
+
+    python -m benchmarks.serialization --rows 50000 --out serialization.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import namedtuple
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import serialization
+from schemas import SaleOut
+from serialization import rows_to_records
+
+# same shape (._fields / ._asdict) as the Row tuples of the column-only list queries
+SaleRow = namedtuple("SaleRow", "id vendorId date mode amount")
+
+
+def make_rows(n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    return [
+        SaleRow(i, 1, f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                rnd.choice(("cash", "upi")), round(rnd.uniform(10, 5000), 2))
+        for i in range(n, 0, -1)
+    ]
+
+
+def _stdlib_json(data) -> bytes:
+    # what JSONResponse.render does
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def encoders() -> dict:
+    adapter = TypeAdapter(list[SaleOut])
+
+    def response_model(rows):
+        # pre-fast-path route: _asdict per row, validated against the response_model, re-encoded
+        validated = adapter.validate_python([r._asdict() for r in rows])
+        return _stdlib_json(jsonable_encoder(adapter.dump_python(validated)))
+
+    paths = {
+        "response_model+json": response_model,
+        "dicts+jsonable_encoder+json": lambda rows: _stdlib_json(jsonable_encoder([r._asdict() for r in rows])),
+        "rows+json": lambda rows: _stdlib_json(rows_to_records(rows)),
+    }
+    if serialization.orjson is not None:
+        paths["rows+orjson"] = lambda rows: serialization.dumps_json(rows_to_records(rows))
+    if serialization.msgpack is not None:
+        paths["rows+msgpack"] = lambda rows: serialization.dumps_msgpack(rows_to_records(rows))
+    return paths
+
+
+def bench_serialization(rows: int = 50_000, repeat: int = 5) -> list:
+    data = make_rows(rows)
+    out = []
+    for name, fn in encoders().items():
+        samples, size = [], 0
+        for _ in range(repeat):
+            t = time.perf_counter()
+            size = len(fn(data))
+            samples.append(time.perf_counter() - t)
+        median = sorted(samples)[len(samples) // 2]
+        out.append({
+            "name": name,
+            "rows": rows,
+            "bytes": size,
+            "median_ms": round(median * 1000, 3),
+            "rows_per_sec": round(rows / median, 1) if median > 0 else None,
+            "mb_per_sec": round(size / median / 1e6, 2) if median > 0 else None,
+        })
+    base = out[0]["median_ms"]
+    for r in out:
+        r["speedup"] = round(base / r["median_ms"], 2) if r["median_ms"] else None
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Response serialization benchmark")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args(argv)
+
+    from benchmarks.common import run_meta, write_json
+    results = bench_serialization(args.rows, args.repeat)
+    for r in results:
+        print(f"{r['name']:<30} {r['median_ms']:>9} ms  {r['mb_per_sec']:>7} MB/s  {r['bytes']:>9} B  x{r['speedup']}",
+              file=sys.stderr)
+    if args.out:
+        write_json(args.out, {"meta": run_meta(vars(args)), "serialization": results})
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
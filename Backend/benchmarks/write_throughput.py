@@ -0,0 +1,109 @@
+"""
+Write throughput per SQLite storage profile.
+
+Every profile gets a fresh database file; N threads each commit M single-sale
+transactions through POST /sales's own transaction (routes.add_sale_tx: sale +
+vendor_stats bump + chain block, one commit). Prints one JSON object per profile.
+
+    python -m benchmarks.write_throughput --threads 8 --writes 200
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, build_engine
+from benchmarks.common import percentile
+from models import Vendor, VendorStats
+from schemas import SaleCreate
+from routes import add_sale_tx
+
+def _seed(Session, vendors: int) -> list:
+    db = Session()
+    try:
+        ids = []
+        for i in range(vendors):
+            v = Vendor(ownerName=f"bench{i}", mobile=f"90000{i:05d}", passwordHash="x", businessType="Other", city="X")
+            db.add(v)
+            db.flush()
+            db.add(VendorStats(vendorId=v.id))
+            ids.append(v.id)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+def _writer(Session, vendor_id: int, writes: int, latencies: list, errors: list):
+    db = Session()
+    try:
+        for n in range(writes):
+            t = time.perf_counter()
+            try:
+                add_sale_tx(db, vendor_id, SaleCreate(date="2024-01-01", mode="cash", amount=10.0 + n))
+                db.commit()
+                latencies.append(time.perf_counter() - t)
+            except OperationalError as e:
+                db.rollback()
+                errors.append(str(e.orig))
+    finally:
+        db.close()
+
+def run_profile(profile: str, threads: int, writes: int, directory: str) -> dict:
+    path = os.path.join(directory, f"bench_{profile}.db")
+    eng = build_engine(f"sqlite:///{path}", profile)
+    Base.metadata.create_all(bind=eng)
+    Session = sessionmaker(bind=eng, autoflush=False, expire_on_commit=False)
+
+    # one vendor per thread: contention is on the database file, not on one chain head
+    vendor_ids = _seed(Session, threads)
+    latencies, errors = [], []
+    workers = [
+        threading.Thread(target=_writer, args=(Session, vid, writes, latencies, errors))
+        for vid in vendor_ids
+    ]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    with eng.connect() as conn:
+        journal = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    eng.dispose()
+
+    ms = sorted(s * 1000 for s in latencies)
+    return {
+        "profile": profile,
+        "journal_mode": journal,
+        "threads": threads,
+        "commits": len(latencies),
+        "locked_errors": len(errors),
+        "elapsed_sec": round(elapsed, 3),
+        "commits_per_sec": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        "p50_ms": round(percentile(ms, 0.50), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 0.99), 2) if ms else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200, help="commits per thread")
+    parser.add_argument("--profiles", default="default,tuned")
+    parser.add_argument("--dir", default=None, help="where the throwaway databases go (default: temp dir)")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or tempfile.mkdtemp(prefix="trustchain_bench_")
+    results = [run_profile(p.strip(), args.threads, args.writes, directory) for p in args.profiles.split(",") if p.strip()]
+    for r in results:
+        print(json.dumps(r))
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
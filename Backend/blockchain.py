@@ -1,28 +1,60 @@
 import hashlib
+import hmac
 import json
 from datetime import datetime
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from models import ChainEntry
+from models import ChainEntry, ChainCheckpoint, ChainMerkleRoot, ChainProofRoot, ChainHead
+from merkle import merkle_root, merkle_proof
+from observability import count_hashes
+from versions import bump_data_version
+from segments import SegmentError, archived_rows, get_block
+from config import SECRET_KEY, CHAIN_MERKLE_RANGE, CHAIN_PROOF_EPOCH, CHAIN_SCAN_CHUNK
 
 def sha256(data: str) -> str:
+    count_hashes()
     return hashlib.sha256(data.encode("utf-8")).hexdigest()
 
-def get_last_hash(db: Session, vendor_id: int) -> str:
+def block_raw(vendor_id: int, action: str, payload_hash: str, prev_hash: str, created_at: datetime) -> str:
+    return f"{vendor_id}|{action}|{payload_hash}|{prev_hash}|{created_at.isoformat()}"
+
+def get_chain_head(db: Session, vendor_id: int) -> ChainHead:
+    """
+    Per-vendor chain head (PK lookup). Vendors from before chain_heads existed
+    are bootstrapped once from chain_entries.
+    """
+    head = db.get(ChainHead, vendor_id)
+    if head:
+        return head
+
     last = (
         db.query(ChainEntry)
         .filter(ChainEntry.vendor_id == vendor_id)
         .order_by(ChainEntry.id.desc())
         .first()
     )
-    return last.hash if last else "GENESIS"
+    length = db.query(func.count(ChainEntry.id)).filter(ChainEntry.vendor_id == vendor_id).scalar() or 0
+    head = ChainHead(
+        vendor_id=vendor_id,
+        last_block_id=last.id if last else None,
+        last_hash=last.hash if last else "GENESIS",
+        length=length
+    )
+    db.add(head)
+    return head
+
+def get_last_hash(db: Session, vendor_id: int) -> str:
+    return get_chain_head(db, vendor_id).last_hash
+
+def payload_digest(payload: dict) -> str:
+    return sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")))
 
-def add_block(db: Session, vendor_id: int, action: str, payload: dict):
-    payload_hash = sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")))
-    prev_hash = get_last_hash(db, vendor_id)
+def _append_block(db: Session, vendor_id: int, action: str, payload_hash: str) -> ChainEntry:
+    head = get_chain_head(db, vendor_id)
+    prev_hash = head.last_hash
     ts = datetime.utcnow()
 
-    raw = f"{vendor_id}|{action}|{payload_hash}|{prev_hash}|{ts.isoformat()}"
-    block_hash = sha256(raw)
+    block_hash = sha256(block_raw(vendor_id, action, payload_hash, prev_hash, ts))
 
     entry = ChainEntry(
         vendor_id=vendor_id,
@@ -33,21 +65,303 @@ def add_block(db: Session, vendor_id: int, action: str, payload: dict):
         createdAt=ts
     )
     db.add(entry)
-    db.commit()
+    db.flush()
 
-def verify_chain(db: Session, vendor_id: int):
-    entries = (
-        db.query(ChainEntry)
-        .filter(ChainEntry.vendor_id == vendor_id)
+    head.last_block_id = entry.id
+    head.last_hash = block_hash
+    head.length = (head.length or 0) + 1
+    bump_data_version(db, vendor_id)
+    return entry
+
+def add_block(db: Session, vendor_id: int, action: str, payload: dict) -> ChainEntry:
+    """
+    Appends a block inside the caller's transaction (no commit here), so the
+    business write and its block land in a single commit.
+    """
+    return _append_block(db, vendor_id, action, payload_digest(payload))
+
+def add_batch_block(db: Session, vendor_id: int, action: str, payloads: list):
+    """
+    One block for many records: payload_hash is the Merkle root over the
+    per-item payload digests. Returns (entry, item_hashes).
+    """
+    item_hashes = [payload_digest(p) for p in payloads]
+    entry = _append_block(db, vendor_id, action, merkle_root(item_hashes))
+    return entry, item_hashes
+
+# ---------- Checkpoints ----------
+
+def _checkpoint_signature(vendor_id: int, block_id: int, block_hash: str, length: int) -> str:
+    msg = f"{vendor_id}|{block_id}|{block_hash}|{length}"
+    return hmac.new(SECRET_KEY.encode("utf-8"), msg.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def load_checkpoint(db: Session, vendor_id: int):
+    """
+    Returns the vendor checkpoint only if its signature is intact.
+    A forged/edited checkpoint is ignored so the caller re-audits from GENESIS.
+    """
+    cp = db.get(ChainCheckpoint, vendor_id)
+    if not cp:
+        return None
+    expected = _checkpoint_signature(vendor_id, cp.last_block_id, cp.last_hash, cp.length)
+    if not hmac.compare_digest(cp.signature, expected):
+        return None
+    return cp
+
+def save_checkpoint(db: Session, vendor_id: int, block_id: int, block_hash: str, length: int):
+    cp = db.get(ChainCheckpoint, vendor_id)
+    if not cp:
+        cp = ChainCheckpoint(vendor_id=vendor_id)
+        db.add(cp)
+    cp.last_block_id = block_id
+    cp.last_hash = block_hash
+    cp.length = length
+    cp.signature = _checkpoint_signature(vendor_id, block_id, block_hash, length)
+    return cp
+
+def _take_rows(db: Session, vendor_id: int, after_id: int, n: int, columns) -> list:
+    rows = []
+    for chunk in iter_chain_rows(db, vendor_id, after_id, chunk_size=n, columns=columns):
+        rows.extend(chunk)
+        if len(rows) >= n:
+            break
+    return rows[:n]
+
+def _seal_ranges(db: Session, model, leaf: str, size: int, vendor_id: int, length: int, recheck: bool):
+    # seals a root over the `leaf` column for every complete `size` block range below `length`
+    stored = {}
+    epoch, after_id = 0, 0
+
+    if recheck:
+        for r in db.query(model).filter(model.vendor_id == vendor_id).all():
+            stored[r.epoch] = r
+    else:
+        last = (
+            db.query(model)
+            .filter(model.vendor_id == vendor_id)
+            .order_by(model.epoch.desc())
+            .first()
+        )
+        if last:
+            epoch, after_id = last.epoch + 1, last.last_block_id
+
+    while (epoch + 1) * size <= length:
+        rows = _take_rows(db, vendor_id, after_id, size, ("id", leaf))
+        if len(rows) < size:
+            break
+
+        root = merkle_root([h for _, h in rows])
+        sealed = stored.get(epoch)
+        if sealed:
+            if sealed.root != root:
+                return epoch
+        else:
+            db.add(model(
+                vendor_id=vendor_id,
+                epoch=epoch,
+                first_block_id=rows[0][0],
+                last_block_id=rows[-1][0],
+                leaf_count=len(rows),
+                root=root
+            ))
+        after_id = rows[-1][0]
+        epoch += 1
+
+    return None
+
+def seal_merkle_ranges(db: Session, vendor_id: int, length: int, recheck: bool = False):
+    """
+    Seals a Merkle root for every complete CHAIN_MERKLE_RANGE block range below `length`.
+    With recheck=True already sealed ranges are recomputed and compared.
+    Returns the first epoch whose stored root does not match, else None.
+    """
+    return _seal_ranges(db, ChainMerkleRoot, "hash", CHAIN_MERKLE_RANGE, vendor_id, length, recheck)
+
+def seal_proof_epochs(db: Session, vendor_id: int, length: int, recheck: bool = False):
+    """
+    Same for the published proof roots (tree over payload_hash, CHAIN_PROOF_EPOCH blocks).
+    """
+    return _seal_ranges(db, ChainProofRoot, "payload_hash", CHAIN_PROOF_EPOCH, vendor_id, length, recheck)
+
+def inclusion_proof(db: Session, block_id: int):
+    """
+    Merkle inclusion proof of one block's payload_hash in its epoch: log2(CHAIN_PROOF_EPOCH)
+    sibling hashes. A block in the still-open epoch gets a provisional root
+    ("sealed": False) that changes as blocks are added. None if the block does not exist.
+    """
+    entry = get_block(db, block_id)
+    if not entry:
+        return None
+    vendor_id = entry.vendor_id
+    head = db.get(ChainHead, vendor_id)
+    length = head.length if head else (
+        db.query(func.count(ChainEntry.id)).filter(ChainEntry.vendor_id == vendor_id).scalar() or 0
+    )
+    seal_proof_epochs(db, vendor_id, length)
+    # sessions don't autoflush: the query below must see epochs sealed just now
+    db.flush()
+
+    sealed = (
+        db.query(ChainProofRoot)
+        .filter(ChainProofRoot.vendor_id == vendor_id, ChainProofRoot.last_block_id >= block_id)
+        .order_by(ChainProofRoot.epoch.asc())
+        .first()
+    )
+    if sealed:
+        epoch, first_id, last_id = sealed.epoch, sealed.first_block_id, sealed.last_block_id
+    else:
+        last = (
+            db.query(ChainProofRoot)
+            .filter(ChainProofRoot.vendor_id == vendor_id)
+            .order_by(ChainProofRoot.epoch.desc())
+            .first()
+        )
+        epoch, first_id, last_id = (last.epoch + 1, last.last_block_id + 1, None) if last else (0, 0, None)
+
+    rows = [r for chunk in iter_chain_rows(db, vendor_id, first_id - 1, last_id, columns=("id", "payload_hash"))
+            for r in chunk]
+    ids = [i for i, _ in rows]
+    leaves = [h for _, h in rows]
+    index = ids.index(block_id)
+    root = merkle_root(leaves)
+    if sealed and root != sealed.root:
+        # the epoch no longer matches its published root: the ledger was edited
+        return {"block_id": block_id, "vendor_id": vendor_id, "epoch": epoch, "valid": False,
+                "root": sealed.root, "recomputed_root": root}
+
+    return {
+        "block_id": block_id,
+        "vendor_id": vendor_id,
+        "action": entry.action,
+        "leaf": entry.payload_hash,
+        "epoch": epoch,
+        "index": index,
+        "leaf_count": len(leaves),
+        "root": root,
+        "sealed": sealed is not None,
+        "proof": merkle_proof(leaves, index),
+    }
+
+# ---------- Verification ----------
+
+CHAIN_COLUMNS = ("id", "action", "payload_hash", "prev_hash", "hash", "createdAt")
+
+def iter_chain_rows(db: Session, vendor_id: int, after_id: int = 0, until_id: int | None = None,
+                    chunk_size: int = CHAIN_SCAN_CHUNK, columns=CHAIN_COLUMNS):
+    """
+    Yields the vendor chain after `after_id` (up to `until_id`) as lists of rows:
+    archived segments first, then live chain_entries rows. `columns` (a subset of
+    CHAIN_COLUMNS starting with "id") keeps scans that need one digest from
+    loading and decoding the others.
+    """
+    pick = None if columns == CHAIN_COLUMNS else [CHAIN_COLUMNS.index(c) for c in columns]
+    buf = []
+    for r in archived_rows(db, vendor_id, after_id, until_id):
+        buf.append(r if pick is None else tuple(r[i] for i in pick))
+        after_id = r[0]
+        if len(buf) >= chunk_size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+    stmt = (
+        select(*[getattr(ChainEntry, c) for c in columns])
+        .where(ChainEntry.vendor_id == vendor_id)
         .order_by(ChainEntry.id.asc())
-        .all()
+        .limit(chunk_size)
     )
+    if until_id is not None:
+        stmt = stmt.where(ChainEntry.id <= until_id)
+    while True:
+        rows = db.execute(stmt.where(ChainEntry.id > after_id)).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        after_id = rows[-1][0]
 
-    prev = "GENESIS"
-    for e in entries:
-        raw = f"{vendor_id}|{e.action}|{e.payload_hash}|{prev}|{e.createdAt.isoformat()}"
-        if sha256(raw) != e.hash:
-            return False, {"bad_block_id": e.id}
-        prev = e.hash
+def iter_chain_columns(db: Session, vendor_id: int, after_id: int = 0, chunk_size: int = CHAIN_SCAN_CHUNK):
+    """
+    Yields the vendor chain after `after_id` as column tuples
+    (ids, actions, payload_hashes, prev_hashes, hashes, created) of up to chunk_size rows.
+    """
+    for rows in iter_chain_rows(db, vendor_id, after_id, chunk_size=chunk_size):
+        yield tuple(zip(*rows))
 
-    return True, {"blocks": len(entries)}
\ No newline at end of file
+def rehash_columns(vendor_id: int, actions, payload_hashes, prev_hashes, created) -> list:
+    h = hashlib.sha256
+    prefix = f"{vendor_id}|"
+    count_hashes(len(actions))
+    return [
+        h(f"{prefix}{a}|{p}|{pv}|{t.isoformat()}".encode("utf-8")).hexdigest()
+        for a, p, pv, t in zip(actions, payload_hashes, prev_hashes, created)
+    ]
+
+def check_chain(db: Session, vendor_id: int, prev: str = "GENESIS", after_id: int = 0):
+    """
+    Full batched check of every block after `after_id`: prev_hash link + recomputed hash.
+    Returns (checked, last_id, last_hash, fault); fault is None or
+    {"block_id", "reason", "expected", "found"} for the first bad block.
+    """
+    checked, last_id = 0, after_id
+    for ids, actions, payload_hashes, prev_hashes, hashes, created in iter_chain_columns(db, vendor_id, after_id):
+        # links: every stored prev_hash must be the previous block's stored hash
+        expected_prev = (prev,) + hashes[:-1]
+        # content: hash recomputed from (vendor|action|payload_hash|prev_hash|createdAt)
+        recomputed = rehash_columns(vendor_id, actions, payload_hashes, prev_hashes, created)
+
+        if prev_hashes != expected_prev or recomputed != list(hashes):
+            bad_link = next((i for i, (a, b) in enumerate(zip(prev_hashes, expected_prev)) if a != b), len(ids))
+            bad_hash = next((i for i, (a, b) in enumerate(zip(recomputed, hashes)) if a != b), len(ids))
+            i = min(bad_link, bad_hash)
+            if i == bad_link:
+                fault = {"block_id": ids[i], "reason": "prev_hash", "expected": expected_prev[i], "found": prev_hashes[i]}
+            else:
+                fault = {"block_id": ids[i], "reason": "hash", "expected": recomputed[i], "found": hashes[i]}
+            return checked + i, last_id, prev, fault
+
+        checked += len(ids)
+        last_id, prev = ids[-1], hashes[-1]
+
+    return checked, last_id, prev, None
+
+def verify_chain(db: Session, vendor_id: int, full: bool = False):
+    try:
+        return _verify_chain(db, vendor_id, full)
+    except SegmentError as e:
+        # archived bytes missing or changed on disk
+        db.rollback()
+        return False, {"bad_segment": e.epoch}
+
+def _verify_chain(db: Session, vendor_id: int, full: bool = False):
+    prev, length, after_id = "GENESIS", 0, 0
+
+    cp = None if full else load_checkpoint(db, vendor_id)
+    if cp:
+        # checkpointed block must still be there with the same hash
+        anchor = get_block(db, cp.last_block_id)
+        if not anchor or anchor.hash != cp.last_hash:
+            return False, {"bad_block_id": cp.last_block_id}
+        prev, length, after_id = cp.last_hash, cp.length, cp.last_block_id
+
+    checked, after_id, prev, fault = check_chain(db, vendor_id, prev, after_id)
+    if fault:
+        return False, {"bad_block_id": fault["block_id"]}
+
+    length += checked
+    if length and (checked or not cp):
+        save_checkpoint(db, vendor_id, after_id, prev, length)
+
+    bad_epoch = seal_merkle_ranges(db, vendor_id, length, recheck=full)
+    if bad_epoch is not None:
+        db.rollback()
+        return False, {"bad_epoch": bad_epoch}
+    bad_epoch = seal_proof_epochs(db, vendor_id, length, recheck=full)
+    if bad_epoch is not None:
+        db.rollback()
+        return False, {"bad_proof_epoch": bad_epoch}
+
+    db.commit()
+    return True, {"blocks": length, "checked": checked, "from_checkpoint": cp is not None}
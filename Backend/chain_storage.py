@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import BigInteger, DateTime, LargeBinary, String, text
+from sqlalchemy.types import TypeDecorator
+
+from config import CHAIN_STORAGE
+
+# Column types for chain_entries digests and timestamps. CHAIN_STORAGE picks what is
+# written: hex / ISO text, or 32-byte BLOBs and integer microseconds since 1970
+# (naive UTC). Reads accept both, so a table half way through migrate_chain_storage
+# still verifies, and the ORM always hands out the same hex strings and datetimes
+# that block hashes are computed from.
+
+GENESIS = "GENESIS"
+_GENESIS_RAW = bytes(32)   # prev_hash of the first block; never a real sha256
+_EPOCH = datetime(1970, 1, 1)
+_MICRO = timedelta(microseconds=1)
+
+
+def digest_to_db(value, binary: bool):
+    if value is None or not binary or not isinstance(value, str):
+        return value
+    if value == GENESIS:
+        return _GENESIS_RAW
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        return value
+    # anything that would not come back byte-for-byte stays text
+    return raw if len(raw) == 32 and raw.hex() == value else value
+
+
+def digest_from_db(value):
+    if value.__class__ is bytes:
+        return value.hex() if value != _GENESIS_RAW else GENESIS
+    if isinstance(value, memoryview):
+        return digest_from_db(bytes(value))
+    return value
+
+
+def _sqlite_text(value: datetime) -> str:
+    # the format SQLAlchemy's DateTime writes on SQLite
+    return value.replace(tzinfo=None).isoformat(" ", "microseconds")
+
+
+def timestamp_to_db(value, binary: bool, sqlite: bool = True):
+    if not isinstance(value, datetime):
+        return value
+    if binary:
+        return (value.replace(tzinfo=None) - _EPOCH) // _MICRO
+    return _sqlite_text(value) if sqlite else value
+
+
+def timestamp_from_db(value):
+    if value.__class__ is int:
+        seconds, micros = divmod(value, 1_000_000)
+        return _EPOCH + timedelta(0, seconds, micros)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+class _ChainColumn(TypeDecorator):
+    # DDL comes from the dialect impl; value conversion is done here only, so the
+    # impl's own processors never see the other representation
+
+    def __init__(self, binary: bool | None = None):
+        super().__init__()
+        self.binary = CHAIN_STORAGE == "binary" if binary is None else binary
+
+    def result_processor(self, dialect, coltype):
+        return self.from_db
+
+
+class Digest(_ChainColumn):
+    """
+    sha256 digest: 64-char hex string in Python, TEXT or 32-byte BLOB in the table.
+    """
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(LargeBinary() if self.binary else String())
+
+    def bind_processor(self, dialect):
+        binary = self.binary
+        return lambda value: digest_to_db(value, binary)
+
+    from_db = staticmethod(digest_from_db)
+
+
+class Timestamp(_ChainColumn):
+    """
+    Naive UTC datetime in Python, DATETIME text or integer microseconds in the table.
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(BigInteger() if self.binary else DateTime())
+
+    def bind_processor(self, dialect):
+        binary, sqlite = self.binary, dialect.name == "sqlite"
+        return lambda value: timestamp_to_db(value, binary, sqlite)
+
+    from_db = staticmethod(timestamp_from_db)
+
+
+def migrate_chain_storage(engine, target: str, chunk: int = 5000) -> int:
+    """
+    Rewrites chain_entries rows in place into the `target` ("text" / "binary")
+    representation, one transaction per chunk; rows already in it are skipped, so an
+    interrupted run can simply be restarted. SQLite only: its columns take either
+    representation without a schema change. Returns the number of rows converted.
+    """
+    if engine.dialect.name != "sqlite":
+        raise ValueError("in-place chain storage migration is only supported on SQLite")
+    if target not in ("text", "binary"):
+        raise ValueError(f"unknown chain storage {target!r}")
+    binary = target == "binary"
+    select_rows = text(
+        "SELECT id, payload_hash, prev_hash, hash, createdAt FROM chain_entries"
+        " WHERE id > :after ORDER BY id LIMIT :n"
+    )
+    update_row = text(
+        "UPDATE chain_entries SET payload_hash = :payload_hash, prev_hash = :prev_hash,"
+        " hash = :hash, createdAt = :createdAt WHERE id = :id"
+    )
+    converted, after = 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_rows, {"after": after, "n": chunk}).all()
+            if not rows:
+                return converted
+            changes = []
+            for row in rows:
+                digests = [digest_from_db(v) for v in row[1:4]]
+                created = timestamp_from_db(row[4])
+                new = [digest_to_db(d, binary) for d in digests] + [timestamp_to_db(created, binary)]
+                if tuple(new) == tuple(row[1:]):
+                    continue
+                # must read back exactly as before, or block hashes would no longer recompute
+                if [digest_from_db(v) for v in new[:3]] != digests or timestamp_from_db(new[3]) != created:
+                    raise ValueError(f"chain entry {row[0]} does not round-trip to {target} storage")
+                changes.append({"id": row[0], "payload_hash": new[0], "prev_hash": new[1],
+                                "hash": new[2], "createdAt": new[3]})
+            if changes:
+                conn.execute(update_row, changes)
+            converted += len(changes)
+            after = rows[-1][0]
@@ -0,0 +1,259 @@
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+from fastapi import HTTPException
+from sqlalchemy.orm.exc import StaleDataError
+
+from database import SessionLocal, shard_sessions
+from config import CHAIN_WRITER_MAX_BATCH, CHAIN_WRITER_LINGER_MS, CHAIN_WRITER_TIMEOUT
+
+# Every write that appends a chain block goes through one writer thread, so no
+# two transactions ever read the same chain head. Jobs are plain (db, ...) functions
+# without commit (the *_tx functions in routes.py); the writer runs a batch of
+# them in one session and commits once (group commit). FIFO order keeps each
+# vendor's blocks in submission order.
+
+
+class ChainConflict(Exception):
+    """Chain head moved underneath the job (another process appended first)."""
+
+
+class _Job:
+    __slots__ = ("vendor_id", "fn", "args", "kwargs", "future", "enqueued", "context")
+
+    def __init__(self, vendor_id: int, fn, args, kwargs):
+        self.vendor_id = vendor_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+        # submitter's context, so per-request metrics see the SQL run on its behalf
+        self.context = contextvars.copy_context()
+
+
+def _percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))], 3)
+
+
+class ChainWriter:
+    def __init__(self, session_factory=SessionLocal, max_batch: int = CHAIN_WRITER_MAX_BATCH,
+                 linger_ms: float = CHAIN_WRITER_LINGER_MS, window: int = 1024):
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.linger = max(0.0, linger_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        # metrics
+        self._pending = Counter()
+        self._batches = 0
+        self._jobs = 0
+        self._failed = 0
+        self._replays = 0
+        self._max_batch_seen = 0
+        self._flush_ms = deque(maxlen=window)
+        self._wait_ms = deque(maxlen=window)
+
+    # ---------- submit ----------
+
+    def submit(self, vendor_id: int, fn, *args, **kwargs) -> Future:
+        job = _Job(vendor_id, fn, args, kwargs)
+        with self._lock:
+            self._pending[vendor_id] += 1
+        self._ensure_started()
+        self._queue.put(job)
+        return job.future
+
+    def run(self, vendor_id: int, fn, *args, **kwargs):
+        """
+        Blocking submit for sync routes. Returns fn's result or re-raises its exception.
+        """
+        future = self.submit(vendor_id, fn, *args, **kwargs)
+        try:
+            return future.result(timeout=CHAIN_WRITER_TIMEOUT)
+        except TimeoutError:
+            return self._timed_out(future).result()
+
+    async def run_async(self, vendor_id: int, fn, *args, **kwargs):
+        future = self.submit(vendor_id, fn, *args, **kwargs)
+        wrapped = asyncio.wrap_future(future)
+        try:
+            # shield: on timeout the job is cancelled here, only if it has not started
+            return await asyncio.wait_for(asyncio.shield(wrapped), CHAIN_WRITER_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._timed_out(future)
+            return await wrapped
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    @staticmethod
+    def _timed_out(future: Future) -> Future:
+        # A 503 must mean "not written", or a client retry would write twice. A job
+        # still queued is cancelled (the writer skips it); one already running is
+        # waited for.
+        if future.cancel():
+            raise HTTPException(status_code=503, detail="Write queue is busy, retry shortly")
+        return future
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            # a forked child (audit pool) gets its own thread on first use
+            if self._thread is None or not self._thread.is_alive() or self._pid != pid:
+                self._pid = pid
+                self._thread = threading.Thread(target=self._loop, name="chain-writer", daemon=True)
+                self._thread.start()
+
+    # ---------- writer thread ----------
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.linger
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _run_batch(self, jobs: list) -> list:
+        db = self.session_factory()
+        try:
+            results = [job.context.run(job.fn, db, *job.args, **job.kwargs) for job in jobs]
+            db.commit()
+            return results
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush(self, batch: list):
+        started = time.perf_counter()
+        jobs = [j for j in batch if j.future.set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            outcomes = [(j, r, None) for j, r in zip(jobs, self._run_batch(jobs))]
+        except Exception:
+            # one job failed -> nothing of the batch was committed; replay each job in
+            # its own transaction so only the failing one reports an error
+            self._replays += 1
+            outcomes = []
+            for job in jobs:
+                try:
+                    outcomes.append((job, self._run_batch([job])[0], None))
+                except StaleDataError:
+                    outcomes.append((job, None, ChainConflict(f"chain head of vendor {job.vendor_id} moved")))
+                except Exception as e:
+                    outcomes.append((job, None, e))
+
+        done = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._jobs += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._flush_ms.append((done - started) * 1000)
+            for job in batch:
+                self._pending[job.vendor_id] -= 1
+                if self._pending[job.vendor_id] <= 0:
+                    del self._pending[job.vendor_id]
+                self._wait_ms.append((done - job.enqueued) * 1000)
+            self._failed += sum(1 for _, _, e in outcomes if e is not None)
+
+        for job, result, error in outcomes:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+    # ---------- metrics ----------
+
+    def stats(self) -> dict:
+        with self._lock:
+            flush_ms = sorted(self._flush_ms)
+            wait_ms = sorted(self._wait_ms)
+            busiest = self._pending.most_common(1)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "pending_jobs": sum(self._pending.values()),
+                "pending_vendors": len(self._pending),
+                "max_vendor_depth": busiest[0][1] if busiest else 0,
+                "batches": self._batches,
+                "jobs": self._jobs,
+                "failed_jobs": self._failed,
+                "replayed_batches": self._replays,
+                "avg_batch": round(self._jobs / self._batches, 2) if self._batches else 0,
+                "max_batch": self._max_batch_seen,
+                "flush_ms": {"p50": _percentile(flush_ms, 0.50), "p99": _percentile(flush_ms, 0.99),
+                             "max": round(flush_ms[-1], 3) if flush_ms else None},
+                "wait_ms": {"p50": _percentile(wait_ms, 0.50), "p99": _percentile(wait_ms, 0.99),
+                            "max": round(wait_ms[-1], 3) if wait_ms else None},
+            }
+
+
+class ShardedChainWriter:
+    """
+    One ChainWriter per shard: vendors on different shards commit in parallel instead
+    of queueing for one database write lock. Same interface as ChainWriter.
+    """
+
+    def __init__(self, session_factories):
+        self.writers = [ChainWriter(factory) for factory in session_factories]
+
+    def _writer(self, vendor_id: int) -> ChainWriter:
+        if len(self.writers) == 1:
+            return self.writers[0]
+        from shards import shard_for, check_writable  # lazy: shards imports database
+        check_writable(vendor_id)
+        return self.writers[shard_for(vendor_id)]
+
+    def submit(self, vendor_id: int, fn, *args, **kwargs) -> Future:
+        return self._writer(vendor_id).submit(vendor_id, fn, *args, **kwargs)
+
+    def run(self, vendor_id: int, fn, *args, **kwargs):
+        return self._writer(vendor_id).run(vendor_id, fn, *args, **kwargs)
+
+    async def run_async(self, vendor_id: int, fn, *args, **kwargs):
+        return await self._writer(vendor_id).run_async(vendor_id, fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        per_shard = [w.stats() for w in self.writers]
+        if len(per_shard) == 1:
+            return per_shard[0]
+        total = {k: sum(s[k] for s in per_shard) for k in
+                 ("queue_depth", "pending_jobs", "pending_vendors", "batches", "jobs", "failed_jobs", "replayed_batches")}
+        total.update({
+            "max_vendor_depth": max(s["max_vendor_depth"] for s in per_shard),
+            "avg_batch": round(total["jobs"] / total["batches"], 2) if total["batches"] else 0,
+            "max_batch": max(s["max_batch"] for s in per_shard),
+            # worst shard; percentiles of different shards do not combine
+            "flush_ms": {k: max((s["flush_ms"][k] or 0) for s in per_shard) for k in ("p50", "p99", "max")},
+            "wait_ms": {k: max((s["wait_ms"][k] or 0) for s in per_shard) for k in ("p50", "p99", "max")},
+            "shards": per_shard,
+        })
+        return total
+
+
+chain_writer = ShardedChainWriter(shard_sessions)
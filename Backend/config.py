@@ -9,11 +9,105 @@ DEFAULT_SQLITE_PATH = os.path.join(BASE_DIR, "trustchain.db")
 # If DATABASE_URL env is not set, use SQLite in Backend/
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DEFAULT_SQLITE_PATH}")
 
+# Extra vendor shards (comma separated URLs). DATABASE_URL stays shard 0, the home shard
+# that also holds the vendor -> shard directory. Empty = one database, no routing.
+SHARD_URLS = [u.strip() for u in os.getenv("SHARD_URLS", "").split(",") if u.strip()]
+# Where new vendors go: "hash" (stable hash of the vendor id) or "least" (fewest vendors)
+SHARD_PLACEMENT = os.getenv("SHARD_PLACEMENT", "hash").lower()
+# Seconds a worker may use its cached vendor -> shard entry; vendor moves wait this long
+SHARD_DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", "2"))
+
+# "sync" (default) or "async": async mode serves the hot CRUD routes from an async engine
+# (aiosqlite for SQLite, asyncpg for Postgres -> pip install aiosqlite / asyncpg)
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+# SQLite storage profile: "tuned" (WAL + pragmas below) or "default" (stock SQLite settings)
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned").lower()
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB -> 64 MiB per connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+# Connection pool (file databases / Postgres)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
 SECRET_KEY = os.getenv("SECRET_KEY", "trustchain_change_this_secret")
 ALGORITHM = "HS256"
 TOKEN_EXPIRE_DAYS = int(os.getenv("TOKEN_EXPIRE_DAYS", "30"))
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(BASE_DIR, "uploads"))
 ALLOWED_IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+# Profile photos: size limit, read chunk, and thumbnail edge lengths in px (needs Pillow)
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(5 * 1024 * 1024)))
+PHOTO_CHUNK_BYTES = int(os.getenv("PHOTO_CHUNK_BYTES", str(256 * 1024)))
+PHOTO_THUMB_SIZES = [int(s) for s in os.getenv("PHOTO_THUMB_SIZES", "128,512").split(",") if s.strip()]
+
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
+
+# Blocks per sealed Merkle range (chain checkpoints)
+CHAIN_MERKLE_RANGE = int(os.getenv("CHAIN_MERKLE_RANGE", "1024"))
+
+# Blocks per published proof epoch (Merkle tree over payload hashes, /chain/proof)
+CHAIN_PROOF_EPOCH = int(os.getenv("CHAIN_PROOF_EPOCH", "1024"))
+
+# Cold chain archive: segment files, blocks per compressed frame, newest sealed ranges kept live
+CHAIN_ARCHIVE_DIR = os.getenv("CHAIN_ARCHIVE_DIR", os.path.join(BASE_DIR, "chain_archive"))
+CHAIN_ARCHIVE_FRAME = int(os.getenv("CHAIN_ARCHIVE_FRAME", "64"))
+CHAIN_ARCHIVE_KEEP_RANGES = int(os.getenv("CHAIN_ARCHIVE_KEEP_RANGES", "2"))
+
+# chain_entries storage: "text" (hex digests, ISO datetimes) or "binary" (32-byte digests,
+# integer microseconds); convert existing rows with `python manage.py migrate-chain-storage`
+CHAIN_STORAGE = os.getenv("CHAIN_STORAGE", "text").lower()
+
+# Global chain audit (/chain/verify): worker processes and vendors per task
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", str(os.cpu_count() or 1)))
+AUDIT_CHUNK_SIZE = int(os.getenv("AUDIT_CHUNK_SIZE", "64"))
+# Audits allowed to run at once; they share one worker pool, further requests get a 429
+AUDIT_MAX_CONCURRENT = int(os.getenv("AUDIT_MAX_CONCURRENT", "1"))
+
+# Rows per column-oriented chunk when re-hashing a chain
+CHAIN_SCAN_CHUNK = int(os.getenv("CHAIN_SCAN_CHUNK", "5000"))
+
+# Lender portfolio API: accepted X-API-Key values (comma separated; empty = /portfolio is off)
+# and how many scored runs are kept (older runs and their snapshots are deleted)
+LENDER_API_KEYS = [k.strip() for k in os.getenv("LENDER_API_KEYS", "").split(",") if k.strip()]
+PORTFOLIO_KEEP_RUNS = int(os.getenv("PORTFOLIO_KEEP_RUNS", "5"))
+
+# Trust policy registry: in-memory copy is reloaded at most this often (edits in this process reload at once)
+POLICY_REFRESH_SECONDS = int(os.getenv("POLICY_REFRESH_SECONDS", "300"))
+
+# Chain writer: one thread applies all chain-appending writes, up to MAX_BATCH per commit.
+# LINGER_MS is how long it waits for more work before committing a batch.
+CHAIN_WRITER_MAX_BATCH = int(os.getenv("CHAIN_WRITER_MAX_BATCH", "256"))
+CHAIN_WRITER_LINGER_MS = float(os.getenv("CHAIN_WRITER_LINGER_MS", "2"))
+CHAIN_WRITER_TIMEOUT = float(os.getenv("CHAIN_WRITER_TIMEOUT", "30"))
+
+# Opt-in sampling profiler: requests slower than PROFILE_SLOW_MS (0 = off) get their
+# stack samples (every PROFILE_SAMPLE_MS) written to PROFILE_DIR as collapsed stacks
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+
+# Revenue stability: rolling window of weekly revenue, and the complete weeks needed before it
+# replaces the sales-count heuristic (changing the window needs: python manage.py rebuild-rollups)
+STABILITY_WINDOW_WEEKS = int(os.getenv("STABILITY_WINDOW_WEEKS", "12"))
+STABILITY_MIN_WEEKS = int(os.getenv("STABILITY_MIN_WEEKS", "4"))
+
+# Max records per POST /sales/bulk or /credits/bulk request
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+
+# Authenticated vendor cache (keyed by token sub)
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# Read responses cached per (vendor, route, data version); LRU bounded by total body size (0 = off)
+RESPONSE_CACHE_MB = float(os.getenv("RESPONSE_CACHE_MB", "64"))
 
-CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
\ No newline at end of file
+# Dedicated bcrypt threads; logins beyond BCRYPT_MAX_PENDING waiting get a 503
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
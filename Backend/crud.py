@@ -1,21 +1,291 @@
+from collections import defaultdict
+from datetime import datetime, date, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from models import Vendor, Customer, Credit, Sale
-from auth import hash_password, verify_password
+from sqlalchemy import func, case, insert, select, delete
+from models import Vendor, Customer, Credit, Sale, VendorStats, SalesDaily, RevenueStats
+from stability import week_index, week_start, apply_week
+from versions import bump_data_version, bump_data_versions
+from starlette.concurrency import run_in_threadpool
+from auth import hash_password, verify_password, verify_password_async
 from schemas import SignupRequest
 
-def create_vendor(db: Session, data: SignupRequest) -> Vendor:
+# Write helpers only flush (ids get assigned); the route commits once,
+# together with the chain block from blockchain.add_block.
+
+# ---------- Vendor stats (materialised KPIs) ----------
+
+def _stats_from_base(db: Session, vendor_ids=None) -> dict:
+    """
+    One grouped scan per base table -> {vendor_id: {column: value}}.
+    """
+    sales_q = db.query(
+        Sale.vendorId,
+        func.coalesce(func.sum(Sale.amount), 0.0),
+        func.count(Sale.id),
+    ).group_by(Sale.vendorId)
+
+    paid = Credit.status == "paid"
+    credits_q = db.query(
+        Credit.vendorId,
+        func.coalesce(func.sum(case((paid, 0.0), else_=Credit.amount)), 0.0),
+        func.coalesce(func.sum(case((paid, Credit.amount), else_=0.0)), 0.0),
+        func.count(Credit.id),
+        func.coalesce(func.sum(case((paid, 1), else_=0)), 0),
+    ).group_by(Credit.vendorId)
+
+    vendors_q = db.query(Vendor.id)
+    if vendor_ids is not None:
+        sales_q = sales_q.filter(Sale.vendorId.in_(vendor_ids))
+        credits_q = credits_q.filter(Credit.vendorId.in_(vendor_ids))
+        vendors_q = vendors_q.filter(Vendor.id.in_(vendor_ids))
+
+    out = {
+        vid: {"totalSales": 0.0, "saleCount": 0, "pendingUdhaar": 0.0, "recovered": 0.0, "creditCount": 0, "paidCount": 0}
+        for (vid,) in vendors_q.all()
+    }
+    for vid, total, count in sales_q.all():
+        if vid in out:
+            out[vid].update(totalSales=float(total), saleCount=int(count))
+    for vid, pending, recovered, count, paid_count in credits_q.all():
+        if vid in out:
+            out[vid].update(pendingUdhaar=float(pending), recovered=float(recovered),
+                            creditCount=int(count), paidCount=int(paid_count))
+    return out
+
+def rebuild_vendor_stats(db: Session, vendor_ids=None) -> int:
+    """
+    Reconciles vendor_stats against sales/credits. Returns how many rows were created or corrected.
+    """
+    fixed = 0
+    for vid, values in _stats_from_base(db, vendor_ids).items():
+        st = db.get(VendorStats, vid)
+        if not st:
+            db.add(VendorStats(vendorId=vid, **values))
+            fixed += 1
+            continue
+        if any(abs((getattr(st, k) or 0) - v) > 1e-6 for k, v in values.items()):
+            for k, v in values.items():
+                setattr(st, k, v)
+            bump_data_version(db, vid)
+            fixed += 1
+    db.flush()
+    return fixed
+
+def _bump_stats(db: Session, vendor_id: int, **deltas):
+    """
+    Atomic in-SQL increments. Call BEFORE flushing the business row, so a missing
+    stats row is rebuilt from base tables without counting that row twice.
+    """
+    if not db.get(VendorStats, vendor_id):
+        rebuild_vendor_stats(db, [vendor_id])
+    bump_data_version(db, vendor_id)
+    db.query(VendorStats).filter(VendorStats.vendorId == vendor_id).update(
+        {getattr(VendorStats, k): getattr(VendorStats, k) + v for k, v in deltas.items()}
+    )
+
+# ---------- Sales daily rollups ----------
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d")
+
+def sale_day(value) -> str:
+    """
+    Free-form Sale.date -> "YYYY-MM-DD" ("" when it cannot be parsed).
+    """
+    head = str(value or "").strip()[:10]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(head, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return ""
+
+def sale_mode(value) -> str:
+    return str(value or "").strip().lower()
+
+def _rollup(sales) -> dict:
+    # (vendor_id, date, mode, amount) rows -> {(vendor_id, day, mode): [amount, count]}
+    out = {}
+    for vid, date, mode, amount in sales:
+        acc = out.setdefault((vid, sale_day(date), sale_mode(mode)), [0.0, 0])
+        acc[0] += float(amount)
+        acc[1] += 1
+    return out
+
+def _bump_sales_daily(db: Session, vendor_id: int, sales):
+    """
+    sales: (date, mode, amount) tuples. One INSERT ... ON CONFLICT DO UPDATE per call.
+    """
+    rows = [
+        {"vendorId": vid, "day": day, "mode": mode, "amount": amount, "count": count}
+        for (vid, day, mode), (amount, count) in _rollup((vendor_id, *s) for s in sales).items()
+    ]
+    if not rows:
+        return
+    day_deltas = defaultdict(float)
+    for r in rows:
+        day_deltas[r["day"]] += r["amount"]
+    _bump_revenue_stats(db, vendor_id, day_deltas)
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        for r in rows:
+            row = db.get(SalesDaily, (r["vendorId"], r["day"], r["mode"]))
+            if row:
+                row.amount += r["amount"]
+                row.count += r["count"]
+            else:
+                db.add(SalesDaily(**r))
+        db.flush()
+        return
+    stmt = upsert(SalesDaily)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SalesDaily.vendorId, SalesDaily.day, SalesDaily.mode],
+        set_={"amount": SalesDaily.amount + stmt.excluded.amount, "count": SalesDaily.count + stmt.excluded.count},
+    )
+    db.execute(stmt, rows)
+
+def rebuild_sales_daily(db: Session, vendor_ids=None, batch: int = 5000) -> int:
+    """
+    Recomputes sales_daily from the sales table (streamed). Returns rollup rows written.
+    """
+    q = select(Sale.vendorId, Sale.date, Sale.mode, Sale.amount).execution_options(yield_per=batch)
+    wipe = delete(SalesDaily)
+    if vendor_ids is not None:
+        q = q.where(Sale.vendorId.in_(vendor_ids))
+        wipe = wipe.where(SalesDaily.vendorId.in_(vendor_ids))
+
+    totals = _rollup(db.execute(q))
+    db.execute(wipe)
+    rows = [
+        {"vendorId": vid, "day": day, "mode": mode, "amount": amount, "count": count}
+        for (vid, day, mode), (amount, count) in totals.items()
+    ]
+    for i in range(0, len(rows), batch):
+        db.execute(insert(SalesDaily), rows[i:i + batch])
+    db.flush()
+    rebuild_revenue_stats(db, vendor_ids)
+    return len(rows)
+
+def rebuild_revenue_stats(db: Session, vendor_ids=None) -> int:
+    """
+    Recomputes revenue_stats (rolling weekly revenue stats) from sales_daily.
+    """
+    q = db.query(SalesDaily.vendorId, SalesDaily.day, func.sum(SalesDaily.amount)).filter(SalesDaily.day != "")
+    vendors_q = db.query(Vendor.id)
+    if vendor_ids is not None:
+        q = q.filter(SalesDaily.vendorId.in_(vendor_ids))
+        vendors_q = vendors_q.filter(Vendor.id.in_(vendor_ids))
+
+    days = defaultdict(list)
+    for vid, day, amount in q.group_by(SalesDaily.vendorId, SalesDaily.day).order_by(SalesDaily.vendorId, SalesDaily.day):
+        days[vid].append((day, float(amount)))
+
+    for (vid,) in vendors_q.all():
+        st = db.get(RevenueStats, vid)
+        if not st:
+            st = RevenueStats(vendorId=vid)
+            db.add(st)
+        st.weeks, st.mean, st.m2, st.sumXY = 0, 0.0, 0.0, 0.0
+        st.firstWeek = st.lastWeek = st.firstDay = st.lastDay = None
+        st.lastValue, st.activeDays, st.lastActiveDays = 0.0, 0, 0
+
+        weekly = defaultdict(lambda: [0.0, 0])
+        for day, amount in days.get(vid, []):
+            acc = weekly[week_index(day)]
+            acc[0] += amount
+            acc[1] += 1
+        for week in sorted(weekly):
+            apply_week(st, week, 0.0, weekly[week][0], weekly[week][1],
+                       lambda a, b: {w: tuple(weekly[w]) for w in range(a, b + 1) if w in weekly})
+        if days.get(vid):
+            st.firstDay, st.lastDay = days[vid][0][0], days[vid][-1][0]
+    bump_data_versions(db, vendor_ids)
+    db.flush()
+    return len(days)
+
+def _week_totals(db: Session, vendor_id: int, first_week: int, last_week: int) -> dict:
+    # {week: [revenue, active days]} from sales_daily
+    lo = week_start(first_week)
+    hi = (date.fromisoformat(week_start(last_week)) + timedelta(days=6)).isoformat()
+    out = defaultdict(lambda: [0.0, 0])
+    for day, amount in db.query(SalesDaily.day, func.sum(SalesDaily.amount)).filter(
+        SalesDaily.vendorId == vendor_id, SalesDaily.day >= lo, SalesDaily.day <= hi
+    ).group_by(SalesDaily.day):
+        acc = out[week_index(day)]
+        acc[0] += float(amount)
+        acc[1] += 1
+    return out
+
+def revenue_week_values(db: Session, vendor_id: int):
+    # week_values(lo, hi) for stability_features: a bounded sales_daily read, only when the window moved
+    return lambda a, b: {w: tuple(v) for w, v in _week_totals(db, vendor_id, a, b).items()}
+
+def _bump_revenue_stats(db: Session, vendor_id: int, day_deltas: dict):
+    """
+    Folds new sales ({day: amount}) into revenue_stats. Reads the affected weeks'
+    current rollups (and the weeks leaving the window, if it slides), so call it
+    BEFORE the sales_daily upsert.
+    """
+    days = sorted(d for d in day_deltas if d)
+    if not days:
+        return
+    st = db.get(RevenueStats, vendor_id)
+    if not st:
+        # vendor from before revenue_stats: rebuild its rollups + stats from the sales table first
+        rebuild_sales_daily(db, [vendor_id])
+        st = db.get(RevenueStats, vendor_id)
+
+    old = _week_totals(db, vendor_id, week_index(days[0]), week_index(days[-1]))
+    seen = set(r[0] for r in db.query(SalesDaily.day).filter(
+        SalesDaily.vendorId == vendor_id, SalesDaily.day.in_(days)
+    ).distinct())
+
+    week_delta = defaultdict(lambda: [0.0, 0])
+    for day in days:
+        acc = week_delta[week_index(day)]
+        acc[0] += day_deltas[day]
+        acc[1] += day not in seen
+
+    applied = {}
+
+    def week_values(a, b):
+        # rollups not upserted yet: add what this call already folded in
+        out = _week_totals(db, vendor_id, a, b)
+        for w, (amount, new_days) in applied.items():
+            if a <= w <= b:
+                out[w][0] += amount
+                out[w][1] += new_days
+        return {w: tuple(v) for w, v in out.items()}
+
+    for week in sorted(week_delta):
+        amount, new_days = week_delta[week]
+        apply_week(st, week, old[week][0], old[week][0] + amount, new_days, week_values)
+        applied[week] = (amount, new_days)
+
+    st.firstDay = min(st.firstDay or days[0], days[0])
+    st.lastDay = max(st.lastDay or days[-1], days[-1])
+
+def create_vendor(db: Session, data: SignupRequest, password_hash: str | None = None,
+                  vendor_id: int | None = None) -> Vendor:
+    # vendor_id: id handed out by the shard directory (shards.register_vendor)
     v = Vendor(
+        id=vendor_id,
         ownerName=data.ownerName.strip(),
         mobile=data.mobile.strip(),
-        passwordHash=hash_password(data.password),
+        passwordHash=password_hash or hash_password(data.password),
         businessType=data.businessType.strip(),
         city=data.city.strip(),
         upi=(data.upi.strip() if data.upi else None),
     )
     db.add(v)
-    db.commit()
-    db.refresh(v)
+    db.flush()
+    db.add(VendorStats(vendorId=v.id))
+    db.add(RevenueStats(vendorId=v.id))
+    db.flush()
+    bump_data_version(db, v.id)
     return v
 
 def get_vendor_by_mobile(db: Session, mobile: str):
@@ -29,60 +299,161 @@ def authenticate_vendor(db: Session, mobile: str, password: str):
         return None
     return v
 
+async def authenticate_vendor_async(db: Session, mobile: str, password: str):
+    # DB lookup on the threadpool, bcrypt on the dedicated bcrypt executor
+    v = await run_in_threadpool(get_vendor_by_mobile, db, mobile)
+    if not v:
+        return None
+    if not await verify_password_async(password, v.passwordHash):
+        return None
+    return v
+
 def create_customer(db: Session, vendor_id: int, name: str, phone: str | None, notes: str | None):
+    bump_data_version(db, vendor_id)
     c = Customer(vendorId=vendor_id, name=name.strip(), phone=(phone.strip() if phone else None), notes=(notes.strip() if notes else None))
     db.add(c)
-    db.commit()
-    db.refresh(c)
+    db.flush()
     return c
 
-def list_customers(db: Session, vendor_id: int):
-    return db.query(Customer).filter(Customer.vendorId == vendor_id).order_by(Customer.id.desc()).all()
+def _page(q, id_col, limit: int | None, after: int | None):
+    # keyset pagination, newest first: next page = rows with id < last id seen
+    if after is not None:
+        q = q.filter(id_col < after)
+    q = q.order_by(id_col.desc())
+    if limit is not None:
+        q = q.limit(limit)
+    return q.all()
+
+def bulk_create_customers(db: Session, vendor_id: int, items: list) -> list:
+    rows = [{
+        "vendorId": vendor_id, "name": i["name"].strip(),
+        "phone": (i["phone"].strip() if i.get("phone") else None),
+        "notes": (i["notes"].strip() if i.get("notes") else None),
+    } for i in items]
+    bump_data_version(db, vendor_id)
+    return db.execute(insert(Customer).returning(Customer.id, sort_by_parameter_order=True), rows).scalars().all()
+
+def list_customers(db: Session, vendor_id: int, limit: int | None = None, after: int | None = None):
+    # column-only query -> Row tuples, no ORM object hydration
+    q = db.query(Customer.id, Customer.vendorId, Customer.name, Customer.phone, Customer.notes).filter(
+        Customer.vendorId == vendor_id
+    )
+    return _page(q, Customer.id, limit, after)
 
 def delete_customer(db: Session, vendor_id: int, customer_id: int) -> bool:
     c = db.query(Customer).filter(Customer.vendorId == vendor_id, Customer.id == customer_id).first()
     if not c:
         return False
+    bump_data_version(db, vendor_id)
+
+    # Cascade credits explicitly (SQLite does not enforce ON DELETE CASCADE by default)
+    paid = Credit.status == "paid"
+    pending, recovered, count, paid_count = db.query(
+        func.coalesce(func.sum(case((paid, 0.0), else_=Credit.amount)), 0.0),
+        func.coalesce(func.sum(case((paid, Credit.amount), else_=0.0)), 0.0),
+        func.count(Credit.id),
+        func.coalesce(func.sum(case((paid, 1), else_=0)), 0),
+    ).filter(Credit.vendorId == vendor_id, Credit.customerId == customer_id).one()
+
+    if count:
+        _bump_stats(db, vendor_id, pendingUdhaar=-float(pending), recovered=-float(recovered),
+                    creditCount=-int(count), paidCount=-int(paid_count))
+        db.query(Credit).filter(Credit.vendorId == vendor_id, Credit.customerId == customer_id).delete(
+            synchronize_session=False
+        )
+
     db.delete(c)
-    db.commit()
+    db.flush()
     return True
 
 def create_credit(db: Session, vendor_id: int, customer_id: int, amount: float, due_date: str | None):
+    _bump_stats(db, vendor_id, pendingUdhaar=float(amount), creditCount=1)
     cr = Credit(vendorId=vendor_id, customerId=customer_id, amount=float(amount), dueDate=due_date, status="pending")
     db.add(cr)
-    db.commit()
-    db.refresh(cr)
+    db.flush()
     return cr
 
+def bulk_create_credits(db: Session, vendor_id: int, items: list) -> list:
+    """
+    items: dicts with customerId, amount, dueDate (+ optional status/paidDate for imports).
+    One multi-row INSERT ... RETURNING; ids come back in input order.
+    """
+    rows = [{
+        "vendorId": vendor_id, "customerId": int(i["customerId"]), "amount": float(i["amount"]),
+        "dueDate": i.get("dueDate") or None, "status": i.get("status") or "pending", "paidDate": i.get("paidDate") or None,
+    } for i in items]
+    paid = [r for r in rows if r["status"] == "paid"]
+    _bump_stats(
+        db, vendor_id,
+        pendingUdhaar=sum(r["amount"] for r in rows if r["status"] != "paid"),
+        recovered=sum(r["amount"] for r in paid),
+        creditCount=len(rows),
+        paidCount=len(paid),
+    )
+    return db.execute(insert(Credit).returning(Credit.id, sort_by_parameter_order=True), rows).scalars().all()
+
 def mark_credit_paid(db: Session, vendor_id: int, credit_id: int, paid_date: str | None):
     cr = db.query(Credit).filter(Credit.vendorId == vendor_id, Credit.id == credit_id).first()
     if not cr:
         return None
+    bump_data_version(db, vendor_id)
+    if cr.status != "paid":
+        _bump_stats(db, vendor_id, pendingUdhaar=-cr.amount, recovered=cr.amount, paidCount=1)
     cr.status = "paid"
     cr.paidDate = paid_date
-    db.commit()
-    db.refresh(cr)
+    db.flush()
     return cr
 
-def list_credits(db: Session, vendor_id: int):
-    return db.query(Credit).filter(Credit.vendorId == vendor_id).order_by(Credit.id.desc()).all()
+def list_credits(db: Session, vendor_id: int, limit: int | None = None, after: int | None = None,
+                 status: str | None = None, due_from: str | None = None, due_to: str | None = None):
+    q = db.query(
+        Credit.id, Credit.vendorId, Credit.customerId, Credit.amount, Credit.dueDate, Credit.status, Credit.paidDate
+    ).filter(Credit.vendorId == vendor_id)
+    if status:
+        q = q.filter(Credit.status == status)
+    if due_from:
+        q = q.filter(Credit.dueDate >= due_from)
+    if due_to:
+        q = q.filter(Credit.dueDate <= due_to)
+    return _page(q, Credit.id, limit, after)
 
 def create_sale(db: Session, vendor_id: int, date: str, mode: str, amount: float):
+    _bump_stats(db, vendor_id, totalSales=float(amount), saleCount=1)
+    _bump_sales_daily(db, vendor_id, [(date, mode, amount)])
     s = Sale(vendorId=vendor_id, date=date, mode=mode, amount=float(amount))
     db.add(s)
-    db.commit()
-    db.refresh(s)
+    db.flush()
     return s
 
-def list_sales(db: Session, vendor_id: int):
-    return db.query(Sale).filter(Sale.vendorId == vendor_id).order_by(Sale.id.desc()).all()
+def bulk_create_sales(db: Session, vendor_id: int, items: list) -> list:
+    """
+    items: dicts with date, mode, amount. Same single-statement insert as bulk_create_credits.
+    """
+    rows = [{"vendorId": vendor_id, "date": i["date"], "mode": i["mode"], "amount": float(i["amount"])} for i in items]
+    _bump_stats(db, vendor_id, totalSales=sum(r["amount"] for r in rows), saleCount=len(rows))
+    _bump_sales_daily(db, vendor_id, [(r["date"], r["mode"], r["amount"]) for r in rows])
+    return db.execute(insert(Sale).returning(Sale.id, sort_by_parameter_order=True), rows).scalars().all()
+
+def list_sales(db: Session, vendor_id: int, limit: int | None = None, after: int | None = None,
+               date_from: str | None = None, date_to: str | None = None, mode: str | None = None):
+    q = db.query(Sale.id, Sale.vendorId, Sale.date, Sale.mode, Sale.amount).filter(Sale.vendorId == vendor_id)
+    if date_from:
+        q = q.filter(Sale.date >= date_from)
+    if date_to:
+        q = q.filter(Sale.date <= date_to)
+    if mode:
+        q = q.filter(Sale.mode == mode)
+    return _page(q, Sale.id, limit, after)
 
 def kpis(db: Session, vendor_id: int):
-    total_sales = db.query(func.coalesce(func.sum(Sale.amount), 0.0)).filter(Sale.vendorId == vendor_id).scalar() or 0.0
-    pending = db.query(func.coalesce(func.sum(Credit.amount), 0.0)).filter(Credit.vendorId == vendor_id, Credit.status != "paid").scalar() or 0.0
-    recovered = db.query(func.coalesce(func.sum(Credit.amount), 0.0)).filter(Credit.vendorId == vendor_id, Credit.status == "paid").scalar() or 0.0
+    # single primary-key lookup; first hit for an old vendor builds the row
+    st = db.get(VendorStats, vendor_id)
+    if not st:
+        rebuild_vendor_stats(db, [vendor_id])
+        db.commit()
+        st = db.get(VendorStats, vendor_id)
     return {
-        "totalSales": float(total_sales),
-        "pendingUdhaar": float(pending),
-        "recovered": float(recovered),
-    }
\ No newline at end of file
+        "totalSales": float(st.totalSales),
+        "pendingUdhaar": float(st.pendingUdhaar),
+        "recovered": float(st.recovered),
+    }
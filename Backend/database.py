@@ -1,17 +1,121 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL, SHARD_URLS, DB_MODE, DB_PROFILE,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS, SQLITE_TEMP_STORE,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
+)
 
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+def sqlite_pragmas(profile: str = DB_PROFILE) -> dict:
+    """
+    Per-connection PRAGMAs for a storage profile. WAL lets readers run next to the
+    single writer, synchronous=NORMAL drops the fsync per commit (WAL stays crash safe),
+    busy_timeout makes a second writer wait instead of failing with "database is locked".
+    """
+    if profile != "tuned":
+        return {}
+    return {
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "cache_size": SQLITE_CACHE_SIZE,
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "temp_store": SQLITE_TEMP_STORE,
+    }
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+def _install_pragmas(sync_engine, pragmas: dict):
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cur.execute(f"PRAGMA {name}={value}")
+        cur.close()
+
+def _pool_args(url: str) -> dict:
+    # in-memory SQLite uses a single shared connection, pool sizing does not apply
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": not url.startswith("sqlite"),
+    }
+
+def build_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    is_sqlite = url.startswith("sqlite")
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+    eng = create_engine(url, connect_args=connect_args, **_pool_args(url))
+    if is_sqlite:
+        _install_pragmas(eng, sqlite_pragmas(profile))
+    return eng
+
+engine = build_engine()
+# expire_on_commit=False -> objects stay usable after the single route commit (no reload SELECT)
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+# shard 0 is the engine above; SHARD_URLS adds the others (routing lives in shards.py)
+shard_engines = [engine] + [build_engine(url) for url in SHARD_URLS]
+shard_sessions = [SessionLocal] + [
+    sessionmaker(bind=eng, autocommit=False, autoflush=False, expire_on_commit=False) for eng in shard_engines[1:]
+]
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    """
+    Session on the shard of the vendor the request is about (bearer token, else a
+    vendor_id path parameter); the home shard when there is none or only one shard.
+    """
+    if len(shard_sessions) == 1:
+        db = SessionLocal()
+    else:
+        from shards import request_shard  # lazy: shards imports this module
+        db = shard_sessions[request_shard(request)]()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def async_database_url(url: str) -> str:
+    if url.startswith("sqlite:///"):
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+async_engine = None
+AsyncSessionLocal = None
+async_shard_sessions = []
+
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), **_pool_args(DATABASE_URL))
+    if DATABASE_URL.startswith("sqlite"):
+        _install_pragmas(async_engine.sync_engine, sqlite_pragmas())
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    async_shard_sessions = [AsyncSessionLocal]
+    for _url in SHARD_URLS:
+        _eng = create_async_engine(async_database_url(_url), **_pool_args(_url))
+        if _url.startswith("sqlite"):
+            _install_pragmas(_eng.sync_engine, sqlite_pragmas())
+        async_shard_sessions.append(async_sessionmaker(_eng, autoflush=False, expire_on_commit=False))
+
+async def get_async_db(request: Request):
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database layer is off, set DB_MODE=async")
+    if len(async_shard_sessions) == 1:
+        factory = AsyncSessionLocal
+    else:
+        from shards import request_shard
+        factory = async_shard_sessions[request_shard(request)]
+    async with factory() as db:
+        yield db
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from config import RESPONSE_CACHE_MB
+from serialization import encode, negotiate
+from versions import data_version, data_version_async
+
+# Conditional GET for vendor read endpoints. The ETag is derived from the vendor's
+# data version (one primary-key read), so If-None-Match is answered with 304 before
+# any data table is queried; a miss is served from an LRU of rendered bodies keyed
+# by (vendor, route + query, version) before falling back to the handler.
+
+CACHE_CONTROL = "private, no-cache"   # browsers keep the body but always revalidate
+_SKIP_HEADERS = {"content-length", "content-type"}
+
+
+class ResponseCache:
+    """
+    LRU of rendered JSON bodies, bounded by their total size.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, body: bytes, headers: dict):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self._bytes -= len(old[0])
+            self._data[key] = (body, headers)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "hits": self.hits,
+                    "misses": self.misses, "not_modified": self.not_modified}
+
+
+response_cache = ResponseCache(int(RESPONSE_CACHE_MB * 1024 * 1024))
+
+
+def _resource(request: Request, media_type: str, salt: str) -> str:
+    query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+    return f"{request.url.path}?{query}#{media_type}#{salt}"
+
+
+def _etag(vendor_id: int, version: int, resource: str) -> str:
+    digest = hashlib.sha256(resource.encode("utf-8")).hexdigest()[:16]
+    return f'"{vendor_id}.{version}.{digest}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _lookup(request: Request, media_type: str, vendor_id: int, version: int, salt: str):
+    resource = _resource(request, media_type, salt)
+    etag = _etag(vendor_id, version, resource)
+    if _not_modified(request, etag):
+        response_cache.count_not_modified()
+        return etag, resource, Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept"})
+    if response_cache.max_bytes > 0:
+        cached = response_cache.get((vendor_id, resource, version))
+        if cached:
+            body, headers = cached
+            return etag, resource, Response(content=body, media_type=media_type, headers=headers)
+    return etag, resource, None
+
+
+def _render(media_type: str, vendor_id: int, version: int, resource: str, etag: str, data, scratch: Response) -> Response:
+    # plain dicts/lists straight to bytes (orjson / msgpack), no response_model pass
+    headers = {k: v for k, v in scratch.headers.items() if k.lower() not in _SKIP_HEADERS}
+    headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept"})
+    body = encode(data, media_type)
+    if response_cache.max_bytes > 0:
+        response_cache.put((vendor_id, resource, version), body, headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def cached_read(request: Request, db: Session, vendor_id: int, produce, salt: str = "") -> Response:
+    """
+    produce(response) builds the payload; it may set headers (e.g. X-Next-Cursor) on
+    the scratch response it gets. `salt` adds inputs that are not vendor data
+    (trust policy, current date) to the ETag.
+    """
+    # version first: a write landing in between only makes the cached body newer than its key
+    version = data_version(db, vendor_id)
+    media_type = negotiate(request)
+    etag, resource, hit = _lookup(request, media_type, vendor_id, version, salt)
+    if hit:
+        return hit
+    scratch = Response()
+    return _render(media_type, vendor_id, version, resource, etag, produce(scratch), scratch)
+
+
+async def cached_read_async(request: Request, db, vendor_id: int, produce, salt: str = "") -> Response:
+    """
+    Same for DB_MODE=async; produce is a coroutine function.
+    """
+    version = await data_version_async(db, vendor_id)
+    media_type = negotiate(request)
+    etag, resource, hit = _lookup(request, media_type, vendor_id, version, salt)
+    if hit:
+        return hit
+    scratch = Response()
+    return _render(media_type, vendor_id, version, resource, etag, await produce(scratch), scratch)
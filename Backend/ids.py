@@ -0,0 +1,68 @@
+from sqlalchemy import text
+
+from config import SHARD_URLS
+
+# Row ids that stay unique across shards, so a vendor moved by rebalance.py keeps the
+# ids its clients and its chain payloads already use. With SHARD_URLS set, customers,
+# credits, sales, trust score snapshots and chain blocks take
+#   id = n * SHARD_ID_STRIDE + shard
+# where n comes from that shard's id_sequences row, bumped on the inserting connection
+# (a rolled back insert gives its n back). With a single database ids stay plain
+# autoincrement.
+
+SHARD_ID_STRIDE = 64   # max shards; never change it once sharded data exists
+
+_BUMP = text("UPDATE id_sequences SET next_value = next_value + 1 WHERE name = :name RETURNING next_value")
+_SEED = text("INSERT INTO id_sequences (name, next_value) VALUES (:name, :value) ON CONFLICT (name) DO NOTHING")
+_RAISE = text("""
+    INSERT INTO id_sequences (name, next_value) VALUES (:name, :value)
+    ON CONFLICT (name) DO UPDATE SET next_value = CASE
+        WHEN excluded.next_value > id_sequences.next_value THEN excluded.next_value
+        ELSE id_sequences.next_value END
+""")
+
+_engine_shards = None
+
+
+def engine_shard(engine) -> int:
+    """
+    Shard index of a sync engine (or of the sync engine behind an async shard).
+    """
+    global _engine_shards
+    if _engine_shards is None:
+        from database import shard_engines, async_shard_sessions  # lazy: models imports this module
+        found = {eng: i for i, eng in enumerate(shard_engines)}
+        for i, factory in enumerate(async_shard_sessions):
+            found[factory.kw["bind"].sync_engine] = i
+        _engine_shards = found
+    return _engine_shards[engine]
+
+
+def _next_id(conn, table: str) -> int:
+    n = conn.execute(_BUMP, {"name": table}).scalar()
+    if n is None:
+        # first sharded insert into this table here: start above the ids already stored
+        top = conn.execute(text(f"SELECT MAX(id) FROM {table}")).scalar() or 0
+        conn.execute(_SEED, {"name": table, "value": top // SHARD_ID_STRIDE})
+        n = conn.execute(_BUMP, {"name": table}).scalar()
+    return n * SHARD_ID_STRIDE + engine_shard(conn.engine)
+
+
+def sharded_id(table: str):
+    """
+    Column default for the id of `table`: shard-tagged when sharded, None (plain
+    autoincrement) otherwise.
+    """
+    if not SHARD_URLS:
+        return None
+    if len(SHARD_URLS) + 1 > SHARD_ID_STRIDE:
+        raise RuntimeError(f"at most {SHARD_ID_STRIDE} shards")
+    return lambda context: _next_id(context.connection, table)
+
+
+def raise_sequence(db, table: str, above_id: int):
+    """
+    Makes the shard's next id for `table` larger than `above_id` (rows copied in
+    with their ids must stay older than anything inserted after them).
+    """
+    db.execute(_RAISE, {"name": table, "value": above_id // SHARD_ID_STRIDE})
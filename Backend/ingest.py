@@ -0,0 +1,41 @@
+from sqlalchemy.orm import Session
+
+from crud import bulk_create_customers, bulk_create_credits, bulk_create_sales
+from blockchain import add_batch_block
+
+# Bulk insert + one batch block per call. No commit: caller decides the transaction.
+# Block items are hashed exactly like the single-record ADD_* payloads.
+
+
+def ingest_customers(db: Session, vendor_id: int, items: list):
+    ids = bulk_create_customers(db, vendor_id, items)
+    block, _ = add_batch_block(db, vendor_id, "BULK_ADD_CUSTOMER", [{
+        "customerId": cid,
+        "name": i["name"].strip(),
+        "phone": (i["phone"].strip() if i.get("phone") else None),
+        "notes": (i["notes"].strip() if i.get("notes") else None)
+    } for cid, i in zip(ids, items)])
+    return ids, block
+
+
+def ingest_credits(db: Session, vendor_id: int, items: list):
+    ids = bulk_create_credits(db, vendor_id, items)
+    block, _ = add_batch_block(db, vendor_id, "BULK_ADD_CREDIT", [{
+        "creditId": cid,
+        "customerId": int(i["customerId"]),
+        "amount": float(i["amount"]),
+        "dueDate": str(i.get("dueDate") or None),
+        "status": i.get("status") or "pending"
+    } for cid, i in zip(ids, items)])
+    return ids, block
+
+
+def ingest_sales(db: Session, vendor_id: int, items: list):
+    ids = bulk_create_sales(db, vendor_id, items)
+    block, _ = add_batch_block(db, vendor_id, "BULK_ADD_SALE", [{
+        "saleId": sid,
+        "date": str(i["date"]),
+        "mode": i["mode"],
+        "amount": float(i["amount"])
+    } for sid, i in zip(ids, items)])
+    return ids, block
@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from shards import vendor_session
+from models import Customer, Credit, Sale, ChainEntry
+from blockchain import iter_chain_rows
+from auth import get_current_vendor, VendorPrincipal
+from ingest import ingest_customers, ingest_credits, ingest_sales
+from chain_writer import chain_writer
+
+router = APIRouter(tags=["Import / Export"])
+
+STREAM_BATCH = 1000
+IMPORT_CHUNK = 2000
+
+# table -> (model, vendor column, exported columns)
+EXPORT_TABLES = {
+    "customers": (Customer, "vendorId", ["id", "name", "phone", "notes", "createdAt"]),
+    "credits": (Credit, "vendorId", ["id", "customerId", "amount", "dueDate", "status", "paidDate", "createdAt"]),
+    "sales": (Sale, "vendorId", ["id", "date", "mode", "amount", "createdAt"]),
+    "chain": (ChainEntry, "vendor_id", ["id", "action", "payload_hash", "prev_hash", "hash", "createdAt"]),
+}
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _iter_rows(vendor_id: int, table: str):
+    """
+    Server-side cursor (yield_per) over one table -> lists of row tuples; memory stays flat.
+    Opens its own session because the response outlives the request dependency.
+    """
+    model, vendor_col, cols = EXPORT_TABLES[table]
+    if model is ChainEntry:
+        # archived segments first, then the live rows
+        db = vendor_session(vendor_id)
+        try:
+            yield from iter_chain_rows(db, vendor_id, chunk_size=STREAM_BATCH)
+        finally:
+            db.close()
+        return
+    stmt = (
+        select(*[getattr(model, c) for c in cols])
+        .where(getattr(model, vendor_col) == vendor_id)
+        .order_by(model.id.asc())
+        .execution_options(yield_per=STREAM_BATCH)
+    )
+    db = vendor_session(vendor_id)
+    try:
+        for part in db.execute(stmt).partitions():
+            yield part
+    finally:
+        db.close()
+
+
+def stream_jsonl(vendor_id: int, tables: list):
+    for table in tables:
+        cols = EXPORT_TABLES[table][2]
+        for part in _iter_rows(vendor_id, table):
+            yield "".join(
+                json.dumps({"table": table, **{c: _cell(v) for c, v in zip(cols, row)}}) + "\n"
+                for row in part
+            ).encode("utf-8")
+
+
+def stream_csv(vendor_id: int, table: str):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_TABLES[table][2])
+    for part in _iter_rows(vendor_id, table):
+        writer.writerows([_cell(v) for v in row] for row in part)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+@router.get("/export")
+def export_ledger(
+    format: str = Query("jsonl", pattern="^(jsonl|csv)$"),
+    tables: str = "customers,credits,sales,chain",
+    v: VendorPrincipal = Depends(get_current_vendor)
+):
+    names = [t.strip() for t in tables.split(",") if t.strip()]
+    unknown = [t for t in names if t not in EXPORT_TABLES]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {unknown}" if unknown else "No tables")
+
+    if format == "csv":
+        if len(names) != 1:
+            raise HTTPException(status_code=400, detail="CSV export needs exactly one table")
+        body, media, ext = stream_csv(v.id, names[0]), "text/csv", "csv"
+    else:
+        body, media, ext = stream_jsonl(v.id, names), "application/x-ndjson", "jsonl"
+
+    filename = f"trustchain_vendor_{v.id}_{'_'.join(names)}.{ext}"
+    return StreamingResponse(body, media_type=media, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+_INGEST = {"customers": ingest_customers, "credits": ingest_credits, "sales": ingest_sales}
+
+
+def _import_chunk_tx(db: Session, vendor_id: int, table: str, items: list) -> list:
+    ids, _ = _INGEST[table](db, vendor_id, items)
+    return ids
+
+
+class _Importer:
+    """
+    Buffers parsed rows per table and pushes them through the bulk ingest path in
+    IMPORT_CHUNK sized transactions (one chain writer job each). Customer ids from
+    the file are remapped to the new ids so imported credits keep pointing at the
+    right customer; any other customer id must be one the vendor already has.
+    """
+
+    def __init__(self, vendor_id: int):
+        self.vendor_id = vendor_id
+        self.buffers = {"customers": [], "credits": [], "sales": []}
+        self.inserted = {"customers": 0, "credits": 0, "sales": 0}
+        self.customer_ids = {}
+        self.skipped = 0
+
+    def add(self, table: str, row: dict):
+        if table not in self.buffers:
+            # chain entries are never imported: the import records its own batch blocks
+            self.skipped += 1
+            return
+        self.buffers[table].append(row)
+        if len(self.buffers[table]) >= IMPORT_CHUNK:
+            self.flush(table)
+
+    def flush(self, table: str):
+        items = self.buffers[table]
+        if not items:
+            return
+        if table == "credits":
+            self.flush("customers")
+            self._check_customers(items)
+            for i in items:
+                i["customerId"] = self.customer_ids[str(i.get("customerId"))]
+        ids = chain_writer.run(self.vendor_id, _import_chunk_tx, self.vendor_id, table, items)
+        if table == "customers":
+            for i, new_id in zip(items, ids):
+                if i.get("id") not in (None, ""):
+                    self.customer_ids[str(i["id"])] = new_id
+        self.inserted[table] += len(items)
+        self.buffers[table] = []
+
+    def _check_customers(self, items: list):
+        # a credit may only point at a customer from this file or one the vendor already has
+        unknown = {str(i.get("customerId")) for i in items} - self.customer_ids.keys()
+        if not unknown:
+            return
+        wanted = {int(c) for c in unknown if c.isdigit()}
+        db = vendor_session(self.vendor_id)
+        try:
+            owned = {str(cid) for (cid,) in db.query(Customer.id).filter(
+                Customer.vendorId == self.vendor_id, Customer.id.in_(wanted))}
+        finally:
+            db.close()
+        missing = unknown - owned
+        if missing:
+            raise ValueError(f"credits refer to unknown customers {sorted(missing)[:10]}")
+        self.customer_ids.update({c: int(c) for c in owned})
+
+    def finish(self):
+        for table in ("customers", "credits", "sales"):
+            self.flush(table)
+
+
+@router.post("/import")
+def import_ledger(
+    file: UploadFile = File(...),
+    format: str | None = Query(None, pattern="^(jsonl|csv)$"),
+    table: str | None = Query(None, description="target table for CSV files"),
+    v: VendorPrincipal = Depends(get_current_vendor)
+):
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "jsonl")
+    if fmt == "csv" and table not in ("customers", "credits", "sales"):
+        raise HTTPException(status_code=400, detail="CSV import needs ?table=customers|credits|sales")
+
+    started = time.perf_counter()
+    importer = _Importer(v.id)
+    text_stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    line_no = 0
+    try:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(text_stream), start=2):
+                importer.add(table, row)
+        else:
+            for line_no, line in enumerate(text_stream, start=1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                importer.add(row.pop("table", table), row)
+        importer.finish()
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail={
+            "error": f"line {line_no}: {e.__class__.__name__}: {e}",
+            "inserted": importer.inserted,
+        })
+    except IntegrityError as e:
+        # the failing chunk was rolled back; chunks counted in "inserted" are committed
+        raise HTTPException(status_code=400, detail={
+            "error": f"line {line_no}: IntegrityError: {e.orig}",
+            "inserted": importer.inserted,
+        })
+    finally:
+        text_stream.detach()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(importer.inserted.values())
+    return {
+        "rows": rows,
+        "inserted": importer.inserted,
+        "skipped": importer.skipped,
+        "elapsed_sec": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+    }
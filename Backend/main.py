@@ -1,14 +1,30 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from database import engine, Base
+from database import Base, shard_engines, async_shard_sessions
 from routes import router
-from config import CORS_ORIGINS, UPLOAD_DIR
+from config import CORS_ORIGINS, UPLOAD_DIR, DB_MODE, PHOTO_MAX_BYTES
 from tamper import router as tamper_router
+from portfolio import router as portfolio_router
+from ledger_io import router as ledger_io_router
+from rollups import router as rollups_router
+from media import MediaFiles, UploadSizeLimit, FORM_OVERHEAD_BYTES
+from serialization import FastJSONResponse
+from observability import router as metrics_router, MetricsMiddleware, instrument_engine
+from shards import is_sharded, sync_directory
+from audit import shutdown_pool as shutdown_audit_pool
 
-app = FastAPI(title="TrustChain Local API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # worker processes of /chain/verify, if an audit ever forked them
+    shutdown_audit_pool()
+
+
+app = FastAPI(title="TrustChain Local API", default_response_class=FastJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,11 +33,37 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadSizeLimit, paths=["/profile/photo"], limit=PHOTO_MAX_BYTES + FORM_OVERHEAD_BYTES)
+app.add_middleware(MetricsMiddleware)
 
-Base.metadata.create_all(bind=engine)
+for engine in shard_engines:
+    instrument_engine(engine)
+for factory in async_shard_sessions:
+    instrument_engine(factory.kw["bind"].sync_engine)
+
+for engine in shard_engines:
+    Base.metadata.create_all(bind=engine)
+    # create_all() skips new indexes on tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(bind=engine, checkfirst=True)
+
+# vendors that were created before sharding (or before a shard was added) get directory entries
+if is_sharded():
+    sync_directory()
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+app.mount("/uploads", MediaFiles(directory=UPLOAD_DIR), name="uploads")
+
+# DB_MODE=async: the async handlers shadow their sync twins in routes.py
+if DB_MODE == "async":
+    from routes_async import router as async_router
+    app.include_router(async_router)
 
+# /chain/verify/me must be matched before /chain/verify/{vendor_id}
+app.include_router(router)
 app.include_router(tamper_router)
-app.include_router(router)
\ No newline at end of file
+app.include_router(portfolio_router)
+app.include_router(ledger_io_router)
+app.include_router(rollups_router)
+app.include_router(metrics_router)
@@ -0,0 +1,196 @@
+"""
+Maintenance commands (run from Backend/):
+
+    python manage.py rebuild-stats [--vendor ID]
+    python manage.py rebuild-rollups [--vendor ID]
+    python manage.py score-portfolio
+    python manage.py portfolio [--run ID] [--limit N] [--offset N]
+    python manage.py archive-chain [--vendor ID] [--keep N] [--vacuum]
+    python manage.py migrate-chain-storage [--to text|binary] [--chunk N] [--vacuum]
+    python manage.py shards
+    python manage.py move-vendor --vendor ID --to SHARD
+    python manage.py rebalance [--max N] [--dry-run]
+
+With SHARD_URLS set, commands that touch vendor data run on every shard
+(or on the vendor's shard when --vendor is given).
+"""
+import argparse
+
+from sqlalchemy import text
+
+from database import Base, SessionLocal, shard_engines, shard_sessions
+import models  # noqa: F401  (registers tables on Base)
+from crud import rebuild_vendor_stats, rebuild_sales_daily
+from portfolio import recompute_portfolio_all, portfolio_page_all
+from archive import archive_all
+from shards import shard_for, sync_directory, vendor_counts
+from rebalance import move_vendor, plan_rebalance
+from chain_storage import migrate_chain_storage
+from config import CHAIN_ARCHIVE_KEEP_RANGES, CHAIN_STORAGE
+
+
+def _shard_dbs(vendor_id=None):
+    # (shard, session) for every shard, or just the one holding vendor_id
+    shards = [shard_for(vendor_id)] if vendor_id else range(len(shard_sessions))
+    for shard in shards:
+        db = shard_sessions[shard]()
+        try:
+            yield shard, db
+        finally:
+            db.close()
+
+
+def cmd_rebuild_stats(args):
+    fixed = 0
+    for _, db in _shard_dbs(args.vendor):
+        fixed += rebuild_vendor_stats(db, [args.vendor] if args.vendor else None)
+        db.commit()
+    print(f"vendor_stats reconciled, {fixed} row(s) created/corrected")
+
+
+def cmd_rebuild_rollups(args):
+    rows = 0
+    for _, db in _shard_dbs(args.vendor):
+        rows += rebuild_sales_daily(db, [args.vendor] if args.vendor else None)
+        db.commit()
+    print(f"sales_daily rebuilt, {rows} rollup row(s)")
+
+
+def cmd_score_portfolio(args):
+    run = recompute_portfolio_all()
+    print(f"run {run['run_id']}: {run['vendors']} vendor(s) scored in {run['elapsed_ms']} ms")
+
+
+def cmd_portfolio(args):
+    page = portfolio_page_all(args.run, args.limit, args.offset)
+    if page is None:
+        print("no portfolio run yet, use score-portfolio first")
+        return
+    print(f"run {page['run_id']} ({page['total']} vendors)")
+    for item in page["items"]:
+        print(f"{item['vendor_id']:>8}  {item['score']:>3}  {item['tag']:<9}  {item['businessType']}")
+
+
+def cmd_archive_chain(args):
+    total = 0
+    for _, db in _shard_dbs(args.vendor):
+        moved = archive_all(db, [args.vendor] if args.vendor else None, args.keep)
+        for vid, n in moved.items():
+            if n:
+                print(f"vendor {vid}: {n} block(s) archived")
+        total += sum(moved.values())
+    print(f"{total} block(s) moved to segment files")
+    if args.vacuum:
+        _vacuum()
+
+
+def cmd_migrate_chain_storage(args):
+    converted = sum(migrate_chain_storage(eng, args.to, args.chunk) for eng in shard_engines)
+    print(f"chain_entries: {converted} row(s) converted to {args.to} storage")
+    if args.to != CHAIN_STORAGE:
+        print(f"note: set CHAIN_STORAGE={args.to} so new blocks are written the same way")
+    if args.vacuum:
+        _vacuum()
+
+
+def cmd_shards(args):
+    added = sync_directory()
+    if added:
+        print(f"{added} vendor(s) added to the shard directory")
+    db = SessionLocal()
+    try:
+        counts = vendor_counts(db)
+        moving = db.query(models.VendorShard.vendorId).filter(models.VendorShard.state == "moving").all()
+    finally:
+        db.close()
+    for shard, (eng, n) in enumerate(zip(shard_engines, counts)):
+        print(f"shard {shard}: {n:>8} vendor(s)  {eng.url.render_as_string(hide_password=True)}")
+    for (vid,) in moving:
+        print(f"vendor {vid}: move in progress or interrupted (re-run move-vendor)")
+
+
+def cmd_move_vendor(args):
+    sync_directory()
+    r = move_vendor(args.vendor, args.to)
+    if not r["moved"]:
+        print(f"vendor {args.vendor} is already on shard {args.to}")
+        return
+    print(f"vendor {r['vendor_id']}: shard {r['from']} -> {r['to']}, {r['blocks']} block(s), "
+          f"{r['customers']} customer(s), {r['credits']} credit(s), {r['sales']} sale(s), verified")
+
+
+def cmd_rebalance(args):
+    sync_directory()
+    moves = plan_rebalance(args.max)
+    if not moves:
+        print("shards are balanced")
+    for vid, src, dst in moves:
+        if args.dry_run:
+            print(f"vendor {vid}: shard {src} -> {dst}")
+        else:
+            r = move_vendor(vid, dst)
+            print(f"vendor {vid}: shard {src} -> {dst}, {r['blocks']} block(s), verified")
+
+
+def _vacuum():
+    # deleted / shrunk rows only give space back to the file after a VACUUM
+    for eng in shard_engines:
+        with eng.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    print("database vacuumed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TrustChain maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-stats", help="rebuild vendor_stats from sales/credits")
+    p.add_argument("--vendor", type=int, default=None)
+    p.set_defaults(func=cmd_rebuild_stats)
+
+    p = sub.add_parser("rebuild-rollups", help="backfill sales_daily from the sales table")
+    p.add_argument("--vendor", type=int, default=None)
+    p.set_defaults(func=cmd_rebuild_rollups)
+
+    p = sub.add_parser("score-portfolio", help="batch trust scores for all vendors")
+    p.set_defaults(func=cmd_score_portfolio)
+
+    p = sub.add_parser("portfolio", help="print a scored portfolio page, best first")
+    p.add_argument("--run", type=int, default=None)
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--offset", type=int, default=0)
+    p.set_defaults(func=cmd_portfolio)
+
+    p = sub.add_parser("archive-chain", help="move old verified chain ranges into segment files")
+    p.add_argument("--vendor", type=int, default=None)
+    p.add_argument("--keep", type=int, default=CHAIN_ARCHIVE_KEEP_RANGES, help="newest sealed ranges kept live")
+    p.add_argument("--vacuum", action="store_true")
+    p.set_defaults(func=cmd_archive_chain)
+
+    p = sub.add_parser("migrate-chain-storage", help="convert chain_entries between text and binary storage")
+    p.add_argument("--to", choices=["text", "binary"], default=CHAIN_STORAGE)
+    p.add_argument("--chunk", type=int, default=5000)
+    p.add_argument("--vacuum", action="store_true")
+    p.set_defaults(func=cmd_migrate_chain_storage)
+
+    p = sub.add_parser("shards", help="vendor count per shard (fills in missing directory entries)")
+    p.set_defaults(func=cmd_shards)
+
+    p = sub.add_parser("move-vendor", help="move a vendor and its chain to another shard")
+    p.add_argument("--vendor", type=int, required=True)
+    p.add_argument("--to", type=int, required=True)
+    p.set_defaults(func=cmd_move_vendor)
+
+    p = sub.add_parser("rebalance", help="move vendors until shards hold about as many each")
+    p.add_argument("--max", type=int, default=None, help="at most N moves")
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_rebalance)
+
+    args = parser.parse_args()
+    for eng in shard_engines:
+        Base.metadata.create_all(bind=eng)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse
+
+from config import UPLOAD_DIR, PHOTO_MAX_BYTES, PHOTO_CHUNK_BYTES, PHOTO_THUMB_SIZES
+
+try:
+    from PIL import Image   # optional: without Pillow no thumbnails are made
+except ImportError:
+    Image = None
+
+# Photos are stored by content: uploads/photos/<sha256>.<ext>, thumbnails as
+# uploads/thumbs/<sha256>_<size>.<ext>. A file never changes once written, so the
+# UPLOAD_PHOTO block's hash keeps pointing at the exact bytes and clients may cache forever.
+PHOTO_DIR = "photos"
+THUMB_DIR = "thumbs"
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+)
+_CONTENT_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+_HASHED_NAME = re.compile(r"^([0-9a-f]{64}(?:_\d+)?)\.[a-z]+$")
+_PHOTO_URL = re.compile(rf"^/uploads/{PHOTO_DIR}/([0-9a-f]{{64}})(\.[a-z]+)$")
+
+# room for the multipart boundaries and part headers around the photo itself
+FORM_OVERHEAD_BYTES = 16 * 1024
+
+_thumb_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbs")
+
+
+def _sniff(head: bytes) -> str | None:
+    # the extension is taken from the bytes, so the same image always gets the same name
+    for magic, ext in _SIGNATURES:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def photo_url(sha: str, ext: str) -> str:
+    return f"/uploads/{PHOTO_DIR}/{sha}{ext}"
+
+
+def thumb_url(sha: str, ext: str, size: int) -> str:
+    return f"/uploads/{THUMB_DIR}/{sha}_{size}{ext}"
+
+
+def thumb_urls(url: str | None) -> dict:
+    """
+    {size: thumbnail url} for a content-addressed photo url; empty for legacy photos
+    or when thumbnails are off (no Pillow / no PHOTO_THUMB_SIZES).
+    """
+    match = _PHOTO_URL.match(url or "")
+    if not match or Image is None:
+        return {}
+    return {str(size): thumb_url(match.group(1), match.group(2), size) for size in PHOTO_THUMB_SIZES}
+
+
+def store_photo(upload: UploadFile) -> dict:
+    """
+    Streams the upload to a temp file in PHOTO_CHUNK_BYTES chunks, hashing as it goes,
+    then moves it to its content address (an identical photo is stored once).
+    Rejects files over PHOTO_MAX_BYTES (413) and anything that is not jpg/png/webp (400).
+    """
+    folder = os.path.join(UPLOAD_DIR, PHOTO_DIR)
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size, ext = 0, None
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := upload.file.read(PHOTO_CHUNK_BYTES):
+                if ext is None:
+                    ext = _sniff(chunk)
+                    if ext is None:
+                        raise HTTPException(status_code=400, detail="Only jpg/jpeg/png/webp allowed")
+                size += len(chunk)
+                if size > PHOTO_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Photo larger than {PHOTO_MAX_BYTES} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+        if ext is None:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        sha = digest.hexdigest()
+        path = os.path.join(folder, sha + ext)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    schedule_thumbnails(path, sha, ext)
+    return {"sha256": sha, "size": size, "contentType": _CONTENT_TYPES[ext], "url": photo_url(sha, ext)}
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimit:
+    """
+    Pure ASGI middleware: a POST to one of `paths` with a body over `limit` bytes gets a
+    413 before Starlette spools the multipart form to disk. Content-Length is checked up
+    front; a chunked body is counted as it arrives. store_photo still enforces the exact
+    PHOTO_MAX_BYTES on the file part.
+    """
+
+    def __init__(self, app, paths, limit: int):
+        self.app = app
+        self.paths = set(paths)
+        self.limit = limit
+
+    async def _reject(self, send):
+        response = JSONResponse({"detail": f"Photo larger than {PHOTO_MAX_BYTES} bytes"}, status_code=413)
+        await response({"type": "http"}, None, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > self.limit:
+            return await self._reject(send)
+
+        state = {"received": 0, "over": False, "started": False}
+
+        async def counted_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > self.limit:
+                    state["over"] = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # the app's answer to a cut-off body (a 400 from the form parser) is dropped
+            if state["over"]:
+                return
+            state["started"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, counted_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if state["over"] and not state["started"]:
+            await self._reject(send)
+
+
+# ---------- thumbnails ----------
+
+def _make_thumbnails(path: str, sha: str, ext: str):
+    folder = os.path.join(UPLOAD_DIR, THUMB_DIR)
+    os.makedirs(folder, exist_ok=True)
+    with Image.open(path) as img:
+        img.load()
+        for size in PHOTO_THUMB_SIZES:
+            target = os.path.join(folder, f"{sha}_{size}{ext}")
+            if os.path.exists(target):
+                continue
+            thumb = img.copy()
+            thumb.thumbnail((size, size))
+            if ext == ".jpg" and thumb.mode not in ("RGB", "L"):
+                thumb = thumb.convert("RGB")
+            tmp = target + ".part"
+            thumb.save(tmp, format=_CONTENT_TYPES[ext].split("/")[1].upper())
+            os.replace(tmp, target)
+
+
+def schedule_thumbnails(path: str, sha: str, ext: str):
+    """
+    Downscales on a background thread; the upload response does not wait for it.
+    """
+    if Image is None or not PHOTO_THUMB_SIZES:
+        return None
+    return _thumb_pool.submit(_make_thumbnails, path, sha, ext)
+
+
+# ---------- serving ----------
+
+class MediaFiles(StaticFiles):
+    """
+    /uploads: content-addressed files get their hash as a strong ETag and are cacheable
+    forever; anything else (legacy vendor_<id>.<ext> photos) must be revalidated.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        match = _HASHED_NAME.match(os.path.basename(full_path))
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        if match:
+            response.headers["etag"] = f'"{match.group(1)}"'
+            response.headers["cache-control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["cache-control"] = "no-cache"
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
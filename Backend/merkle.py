@@ -0,0 +1,51 @@
+import hashlib
+from typing import List
+from observability import count_hashes
+
+def _pair(left: str, right: str) -> str:
+    return hashlib.sha256(f"{left}{right}".encode("utf-8")).hexdigest()
+
+def merkle_root(leaves: List[str]) -> str:
+    """
+    Root over hex digests. Odd level -> last node is paired with itself.
+    """
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+
+    level = list(leaves)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        count_hashes(len(level) // 2)
+        level = [_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0]
+
+def merkle_proof(leaves: List[str], index: int) -> List[dict]:
+    """
+    Audit path for leaves[index], leaf to root: one {"hash", "side"} step per level,
+    side = where the sibling sits. Same tree shape as merkle_root().
+    """
+    path = []
+    level = list(leaves)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        sibling = index ^ 1
+        path.append({"hash": level[sibling], "side": "left" if sibling < index else "right"})
+        count_hashes(len(level) // 2)
+        level = [_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+        index //= 2
+    return path
+
+def verify_proof(leaf: str, proof: List[dict], root: str) -> bool:
+    """
+    Standalone check of an inclusion proof against a published root (hashlib only,
+    no DB), e.g. on a lender's side with the JSON from /chain/proof/{block_id}.
+    """
+    node = leaf
+    for step in proof:
+        if step["side"] == "left":
+            node = hashlib.sha256(f"{step['hash']}{node}".encode("utf-8")).hexdigest()
+        else:
+            node = hashlib.sha256(f"{node}{step['hash']}".encode("utf-8")).hexdigest()
+    return node == root
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from database import Base
+from chain_storage import Digest, Timestamp
+from ids import sharded_id
 from datetime import datetime
 
 class Vendor(Base):
@@ -17,16 +19,18 @@ class Vendor(Base):
 
 class Customer(Base):
     __tablename__ = "customers"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, default=sharded_id("customers"))
     vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String, nullable=False)
     phone = Column(String, nullable=True)
     notes = Column(String, nullable=True)
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_customers_vendor_id_id", "vendorId", "id"),)
+
 class Credit(Base):
     __tablename__ = "credits"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, default=sharded_id("credits"))
     vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
     customerId = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True)
     amount = Column(Float, nullable=False)
@@ -35,15 +39,67 @@ class Credit(Base):
     paidDate = Column(String, nullable=True)
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_credits_vendor_id_id", "vendorId", "id"),
+        Index("ix_credits_vendor_status", "vendorId", "status"),
+    )
+
 class Sale(Base):
     __tablename__ = "sales"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, default=sharded_id("sales"))
     vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
     date = Column(String, nullable=False)
     mode = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_sales_vendor_id_id", "vendorId", "id"),)
+
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+    # day = YYYY-MM-DD, or "" for unparseable sale dates (so counts still add up to vendor_stats)
+    vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(String(10), primary_key=True)
+    mode = Column(String, primary_key=True)
+    amount = Column(Float, default=0.0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+class RevenueStats(Base):
+    __tablename__ = "revenue_stats"
+    # running (Welford) stats of weekly revenue over the last STABILITY_WINDOW_WEEKS weeks up to
+    # lastWeek (zero weeks included, never before firstWeek); week numbers count from Monday 2000-01-03
+    vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), primary_key=True)
+    weeks = Column(Integer, default=0, nullable=False)
+    mean = Column(Float, default=0.0, nullable=False)
+    m2 = Column(Float, default=0.0, nullable=False)
+    sumXY = Column(Float, default=0.0, nullable=False)
+    firstWeek = Column(Integer, nullable=True)
+    lastWeek = Column(Integer, nullable=True)
+    lastValue = Column(Float, default=0.0, nullable=False)
+    activeDays = Column(Integer, default=0, nullable=False)
+    lastActiveDays = Column(Integer, default=0, nullable=False)
+    firstDay = Column(String(10), nullable=True)
+    lastDay = Column(String(10), nullable=True)
+    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+class VendorStats(Base):
+    __tablename__ = "vendor_stats"
+    vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), primary_key=True)
+    totalSales = Column(Float, default=0.0, nullable=False)
+    saleCount = Column(Integer, default=0, nullable=False)
+    pendingUdhaar = Column(Float, default=0.0, nullable=False)
+    recovered = Column(Float, default=0.0, nullable=False)
+    creditCount = Column(Integer, default=0, nullable=False)
+    paidCount = Column(Integer, default=0, nullable=False)
+    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+class VendorVersion(Base):
+    __tablename__ = "vendor_versions"
+    # bumped once per transaction that changes anything of the vendor (crud writes, chain blocks);
+    # read endpoints derive their ETag from it
+    vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
 class TrustPolicy(Base):
     __tablename__ = "trust_policies"
     id = Column(Integer, primary_key=True)
@@ -52,13 +108,144 @@ class TrustPolicy(Base):
     maxScore = Column(Integer, default=95)
     weightsJson = Column(Text, default="{}")
 
+class TrustScoreRun(Base):
+    __tablename__ = "trust_score_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    vendors = Column(Integer, default=0, nullable=False)
+    elapsedMs = Column(Integer, default=0, nullable=False)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class TrustScoreSnapshot(Base):
+    __tablename__ = "trust_score_snapshots"
+    id = Column(Integer, primary_key=True, index=True, default=sharded_id("trust_score_snapshots"))
+    runId = Column(Integer, ForeignKey("trust_score_runs.id", ondelete="CASCADE"), nullable=False)
+    vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
+    businessType = Column(String, nullable=True)
+    score = Column(Integer, nullable=False)
+    tag = Column(String, nullable=False)
+    repaymentRate = Column(Integer, nullable=False)
+    revenueStability = Column(Integer, nullable=False)
+    pendingDebtRatio = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_snapshots_run_score", "runId", "score"),)
+
 class ChainEntry(Base):
     __tablename__ = "chain_entries"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, default=sharded_id("chain_entries"))
     vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
     action = Column(String, nullable=False)
-    payload_hash = Column(String, nullable=False)
+    # hex / datetime in Python either way; CHAIN_STORAGE decides text or compact binary columns
+    payload_hash = Column(Digest, nullable=False)
+    prev_hash = Column(Digest, nullable=False)
+    hash = Column(Digest, nullable=False, index=True)
+    createdAt = Column(Timestamp, default=datetime.utcnow, nullable=False)
+
+class ChainCheckpoint(Base):
+    __tablename__ = "chain_checkpoints"
+
+    vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), primary_key=True)
+    last_block_id = Column(Integer, nullable=False)
+    last_hash = Column(String, nullable=False)
+    length = Column(Integer, nullable=False)
+    signature = Column(String, nullable=False)
+    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+class ChainMerkleRoot(Base):
+    __tablename__ = "chain_merkle_roots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
+    epoch = Column(Integer, nullable=False)
+    first_block_id = Column(Integer, nullable=False)
+    last_block_id = Column(Integer, nullable=False)
+    leaf_count = Column(Integer, nullable=False)
+    root = Column(String, nullable=False)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (UniqueConstraint("vendor_id", "epoch", name="uq_merkle_vendor_epoch"),)
+
+class ChainSegment(Base):
+    __tablename__ = "chain_segments"
+    # one sealed CHAIN_MERKLE_RANGE range moved out of chain_entries into the vendor's
+    # segment file (segments.py); byte and index-entry ranges of that file, plus the
+    # range's boundary hashes so the live chain still links to it
+
+    id = Column(Integer, primary_key=True, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
+    epoch = Column(Integer, nullable=False)
+    first_block_id = Column(Integer, nullable=False)
+    last_block_id = Column(Integer, nullable=False)
+    block_count = Column(Integer, nullable=False)
     prev_hash = Column(String, nullable=False)
-    hash = Column(String, nullable=False, index=True)
-    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
\ No newline at end of file
+    terminal_hash = Column(String, nullable=False)
+    root = Column(String, nullable=False)
+    offset_start = Column(Integer, nullable=False)
+    offset_end = Column(Integer, nullable=False)
+    index_first = Column(Integer, nullable=False)
+    index_count = Column(Integer, nullable=False)
+    sha256 = Column(String, nullable=False)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("vendor_id", "epoch", name="uq_segment_vendor_epoch"),
+        Index("ix_chain_segments_range", "first_block_id", "last_block_id"),
+    )
+
+class ChainProofRoot(Base):
+    __tablename__ = "chain_proof_roots"
+    # published root of a fixed CHAIN_PROOF_EPOCH block epoch, Merkle tree over payload_hash
+    # (leaf order = block order); inclusion proofs for single entries are checked against it
+
+    id = Column(Integer, primary_key=True, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False, index=True)
+    epoch = Column(Integer, nullable=False)
+    first_block_id = Column(Integer, nullable=False)
+    last_block_id = Column(Integer, nullable=False)
+    leaf_count = Column(Integer, nullable=False)
+    root = Column(String, nullable=False)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (UniqueConstraint("vendor_id", "epoch", name="uq_proof_vendor_epoch"),)
+
+class ChainHead(Base):
+    __tablename__ = "chain_heads"
+
+    vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), primary_key=True)
+    last_block_id = Column(Integer, nullable=True)
+    last_hash = Column(String, nullable=False, default="GENESIS")
+    length = Column(Integer, nullable=False, default=0)
+    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # compare-and-set on length: UPDATE ... WHERE length = <value read>, so a head
+    # advanced by another writer/process raises StaleDataError instead of forking the chain
+    __mapper_args__ = {"version_id_col": length, "version_id_generator": False}
+
+class VendorShard(Base):
+    __tablename__ = "vendor_shards"
+    # vendor -> shard directory, kept on the home shard (shards.py). Also hands out vendor
+    # ids, so they stay unique across shards, and keeps mobiles unique for signup/login.
+
+    vendorId = Column(Integer, primary_key=True)
+    mobile = Column(String, unique=True, nullable=False)
+    shard = Column(Integer, nullable=False, index=True)
+    state = Column(String, nullable=False, default="active")   # "moving" while rebalanced
+    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+    # per-shard counters behind the shard-tagged row ids (ids.py), one row per table
+
+    name = Column(String, primary_key=True)
+    next_value = Column(Integer, nullable=False)
+
+class IdRemap(Base):
+    __tablename__ = "id_remaps"
+    # rows a shard move had to renumber (ids from before sharding that were taken on the
+    # target), and the REBALANCE block whose payload commits to the mapping
+
+    vendorId = Column(Integer, ForeignKey("vendors.id", ondelete="CASCADE"), primary_key=True)
+    tableName = Column(String, primary_key=True)
+    oldId = Column(Integer, primary_key=True)
+    newId = Column(Integer, nullable=False)
+    blockId = Column(Integer, nullable=False)
@@ -0,0 +1,279 @@
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+from config import PROFILE_SLOW_MS, PROFILE_SAMPLE_MS, PROFILE_DIR
+from chain_writer import chain_writer
+from http_cache import response_cache
+
+router = APIRouter(tags=["Metrics"])
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# per-request counters; a dict so code running in copied contexts (threadpool,
+# chain writer) updates the same object
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def _note_thread(stats: dict):
+    # threads that worked for the request (loop, threadpool, chain writer): the profiler keeps only their samples
+    if stats["threads"] is not None:
+        stats["threads"].add(threading.get_ident())
+
+
+def count_hashes(n: int = 1):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["hashes"] += n
+        _note_thread(stats)
+
+
+class Metrics:
+    """
+    In-process counters and histograms, rendered in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)                      # (method, route, status) -> count
+        self.latency = defaultdict(lambda: [0] * (len(BUCKETS) + 1))  # (method, route) -> bucket counts
+        self.latency_sum = defaultdict(float)
+        self.sql_count = defaultdict(int)                     # (method, route) -> statements
+        self.sql_seconds = defaultdict(float)
+        self.hashes = defaultdict(int)
+        self.sql_total = 0
+        self.sql_total_seconds = 0.0
+        self.profiles_written = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: dict):
+        i = next((n for n, b in enumerate(BUCKETS) if seconds <= b), len(BUCKETS))
+        with self._lock:
+            self.requests[(method, route, status)] += 1
+            self.latency[(method, route)][i] += 1
+            self.latency_sum[(method, route)] += seconds
+            self.sql_count[(method, route)] += stats["sql"]
+            self.sql_seconds[(method, route)] += stats["sql_seconds"]
+            self.hashes[(method, route)] += stats["hashes"]
+
+    def observe_sql(self, seconds: float):
+        with self._lock:
+            self.sql_total += 1
+            self.sql_total_seconds += seconds
+
+    def profile_written(self):
+        with self._lock:
+            self.profiles_written += 1
+
+    def render(self, extra_gauges: dict | None = None, extra_counters: dict | None = None) -> str:
+        out = []
+
+        def family(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family("http_requests_total", "counter", "HTTP requests by route and status.")
+            for (method, route, status), n in sorted(self.requests.items()):
+                out.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+
+            family("http_request_duration_seconds", "histogram", "Request latency until the last body byte.")
+            for (method, route), counts in sorted(self.latency.items()):
+                labels = f'method="{method}",route="{route}"'
+                running = 0
+                for b, c in zip(BUCKETS, counts):
+                    running += c
+                    out.append(f'http_request_duration_seconds_bucket{{{labels},le="{b}"}} {running}')
+                running += counts[-1]
+                out.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {running}')
+                out.append(f"http_request_duration_seconds_sum{{{labels}}} {self.latency_sum[(method, route)]:.6f}")
+                out.append(f"http_request_duration_seconds_count{{{labels}}} {running}")
+
+            family("http_request_sql_statements_total", "counter", "SQL statements executed while serving a route.")
+            for (method, route), n in sorted(self.sql_count.items()):
+                out.append(f'http_request_sql_statements_total{{method="{method}",route="{route}"}} {n}')
+            family("http_request_sql_seconds_total", "counter", "Time spent in SQL while serving a route.")
+            for (method, route), n in sorted(self.sql_seconds.items()):
+                out.append(f'http_request_sql_seconds_total{{method="{method}",route="{route}"}} {n:.6f}')
+            family("http_request_hash_operations_total", "counter", "SHA-256 operations while serving a route.")
+            for (method, route), n in sorted(self.hashes.items()):
+                out.append(f'http_request_hash_operations_total{{method="{method}",route="{route}"}} {n}')
+
+            family("db_statements_total", "counter", "All SQL statements (requests and background work).")
+            out.append(f"db_statements_total {self.sql_total}")
+            family("db_statement_seconds_total", "counter", "Time spent in all SQL statements.")
+            out.append(f"db_statement_seconds_total {self.sql_total_seconds:.6f}")
+            family("profiler_dumps_total", "counter", "Slow-request stack dumps written.")
+            out.append(f"profiler_dumps_total {self.profiles_written}")
+
+        for kind, extra in (("counter", extra_counters), ("gauge", extra_gauges)):
+            for name, (help_text, value) in (extra or {}).items():
+                family(name, kind, help_text)
+                out.append(f"{name} {value}")
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
+
+
+# ---------- SQL instrumentation ----------
+
+def instrument_engine(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        metrics.observe_sql(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["sql"] += 1
+            stats["sql_seconds"] += elapsed
+            _note_thread(stats)
+
+
+# ---------- Sampling profiler (opt-in) ----------
+
+class StackSampler:
+    """
+    While requests are in flight, samples every thread's stack each PROFILE_SAMPLE_MS.
+    A request slower than PROFILE_SLOW_MS gets the samples of its time window, from the
+    threads that worked for it, written as collapsed stacks ("frame;frame;frame count"),
+    ready for flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, interval_ms: float, out_dir: str, max_samples: int = 50_000):
+        self.interval = interval_ms / 1000.0
+        self.out_dir = out_dir
+        self.samples = deque(maxlen=max_samples)   # (timestamp, thread id, thread name, collapsed stack)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def request_started(self):
+        with self._lock:
+            self._active += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def request_finished(self):
+        with self._lock:
+            self._active -= 1
+            if self._active <= 0:
+                self._active = 0
+                self._wake.clear()
+
+    def _loop(self):
+        me = threading.get_ident()
+        while True:
+            self._wake.wait()
+            now = time.perf_counter()
+            # per sweep: idents are reused once a thread exits
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples.append((now, ident, names.get(ident, str(ident)), ";".join(reversed(stack))))
+            time.sleep(self.interval)
+
+    def dump(self, method: str, route: str, started: float, finished: float, threads: set) -> str | None:
+        # file I/O: call it off the event loop
+        counts = defaultdict(int)
+        for ts, ident, thread, stack in list(self.samples):
+            if started <= ts <= finished and ident in threads:
+                counts[f"{thread};{stack}"] += 1
+        if not counts:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        ms = int((finished - started) * 1000)
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{method}_{slug}_{ms}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(counts.items()):
+                f.write(f"{stack} {n}\n")
+        return path
+
+
+sampler = StackSampler(PROFILE_SAMPLE_MS, PROFILE_DIR) if PROFILE_SLOW_MS > 0 else None
+
+
+# ---------- ASGI middleware ----------
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (not BaseHTTPMiddleware) so streamed responses such as
+    /chain/verify and /export are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = {"sql": 0, "sql_seconds": 0.0, "hashes": 0,
+                 "threads": {threading.get_ident()} if sampler else None}
+        token = _request_stats.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        if sampler:
+            sampler.request_started()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            _request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics.observe_request(scope["method"], route, status["code"], finished - started, stats)
+            if sampler:
+                sampler.request_finished()
+                if (finished - started) * 1000 >= PROFILE_SLOW_MS and await run_in_threadpool(
+                    sampler.dump, scope["method"], route, started, finished, stats["threads"]
+                ):
+                    metrics.profile_written()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    w = chain_writer.stats()
+    rc = response_cache.stats()
+    gauges = {
+        "chain_writer_queue_depth": ("Jobs waiting for the chain writer.", w["queue_depth"]),
+        "chain_writer_pending_vendors": ("Vendors with queued chain writes.", w["pending_vendors"]),
+        "chain_writer_flush_p99_ms": ("p99 batch flush time (recent window).", w["flush_ms"]["p99"] or 0),
+        "chain_writer_wait_p99_ms": ("p99 enqueue-to-commit time (recent window).", w["wait_ms"]["p99"] or 0),
+        "response_cache_entries": ("Rendered read responses in the LRU cache.", rc["entries"]),
+        "response_cache_bytes": ("Body bytes held by the response cache.", rc["bytes"]),
+    }
+    counters = {
+        "chain_writer_batches_total": ("Group commits done by the chain writer.", w["batches"]),
+        "response_cache_hits_total": ("Read responses served from the cache.", rc["hits"]),
+        "response_cache_misses_total": ("Read responses rendered by their handler.", rc["misses"]),
+        "response_not_modified_total": ("Conditional reads answered with 304.", rc["not_modified"]),
+    }
+    return PlainTextResponse(metrics.render(gauges, counters), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,254 @@
+import heapq
+import threading
+import time
+from itertools import islice
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert, func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from shards import fan_out, is_sharded
+from models import Vendor, VendorStats, RevenueStats, TrustScoreRun, TrustScoreSnapshot
+from crud import rebuild_vendor_stats, rebuild_sales_daily, revenue_week_values
+from trustscore import policy_registry, feature_columns, score_columns
+from stability import RevenueState
+from auth import require_lender
+from config import PORTFOLIO_KEEP_RUNS
+
+router = APIRouter(prefix="/portfolio", tags=["Lender Portfolio"], dependencies=[Depends(require_lender)])
+
+# one recompute at a time per process; a second request gets a 409 instead of queueing another full scan
+_recompute_lock = threading.Lock()
+
+
+def recompute_portfolio(db: Session, batch_size: int = 5000, run_id: int | None = None) -> TrustScoreRun:
+    """
+    Scores every vendor in column batches and stores one snapshot row per vendor
+    under a new TrustScoreRun (or the given run id, shared by all shards).
+    """
+    started = time.perf_counter()
+
+    # vendors without a stats row (pre vendor_stats data) get one first
+    missing = [vid for (vid,) in db.query(Vendor.id).outerjoin(VendorStats, VendorStats.vendorId == Vendor.id)
+               .filter(VendorStats.vendorId.is_(None)).all()]
+    if missing:
+        rebuild_vendor_stats(db, missing)
+    missing = [vid for (vid,) in db.query(Vendor.id).outerjoin(RevenueStats, RevenueStats.vendorId == Vendor.id)
+               .filter(RevenueStats.vendorId.is_(None)).all()]
+    if missing:
+        rebuild_sales_daily(db, missing)
+
+    policies = policy_registry.all(db)
+    fallback = policies.get("Other") or next(iter(policies.values()))
+
+    run = db.get(TrustScoreRun, run_id) if run_id is not None else None
+    if run is None:
+        run = TrustScoreRun(id=run_id, vendors=0)
+        db.add(run)
+        db.flush()
+
+    q = (
+        db.query(Vendor.id, Vendor.businessType, VendorStats.creditCount, VendorStats.paidCount,
+                 VendorStats.pendingUdhaar, VendorStats.saleCount,
+                 *[getattr(RevenueStats, f) for f in RevenueState._fields])
+        .join(VendorStats, VendorStats.vendorId == Vendor.id)
+        .join(RevenueStats, RevenueStats.vendorId == Vendor.id)
+        .order_by(Vendor.id.asc())
+    )
+
+    total, after_id = 0, 0
+    while True:
+        rows = q.filter(Vendor.id > after_id).limit(batch_size).all()
+        if not rows:
+            break
+        ids, btypes, credit_count, paid_count, pending, sale_count = list(zip(*[r[:6] for r in rows]))
+        revenue = [RevenueState(*r[6:]) for r in rows]
+
+        cols = score_columns(
+            feature_columns(credit_count, paid_count, pending, sale_count, revenue,
+                            [revenue_week_values(db, vid) for vid in ids]),
+            [policies.get(bt) or fallback for bt in btypes]
+        )
+        db.execute(insert(TrustScoreSnapshot), [
+            {
+                "runId": run.id, "vendorId": vid, "businessType": bt,
+                "score": sc, "tag": tg, "repaymentRate": rr, "revenueStability": rs, "pendingDebtRatio": dr,
+            }
+            for vid, bt, sc, tg, rr, rs, dr in zip(
+                ids, btypes, cols["score"], cols["tag"],
+                cols["repaymentRate"], cols["revenueStability"], cols["pendingDebtRatio"]
+            )
+        ])
+
+        total += len(ids)
+        after_id = ids[-1]
+        if len(rows) < batch_size:
+            break
+
+    run.vendors = total
+    run.elapsedMs = int((time.perf_counter() - started) * 1000)
+    db.commit()
+    return run
+
+
+def _recompute_shard(db: Session, shard: int, batch_size: int, run_id: int) -> int:
+    return recompute_portfolio(db, batch_size, run_id).vendors
+
+
+def prune_runs(db: Session, oldest_kept: int) -> int:
+    """
+    Deletes runs older than `oldest_kept` with their snapshots; returns snapshots deleted.
+    """
+    n = db.query(TrustScoreSnapshot).filter(TrustScoreSnapshot.runId < oldest_kept).delete(synchronize_session=False)
+    db.query(TrustScoreRun).filter(TrustScoreRun.id < oldest_kept).delete(synchronize_session=False)
+    db.commit()
+    return n
+
+
+def _prune_shard(db: Session, shard: int, oldest_kept: int) -> int:
+    return prune_runs(db, oldest_kept)
+
+
+def _prune_all(keep: int = PORTFOLIO_KEEP_RUNS):
+    # run ids come from the home shard, so its newest `keep` runs decide for every shard
+    if keep <= 0:
+        return
+    db = SessionLocal()
+    try:
+        oldest_kept = (db.query(TrustScoreRun.id).order_by(TrustScoreRun.id.desc())
+                       .offset(keep - 1).limit(1).scalar())
+    finally:
+        db.close()
+    if oldest_kept is not None:
+        fan_out(_prune_shard, oldest_kept)
+
+
+def recompute_portfolio_all(batch_size: int = 5000) -> dict:
+    """
+    One run over every shard: the run id comes from the home shard, the shards score
+    their own vendors in parallel.
+    """
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if not is_sharded():
+            run = recompute_portfolio(db, batch_size)
+            result = {"run_id": run.id, "vendors": run.vendors, "elapsed_ms": run.elapsedMs}
+            _prune_all()
+            return result
+        run = TrustScoreRun(vendors=0)
+        db.add(run)
+        db.commit()
+        run_id = run.id
+    finally:
+        db.close()
+
+    total = sum(fan_out(_recompute_shard, batch_size, run_id))
+    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    db = SessionLocal()
+    try:
+        run = db.get(TrustScoreRun, run_id)
+        run.vendors, run.elapsedMs = total, elapsed_ms
+        db.commit()
+    finally:
+        db.close()
+    _prune_all()
+    return {"run_id": run_id, "vendors": total, "elapsed_ms": elapsed_ms}
+
+
+def portfolio_page(db: Session, run_id: int | None = None, limit: int = 50, offset: int = 0,
+                   contact: bool = False):
+    if run_id is None:
+        run_id = db.query(func.max(TrustScoreRun.id)).scalar()
+    if run_id is None:
+        return None
+
+    base = db.query(TrustScoreSnapshot).filter(TrustScoreSnapshot.runId == run_id)
+    total = base.count()
+    rows = (
+        base.order_by(TrustScoreSnapshot.score.desc(), TrustScoreSnapshot.vendorId.asc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    items = [{
+        "vendor_id": s.vendorId,
+        "businessType": s.businessType,
+        "score": s.score,
+        "tag": s.tag,
+        "breakup": {
+            "repaymentRate": s.repaymentRate,
+            "revenueStability": s.revenueStability,
+            "pendingDebtRatio": s.pendingDebtRatio,
+        },
+    } for s in rows]
+    if contact and items:
+        # owner name / city only on request
+        names = {
+            vid: (owner, city) for vid, owner, city in
+            db.query(Vendor.id, Vendor.ownerName, Vendor.city).filter(Vendor.id.in_([i["vendor_id"] for i in items]))
+        }
+        for i in items:
+            i["ownerName"], i["city"] = names.get(i["vendor_id"], (None, None))
+    return {
+        "run_id": run_id,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "items": items,
+    }
+
+
+def _shard_page(db: Session, shard: int, run_id: int, limit: int, contact: bool):
+    return portfolio_page(db, run_id, limit, 0, contact)
+
+
+def portfolio_page_all(run_id: int | None = None, limit: int = 50, offset: int = 0, contact: bool = False):
+    """
+    portfolio_page across shards: each shard returns its best offset+limit rows, merged
+    by (score desc, vendor id).
+    """
+    db = SessionLocal()
+    try:
+        if not is_sharded():
+            return portfolio_page(db, run_id, limit, offset, contact)
+        if run_id is None:
+            run_id = db.query(func.max(TrustScoreRun.id)).scalar()
+    finally:
+        db.close()
+    if run_id is None:
+        return None
+
+    pages = fan_out(_shard_page, run_id, offset + limit, contact)
+    items = heapq.merge(*(p["items"] for p in pages), key=lambda i: (-i["score"], i["vendor_id"]))
+    return {
+        "run_id": run_id,
+        "total": sum(p["total"] for p in pages),
+        "limit": limit,
+        "offset": offset,
+        "items": list(islice(items, offset, offset + limit)),
+    }
+
+
+@router.post("/recompute")
+def recompute():
+    if not _recompute_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A portfolio recompute is already running")
+    try:
+        return recompute_portfolio_all()
+    finally:
+        _recompute_lock.release()
+
+
+@router.get("")
+def get_portfolio(
+    run_id: int | None = None,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    contact: bool = False,
+):
+    # contact=true adds ownerName / city to each item
+    page = portfolio_page_all(run_id, limit, offset, contact)
+    if page is None:
+        raise HTTPException(status_code=404, detail="No portfolio run yet, POST /portfolio/recompute first")
+    return page
@@ -0,0 +1,273 @@
+import os
+import time
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, shard_sessions
+from models import (
+    Vendor, Customer, Credit, Sale, SalesDaily, RevenueStats, VendorStats, VendorVersion, TrustScoreSnapshot,
+    ChainEntry, ChainHead, ChainCheckpoint, ChainMerkleRoot, ChainProofRoot, ChainSegment, VendorShard, IdRemap
+)
+from blockchain import add_block, iter_chain_rows, verify_chain
+from ids import raise_sequence
+from segments import segment_paths
+from shards import directory, shard_count, vendor_counts
+from versions import bump_data_version
+from config import SHARD_DIRECTORY_TTL
+
+# Moves a vendor, chain included, to another shard:
+#   1. directory entry -> "moving"; wait SHARD_DIRECTORY_TTL so every worker refuses writes
+#   2. copy all rows to the target, then verify the copied chain there and compare its
+#      re-sealed Merkle / proof roots with the source's
+#   3. directory entry -> target; wait again for cached entries to expire, then delete
+#      the source rows and segment files
+# Rows keep their ids: sharded ids are unique across shards (ids.py), and the target's
+# id sequences are raised past the copied ids so later rows still sort after them.
+# Ids from before sharding can be taken on the target; those rows are renumbered, the
+# old -> new map goes to id_remaps and a REBALANCE block on the vendor's chain commits
+# to it, so payloads that name the old ids can still be followed. Block hashes and
+# published roots never change; the signed checkpoint is re-signed on the target.
+
+COPY_BATCH = 1000
+
+# tables keyed by vendor (+ date / old id), copied as they are
+_KEYED = [
+    (SalesDaily, "vendorId"), (RevenueStats, "vendorId"), (VendorStats, "vendorId"), (VendorVersion, "vendorId"),
+    (IdRemap, "vendorId"),
+]
+
+# everything a vendor owns on a shard, children first
+_OWNED = [
+    (Credit, "vendorId"), (Customer, "vendorId"), (Sale, "vendorId"), (TrustScoreSnapshot, "vendorId"),
+    *_KEYED,
+    (ChainEntry, "vendor_id"), (ChainHead, "vendor_id"), (ChainCheckpoint, "vendor_id"),
+    (ChainMerkleRoot, "vendor_id"), (ChainProofRoot, "vendor_id"), (ChainSegment, "vendor_id"),
+    (Vendor, "id"),
+]
+
+
+def _rows(db: Session, model, col: str, vendor_id: int) -> list:
+    t = model.__table__
+    return [dict(r) for r in db.execute(select(t).where(t.c[col] == vendor_id).order_by(*t.primary_key)).mappings()]
+
+
+def _insert_returning_ids(db: Session, model, rows: list) -> list:
+    ids = []
+    for i in range(0, len(rows), COPY_BATCH):
+        ids += db.execute(insert(model).returning(model.id, sort_by_parameter_order=True),
+                          rows[i:i + COPY_BATCH]).scalars().all()
+    return ids
+
+
+def _renumbered(db: Session, model, rows: list) -> dict:
+    # old id -> new id on the target
+    old = [r.pop("id") for r in rows]
+    return dict(zip(old, _insert_returning_ids(db, model, rows)))
+
+
+def _taken(db: Session, model, ids: list) -> set:
+    taken = set()
+    for i in range(0, len(ids), COPY_BATCH):
+        taken.update(db.execute(select(model.id).where(model.id.in_(ids[i:i + COPY_BATCH]))).scalars())
+    return taken
+
+
+def _place(db: Session, model, rows: list) -> dict:
+    """
+    Inserts rows with their own ids; rows whose id is taken on the target get a new
+    one. Returns old -> new for the renumbered rows.
+    """
+    if not rows:
+        return {}
+    raise_sequence(db, model.__tablename__, max(r["id"] for r in rows))
+    taken = _taken(db, model, [r["id"] for r in rows])
+    kept = [r for r in rows if r["id"] not in taken]
+    for i in range(0, len(kept), COPY_BATCH):
+        db.execute(insert(model), kept[i:i + COPY_BATCH])
+    return _renumbered(db, model, [r for r in rows if r["id"] in taken])
+
+
+def _copy_chain(src: Session, dst: Session, vendor_id: int):
+    """
+    Archived segments first, then live rows; the target keeps them all live. Returns
+    (blocks, last id, last hash, old -> new ids). One taken id renumbers every block,
+    so the chain order stays the id order.
+    """
+    clash, top = False, 0
+    for chunk in iter_chain_rows(src, vendor_id, chunk_size=COPY_BATCH):
+        ids = [r[0] for r in chunk]
+        top = max(top, ids[-1])
+        clash = clash or bool(_taken(dst, ChainEntry, ids))
+    raise_sequence(dst, ChainEntry.__tablename__, top)
+
+    blocks, last_id, last_hash, remap = 0, None, "GENESIS", {}
+    for chunk in iter_chain_rows(src, vendor_id, chunk_size=COPY_BATCH):
+        rows = [
+            {"id": i, "vendor_id": vendor_id, "action": a, "payload_hash": p, "prev_hash": pv, "hash": h, "createdAt": t}
+            for i, a, p, pv, h, t in chunk
+        ]
+        if clash:
+            renumbered = _renumbered(dst, ChainEntry, rows)
+            remap.update(renumbered)
+            ids = list(renumbered.values())
+        else:
+            dst.execute(insert(ChainEntry), rows)
+            ids = [r["id"] for r in rows]
+        blocks += len(ids)
+        last_id, last_hash = ids[-1], chunk[-1][4]
+    return blocks, last_id, last_hash, remap
+
+
+def _copy(src: Session, dst: Session, vendor_id: int, source: int, target: int) -> dict:
+    vendor = _rows(src, Vendor, "id", vendor_id)
+    if not vendor:
+        raise ValueError(f"vendor {vendor_id} not found on its shard")
+    dst.execute(insert(Vendor), vendor)
+    for model, col in _KEYED:
+        rows = _rows(src, model, col, vendor_id)
+        if rows:
+            dst.execute(insert(model), rows)
+
+    remaps = {}
+    customers = _rows(src, Customer, "vendorId", vendor_id)
+    remaps["customers"] = _place(dst, Customer, customers)
+    credits = _rows(src, Credit, "vendorId", vendor_id)
+    for r in credits:
+        r["customerId"] = remaps["customers"].get(r["customerId"], r["customerId"])
+    remaps["credits"] = _place(dst, Credit, credits)
+    sales = _rows(src, Sale, "vendorId", vendor_id)
+    remaps["sales"] = _place(dst, Sale, sales)
+    snapshots = _rows(src, TrustScoreSnapshot, "vendorId", vendor_id)
+    remaps["trust_score_snapshots"] = _place(dst, TrustScoreSnapshot, snapshots)
+
+    blocks, last_id, last_hash, remaps["chain_entries"] = _copy_chain(src, dst, vendor_id)
+    if blocks:
+        dst.execute(insert(ChainHead), [{"vendor_id": vendor_id, "last_block_id": last_id,
+                                         "last_hash": last_hash, "length": blocks}])
+
+    remaps = {table: sorted(m.items()) for table, m in remaps.items() if m}
+    if remaps:
+        block = add_block(dst, vendor_id, "REBALANCE", {
+            "vendorId": vendor_id, "fromShard": source, "toShard": target,
+            "ids": {table: [list(pair) for pair in pairs] for table, pairs in remaps.items()},
+        })
+        dst.execute(insert(IdRemap), [
+            {"vendorId": vendor_id, "tableName": table, "oldId": old, "newId": new, "blockId": block.id}
+            for table, pairs in remaps.items() for old, new in pairs
+        ])
+    # the data now comes from another database: no cached response of the source carries over
+    bump_data_version(dst, vendor_id)
+    return {"customers": len(customers), "credits": len(credits), "sales": len(sales),
+            "snapshots": len(snapshots), "blocks": blocks,
+            "renumbered": {table: len(pairs) for table, pairs in remaps.items()}}
+
+
+def _roots(db: Session, model, vendor_id: int) -> dict:
+    return dict(db.query(model.epoch, model.root).filter(model.vendor_id == vendor_id).all())
+
+
+def _check(src: Session, dst: Session, vendor_id: int, blocks: int):
+    head = src.get(ChainHead, vendor_id)
+    if head and head.length != blocks:
+        raise ValueError(f"vendor {vendor_id}: copied {blocks} blocks, source head says {head.length}")
+    ok, info = verify_chain(dst, vendor_id, full=True)
+    if not ok:
+        raise ValueError(f"vendor {vendor_id}: chain does not verify after the copy {info}")
+    for model in (ChainMerkleRoot, ChainProofRoot):
+        copied = _roots(dst, model, vendor_id)
+        for epoch, root in _roots(src, model, vendor_id).items():
+            if copied.get(epoch) != root:
+                raise ValueError(f"vendor {vendor_id}: {model.__tablename__} epoch {epoch} differs after the copy")
+
+
+def purge_vendor(db: Session, vendor_id: int):
+    """
+    Deletes every row of a vendor from one shard (not the directory entry).
+    """
+    for model, col in _OWNED:
+        t = model.__table__
+        db.execute(delete(t).where(t.c[col] == vendor_id))
+    db.commit()
+
+
+def _set_entry(home: Session, entry: VendorShard, **values):
+    for k, v in values.items():
+        setattr(entry, k, v)
+    home.commit()
+    directory.invalidate(entry.vendorId)
+
+
+def move_vendor(vendor_id: int, target: int, wait: float = SHARD_DIRECTORY_TTL) -> dict:
+    """
+    Moves one vendor with its chain to shard `target`. Raises ValueError (and leaves
+    the vendor where it was) if the copy does not verify.
+    """
+    if not 0 <= target < shard_count():
+        raise ValueError(f"no shard {target}")
+    home = SessionLocal()
+    try:
+        entry = home.get(VendorShard, vendor_id)
+        if entry is None:
+            raise ValueError(f"vendor {vendor_id} has no directory entry")
+        source = entry.shard
+        if source == target:
+            return {"vendor_id": vendor_id, "from": source, "to": target, "moved": False}
+
+        _set_entry(home, entry, state="moving")
+        time.sleep(wait)
+
+        src, dst = shard_sessions[source](), shard_sessions[target]()
+        try:
+            # leftovers of an interrupted move
+            purge_vendor(dst, vendor_id)
+            try:
+                counts = _copy(src, dst, vendor_id, source, target)
+                dst.commit()
+                _check(src, dst, vendor_id, counts["blocks"])
+            except Exception:
+                dst.rollback()
+                purge_vendor(dst, vendor_id)
+                _set_entry(home, entry, state="active")
+                raise
+
+            _set_entry(home, entry, shard=target, state="active")
+            time.sleep(wait)
+            archived = src.query(ChainSegment.id).filter(ChainSegment.vendor_id == vendor_id).first() is not None
+            purge_vendor(src, vendor_id)
+            if archived:
+                for path in segment_paths(vendor_id):
+                    if os.path.exists(path):
+                        os.remove(path)
+        finally:
+            src.close()
+            dst.close()
+        return {"vendor_id": vendor_id, "from": source, "to": target, "moved": True, **counts}
+    finally:
+        home.close()
+
+
+def plan_rebalance(max_moves: int | None = None) -> list:
+    """
+    (vendor_id, from, to) moves that even out vendor counts, newest vendors first
+    (usually the smallest chains).
+    """
+    home = SessionLocal()
+    try:
+        counts = vendor_counts(home)
+        taken, moves = set(), []
+        while max(counts) - min(counts) > 1 and (max_moves is None or len(moves) < max_moves):
+            src, dst = counts.index(max(counts)), counts.index(min(counts))
+            q = (home.query(VendorShard.vendorId)
+                 .filter(VendorShard.shard == src, VendorShard.state == "active")
+                 .order_by(VendorShard.vendorId.desc()))
+            vid = next((v for (v,) in q if v not in taken), None)
+            if vid is None:
+                break
+            taken.add(vid)
+            moves.append((vid, src, dst))
+            counts[src] -= 1
+            counts[dst] += 1
+        return moves
+    finally:
+        home.close()
@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import SalesDaily, VendorStats
+from auth import get_current_vendor, VendorPrincipal
+from crud import sale_day, rebuild_sales_daily, rebuild_vendor_stats
+from http_cache import cached_read
+
+router = APIRouter(tags=["Sales Summary"])
+
+
+def ensure_sales_daily(db: Session, vendor_id: int) -> bool:
+    """
+    Rollup counts must add up to vendor_stats.saleCount; a vendor whose sales
+    predate sales_daily (or drifted) is rebuilt once. Returns True if it rebuilt.
+    """
+    st = db.get(VendorStats, vendor_id)
+    if not st:
+        rebuild_vendor_stats(db, [vendor_id])
+        db.commit()
+        st = db.get(VendorStats, vendor_id)
+    rolled = db.query(func.coalesce(func.sum(SalesDaily.count), 0)).filter(SalesDaily.vendorId == vendor_id).scalar()
+    if int(rolled) == int(st.saleCount or 0):
+        return False
+    rebuild_sales_daily(db, [vendor_id])
+    db.commit()
+    return True
+
+
+def _period(day: str, granularity: str) -> str:
+    if granularity == "day":
+        return day
+    if granularity == "month":
+        return day[:7]
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()  # ISO week, labelled by its Monday
+
+
+def sales_summary(db: Session, vendor_id: int, date_from: str | None = None, date_to: str | None = None,
+                  granularity: str = "day") -> dict:
+    """
+    Cash / UPI / other totals per period, read from sales_daily only
+    (one row per vendor, day and mode -> a few thousand rows for years of data).
+    """
+    q = db.query(SalesDaily.day, SalesDaily.mode, SalesDaily.amount, SalesDaily.count).filter(
+        SalesDaily.vendorId == vendor_id, SalesDaily.day != ""
+    )
+    if date_from:
+        q = q.filter(SalesDaily.day >= date_from)
+    if date_to:
+        q = q.filter(SalesDaily.day <= date_to)
+
+    buckets = {}
+    totals = {"total": 0.0, "count": 0, "cash": 0.0, "upi": 0.0, "other": 0.0}
+    for day, mode, amount, count in q.order_by(SalesDaily.day.asc()).all():
+        period = _period(day, granularity)
+        b = buckets.get(period)
+        if b is None:
+            b = buckets[period] = {"period": period, "total": 0.0, "count": 0, "cash": 0.0, "upi": 0.0, "other": 0.0}
+        split = mode if mode in ("cash", "upi") else "other"
+        for acc in (b, totals):
+            acc["total"] += amount
+            acc["count"] += count
+            acc[split] += amount
+
+    return {
+        "granularity": granularity,
+        "from": date_from,
+        "to": date_to,
+        "totals": totals,
+        "buckets": list(buckets.values()),
+    }
+
+
+@router.get("/sales/summary")
+def get_sales_summary(
+    request: Request,
+    date_from: str | None = Query(None, alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    db: Session = Depends(get_db),
+    v: VendorPrincipal = Depends(get_current_vendor)
+):
+    bounds = []
+    for name, value in (("from", date_from), ("to", date_to)):
+        day = sale_day(value) if value else None
+        if value and not day:
+            raise HTTPException(status_code=400, detail=f"'{name}' must be a date like YYYY-MM-DD")
+        bounds.append(day)
+
+    def produce(_):
+        ensure_sales_daily(db, v.id)
+        return sales_summary(db, v.id, bounds[0], bounds[1], granularity)
+    return cached_read(request, db, v.id, produce)
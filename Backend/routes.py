@@ -1,27 +1,56 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, shard_sessions
 from models import Vendor
 from schemas import (
     SignupRequest, LoginRequest, TokenResponse, VendorMeResponse,
-    CustomerCreate, CustomerOut, CreditCreate, CreditOut, SaleCreate, SaleOut, TrustScoreResponse
+    CustomerCreate, CustomerOut, CreditCreate, CreditOut, SaleCreate, SaleOut, TrustScoreResponse,
+    SaleBulkCreate, CreditBulkCreate, BulkInsertResponse
 )
 from crud import (
-    create_vendor, get_vendor_by_mobile, authenticate_vendor,
+    create_vendor, get_vendor_by_mobile, authenticate_vendor_async,
     create_customer, list_customers, delete_customer,
     create_credit, mark_credit_paid, list_credits,
     create_sale, list_sales, kpis
 )
-from auth import create_token, get_current_vendor
-from trustscore import compute_trust_score
-from config import UPLOAD_DIR, ALLOWED_IMAGE_EXTS
+from ingest import ingest_credits, ingest_sales
+from auth import create_token, get_current_vendor, hash_password_async, principal_cache, VendorPrincipal
+from trustscore import compute_trust_score, stability_details, policy_registry
+from http_cache import cached_read
+from serialization import rows_to_records
+from config import ALLOWED_IMAGE_EXTS
+from media import store_photo, thumb_urls
+from shards import is_sharded, register_vendor, forget_vendor, shard_for_mobile
 
 from blockchain import add_block, verify_chain
+from chain_writer import chain_writer, ChainConflict
 
 router = APIRouter()
 
+MAX_PAGE = 5000
+
+def _set_cursor(response: Response, rows, limit: int | None):
+    # full page -> there may be more; client passes it back as ?after=
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+
+def _write(vendor_id: int, fn, *args):
+    # chain-appending writes are applied (and group-committed) by the chain writer thread
+    try:
+        return chain_writer.run(vendor_id, fn, *args)
+    except ChainConflict:
+        raise HTTPException(status_code=409, detail="Chain was updated concurrently, retry")
+
+async def _write_async(vendor_id: int, fn, *args):
+    try:
+        return await chain_writer.run_async(vendor_id, fn, *args)
+    except ChainConflict:
+        raise HTTPException(status_code=409, detail="Chain was updated concurrently, retry")
+
 @router.get("/")
 def root():
     return {"status": "ok", "message": "TrustChain Local Backend Running", "docs": "/docs"}
@@ -30,13 +59,12 @@ def root():
 def health():
     return {"ok": True}
 
-@router.post("/auth/signup", response_model=TokenResponse)
-def signup(payload: SignupRequest, db: Session = Depends(get_db)):
+def _signup_tx(db: Session, payload: SignupRequest, password_hash: str, vendor_id: int | None = None):
     existing = get_vendor_by_mobile(db, payload.mobile.strip())
     if existing:
         raise HTTPException(status_code=400, detail="Mobile already registered")
 
-    v = create_vendor(db, payload)
+    v = create_vendor(db, payload, password_hash, vendor_id)
 
     add_block(db, v.id, "SIGNUP", {
         "mobile": v.mobile,
@@ -45,22 +73,51 @@ def signup(payload: SignupRequest, db: Session = Depends(get_db)):
         "city": v.city,
         "upi": v.upi
     })
+    return v.id
 
-    token = create_token(v.id)
+@router.post("/auth/signup", response_model=TokenResponse)
+async def signup(payload: SignupRequest):
+    password_hash = await hash_password_async(payload.password)
+    if not is_sharded():
+        # vendor id is not known yet; 0 only labels the job in the writer metrics
+        vendor_id = await _write_async(0, _signup_tx, payload, password_hash)
+    else:
+        # the directory hands out the id and the shard; that shard's writer creates the vendor
+        try:
+            allocated, _ = await run_in_threadpool(register_vendor, payload.mobile.strip())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            vendor_id = await _write_async(allocated, _signup_tx, payload, password_hash, allocated)
+        except Exception:
+            await run_in_threadpool(forget_vendor, allocated)
+            raise
+
+    token = create_token(vendor_id)
     return {"access_token": token, "token_type": "bearer"}
 
+def _login_tx(db: Session, vendor_id: int, mobile: str):
+    add_block(db, vendor_id, "LOGIN", {"mobile": mobile})
+
 @router.post("/auth/login", response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    v = authenticate_vendor(db, payload.mobile.strip(), payload.password)
+async def login(payload: LoginRequest):
+    mobile = payload.mobile.strip()
+    # no token yet: in a sharded setup the directory finds the vendor's shard by mobile
+    shard = await run_in_threadpool(shard_for_mobile, mobile) if is_sharded() else 0
+    db = shard_sessions[shard]()
+    try:
+        v = await authenticate_vendor_async(db, mobile, payload.password)
+    finally:
+        db.close()
     if not v:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    add_block(db, v.id, "LOGIN", {"mobile": v.mobile})
+    await _write_async(v.id, _login_tx, v.id, v.mobile)
     token = create_token(v.id)
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/auth/me", response_model=VendorMeResponse)
-def me(v: Vendor = Depends(get_current_vendor)):
+def me(v: VendorPrincipal = Depends(get_current_vendor)):
     return {
         "id": v.id,
         "ownerName": v.ownerName,
@@ -69,31 +126,32 @@ def me(v: Vendor = Depends(get_current_vendor)):
         "city": v.city,
         "upi": v.upi,
         "profilePhotoUrl": v.profilePhotoUrl,
+        "profilePhotoThumbs": thumb_urls(v.profilePhotoUrl),
     }
 
+def _photo_tx(db: Session, vendor_id: int, stored: dict) -> VendorPrincipal:
+    vendor = db.get(Vendor, vendor_id)
+    vendor.profilePhotoUrl = stored["url"]
+    add_block(db, vendor_id, "UPLOAD_PHOTO", {
+        "profilePhotoUrl": vendor.profilePhotoUrl,
+        "sha256": stored["sha256"],
+        "size": stored["size"],
+        "contentType": stored["contentType"],
+    })
+    return VendorPrincipal.from_vendor(vendor)
+
 @router.post("/profile/photo", response_model=VendorMeResponse)
 def upload_photo(
     photo: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    v: Vendor = Depends(get_current_vendor)
+    v: VendorPrincipal = Depends(get_current_vendor)
 ):
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
     ext = os.path.splitext(photo.filename or "")[1].lower()
     if ext not in ALLOWED_IMAGE_EXTS:
         raise HTTPException(status_code=400, detail="Only jpg/jpeg/png/webp allowed")
 
-    filename = f"vendor_{v.id}{ext}"
-    path = os.path.join(UPLOAD_DIR, filename)
-
-    with open(path, "wb") as f:
-        f.write(photo.file.read())
-
-    v.profilePhotoUrl = f"/uploads/{filename}"
-    db.add(v)
-    db.commit()
-    db.refresh(v)
-
-    add_block(db, v.id, "UPLOAD_PHOTO", {"profilePhotoUrl": v.profilePhotoUrl})
+    stored = store_photo(photo)
+    v = _write(v.id, _photo_tx, v.id, stored)
+    principal_cache.invalidate(v.id)
 
     return {
         "id": v.id,
@@ -103,101 +161,173 @@ def upload_photo(
         "city": v.city,
         "upi": v.upi,
         "profilePhotoUrl": v.profilePhotoUrl,
+        "profilePhotoThumbs": thumb_urls(v.profilePhotoUrl),
     }
 
-@router.post("/customers", response_model=CustomerOut)
-def add_customer(payload: CustomerCreate, db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    c = create_customer(db, v.id, payload.name, payload.phone, payload.notes)
+# Write bodies are plain (db, vendor_id, ...) functions without commit: the chain
+# writer runs them in its own session, for these routes and for routes_async.py.
+
+def add_customer_tx(db: Session, vendor_id: int, payload: CustomerCreate) -> dict:
+    c = create_customer(db, vendor_id, payload.name, payload.phone, payload.notes)
 
-    add_block(db, v.id, "ADD_CUSTOMER", {
+    add_block(db, vendor_id, "ADD_CUSTOMER", {
         "customerId": c.id,
         "name": c.name,
         "phone": c.phone,
         "notes": c.notes
     })
-
     return {"id": c.id, "vendorId": c.vendorId, "name": c.name, "phone": c.phone, "notes": c.notes}
 
+@router.post("/customers", response_model=CustomerOut)
+def add_customer(payload: CustomerCreate, v: VendorPrincipal = Depends(get_current_vendor)):
+    return _write(v.id, add_customer_tx, v.id, payload)
+
 @router.get("/customers", response_model=list[CustomerOut])
-def get_customers(db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    rows = list_customers(db, v.id)
-    return [{"id": r.id, "vendorId": r.vendorId, "name": r.name, "phone": r.phone, "notes": r.notes} for r in rows]
+def get_customers(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE),
+    after: int | None = None,
+    db: Session = Depends(get_db),
+    v: VendorPrincipal = Depends(get_current_vendor)
+):
+    def produce(response: Response):
+        rows = list_customers(db, v.id, limit, after)
+        _set_cursor(response, rows, limit)
+        return rows_to_records(rows)
+    return cached_read(request, db, v.id, produce)
+
+def remove_customer_tx(db: Session, vendor_id: int, customer_id: int) -> bool:
+    if not delete_customer(db, vendor_id, customer_id):
+        return False
+    add_block(db, vendor_id, "DELETE_CUSTOMER", {"customerId": customer_id})
+    return True
 
 @router.delete("/customers/{customer_id}")
-def remove_customer(customer_id: int, db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    ok = delete_customer(db, v.id, customer_id)
-    if not ok:
+def remove_customer(customer_id: int, v: VendorPrincipal = Depends(get_current_vendor)):
+    if not _write(v.id, remove_customer_tx, v.id, customer_id):
         raise HTTPException(status_code=404, detail="Customer not found")
-
-    add_block(db, v.id, "DELETE_CUSTOMER", {"customerId": customer_id})
     return {"ok": True}
 
-@router.post("/credits", response_model=CreditOut)
-def add_credit(payload: CreditCreate, db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    cr = create_credit(db, v.id, payload.customerId, payload.amount, payload.dueDate)
+def _credit_out(cr) -> dict:
+    return {
+        "id": cr.id, "vendorId": cr.vendorId, "customerId": cr.customerId,
+        "amount": cr.amount, "dueDate": cr.dueDate, "status": cr.status, "paidDate": cr.paidDate
+    }
 
-    add_block(db, v.id, "ADD_CREDIT", {
+def add_credit_tx(db: Session, vendor_id: int, payload: CreditCreate) -> dict:
+    cr = create_credit(db, vendor_id, payload.customerId, payload.amount, payload.dueDate)
+
+    add_block(db, vendor_id, "ADD_CREDIT", {
         "creditId": cr.id,
         "customerId": cr.customerId,
         "amount": cr.amount,
         "dueDate": str(cr.dueDate),
         "status": cr.status
     })
+    return _credit_out(cr)
 
-    return {
-        "id": cr.id, "vendorId": cr.vendorId, "customerId": cr.customerId,
-        "amount": cr.amount, "dueDate": cr.dueDate, "status": cr.status, "paidDate": cr.paidDate
-    }
+@router.post("/credits", response_model=CreditOut)
+def add_credit(payload: CreditCreate, v: VendorPrincipal = Depends(get_current_vendor)):
+    return _write(v.id, add_credit_tx, v.id, payload)
+
+def _bulk_tx(db: Session, vendor_id: int, ingest, items: list) -> dict:
+    ids, block = ingest(db, vendor_id, items)
+    return {"count": len(ids), "ids": ids, "blockHash": block.hash, "merkleRoot": block.payload_hash}
+
+@router.post("/credits/bulk", response_model=BulkInsertResponse)
+def add_credits_bulk(payload: CreditBulkCreate, v: VendorPrincipal = Depends(get_current_vendor)):
+    # one block for the whole batch; payload_hash = Merkle root of per-credit payload hashes
+    return _write(v.id, _bulk_tx, v.id, ingest_credits, [i.model_dump() for i in payload.items])
 
 @router.get("/credits", response_model=list[CreditOut])
-def get_credits(db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    rows = list_credits(db, v.id)
-    return [{
-        "id": r.id, "vendorId": r.vendorId, "customerId": r.customerId,
-        "amount": r.amount, "dueDate": r.dueDate, "status": r.status, "paidDate": r.paidDate
-    } for r in rows]
+def get_credits(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE),
+    after: int | None = None,
+    status: str | None = None,
+    due_from: str | None = Query(None, alias="from"),
+    due_to: str | None = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+    v: VendorPrincipal = Depends(get_current_vendor)
+):
+    def produce(response: Response):
+        rows = list_credits(db, v.id, limit, after, status, due_from, due_to)
+        _set_cursor(response, rows, limit)
+        return rows_to_records(rows)
+    return cached_read(request, db, v.id, produce)
+
+def pay_credit_tx(db: Session, vendor_id: int, credit_id: int):
+    cr = mark_credit_paid(db, vendor_id, credit_id, None)
+    if not cr:
+        return None
+    add_block(db, vendor_id, "PAY_CREDIT", {"creditId": cr.id, "status": cr.status, "paidDate": str(cr.paidDate)})
+    return _credit_out(cr)
 
 @router.post("/credits/{credit_id}/paid", response_model=CreditOut)
-def pay_credit(credit_id: int, db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    cr = mark_credit_paid(db, v.id, credit_id, None)
-    if not cr:
+def pay_credit(credit_id: int, v: VendorPrincipal = Depends(get_current_vendor)):
+    out = _write(v.id, pay_credit_tx, v.id, credit_id)
+    if not out:
         raise HTTPException(status_code=404, detail="Credit not found")
+    return out
 
-    add_block(db, v.id, "PAY_CREDIT", {"creditId": cr.id, "status": cr.status, "paidDate": str(cr.paidDate)})
+def add_sale_tx(db: Session, vendor_id: int, payload: SaleCreate) -> dict:
+    s = create_sale(db, vendor_id, payload.date, payload.mode, payload.amount)
 
-    return {
-        "id": cr.id, "vendorId": cr.vendorId, "customerId": cr.customerId,
-        "amount": cr.amount, "dueDate": cr.dueDate, "status": cr.status, "paidDate": cr.paidDate
-    }
-
-@router.post("/sales", response_model=SaleOut)
-def add_sale(payload: SaleCreate, db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    s = create_sale(db, v.id, payload.date, payload.mode, payload.amount)
-
-    add_block(db, v.id, "ADD_SALE", {
+    add_block(db, vendor_id, "ADD_SALE", {
         "saleId": s.id,
         "date": str(s.date),
         "mode": s.mode,
         "amount": s.amount
     })
-
     return {"id": s.id, "vendorId": s.vendorId, "date": s.date, "mode": s.mode, "amount": s.amount}
 
+@router.post("/sales", response_model=SaleOut)
+def add_sale(payload: SaleCreate, v: VendorPrincipal = Depends(get_current_vendor)):
+    return _write(v.id, add_sale_tx, v.id, payload)
+
+@router.post("/sales/bulk", response_model=BulkInsertResponse)
+def add_sales_bulk(payload: SaleBulkCreate, v: VendorPrincipal = Depends(get_current_vendor)):
+    # one block for the whole batch; payload_hash = Merkle root of per-sale payload hashes
+    return _write(v.id, _bulk_tx, v.id, ingest_sales, [i.model_dump() for i in payload.items])
+
 @router.get("/sales", response_model=list[SaleOut])
-def get_sales(db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    rows = list_sales(db, v.id)
-    return [{"id": r.id, "vendorId": r.vendorId, "date": r.date, "mode": r.mode, "amount": r.amount} for r in rows]
+def get_sales(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE),
+    after: int | None = None,
+    date_from: str | None = Query(None, alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    mode: str | None = None,
+    db: Session = Depends(get_db),
+    v: VendorPrincipal = Depends(get_current_vendor)
+):
+    def produce(response: Response):
+        rows = list_sales(db, v.id, limit, after, date_from, date_to, mode)
+        _set_cursor(response, rows, limit)
+        return rows_to_records(rows)
+    return cached_read(request, db, v.id, produce)
 
 @router.get("/kpis")
-def get_kpis(db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    return kpis(db, v.id)
+def get_kpis(request: Request, db: Session = Depends(get_db), v: VendorPrincipal = Depends(get_current_vendor)):
+    return cached_read(request, db, v.id, lambda _: kpis(db, v.id))
+
+def trust_score_salt(db: Session, business_type: str) -> str:
+    # the score also depends on the policy table and (weekly stability) on today's date
+    return f"{business_type}|{policy_registry.fingerprint(db)}|{date.today().isoformat()}"
 
 @router.get("/trustscore", response_model=TrustScoreResponse)
-def trust_score(db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    score, tag, breakup = compute_trust_score(db, v.id, v.businessType)
-    return {"score": score, "tag": tag, "breakup": breakup}
+def trust_score(request: Request, db: Session = Depends(get_db), v: VendorPrincipal = Depends(get_current_vendor)):
+    def produce(_):
+        score, tag, breakup = compute_trust_score(db, v.id, v.businessType)
+        return {"score": score, "tag": tag, "breakup": breakup}
+    return cached_read(request, db, v.id, produce, trust_score_salt(db, v.businessType))
+
+@router.get("/trustscore/stability")
+def trust_score_stability(request: Request, db: Session = Depends(get_db), v: VendorPrincipal = Depends(get_current_vendor)):
+    # weekly revenue mean / CV, active-day ratio and growth behind breakup.revenueStability
+    return cached_read(request, db, v.id, lambda _: stability_details(db, v.id), date.today().isoformat())
 
 @router.get("/chain/verify/me")
-def chain_verify_me(db: Session = Depends(get_db), v: Vendor = Depends(get_current_vendor)):
-    ok, info = verify_chain(db, v.id)
+def chain_verify_me(full: bool = False, db: Session = Depends(get_db), v: VendorPrincipal = Depends(get_current_vendor)):
+    ok, info = verify_chain(db, v.id, full=full)
     return {"ok": ok, "info": info}
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+DB_MODE=async: async handlers for the hot vendor routes. main.py mounts this router
+before routes.router, so these paths are served here and everything else
+(auth, photo, bulk, import/export, chain admin) stays on the sync stack.
+Writes are handed to the chain writer, reads use the AsyncSession.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from database import get_async_db
+from auth import get_current_vendor_async, VendorPrincipal
+from schemas import CustomerCreate, CustomerOut, CreditCreate, CreditOut, SaleCreate, SaleOut, TrustScoreResponse
+from routes import (
+    MAX_PAGE, _set_cursor, _write_async, trust_score_salt,
+    add_customer_tx, remove_customer_tx, add_credit_tx, pay_credit_tx, add_sale_tx
+)
+from trustscore import compute_trust_score
+from blockchain import verify_chain
+from http_cache import cached_read_async
+from serialization import rows_to_records
+from shards import vendor_session
+import async_crud
+
+router = APIRouter()
+
+
+def _sync_job(vendor_id: int, fn, *args):
+    # CPU-bound sync code (block hashing, scoring) with its own session; run it in a
+    # worker thread, AsyncSession.run_sync would run it on the event loop
+    db = vendor_session(vendor_id)
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+@router.post("/customers", response_model=CustomerOut)
+async def add_customer(payload: CustomerCreate, v: VendorPrincipal = Depends(get_current_vendor_async)):
+    return await _write_async(v.id, add_customer_tx, v.id, payload)
+
+
+@router.get("/customers", response_model=list[CustomerOut])
+async def get_customers(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE),
+    after: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    v: VendorPrincipal = Depends(get_current_vendor_async)
+):
+    async def produce(response: Response):
+        rows = await async_crud.list_customers(db, v.id, limit, after)
+        _set_cursor(response, rows, limit)
+        return rows_to_records(rows)
+    return await cached_read_async(request, db, v.id, produce)
+
+
+@router.delete("/customers/{customer_id}")
+async def remove_customer(customer_id: int, v: VendorPrincipal = Depends(get_current_vendor_async)):
+    if not await _write_async(v.id, remove_customer_tx, v.id, customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return {"ok": True}
+
+
+@router.post("/credits", response_model=CreditOut)
+async def add_credit(payload: CreditCreate, v: VendorPrincipal = Depends(get_current_vendor_async)):
+    return await _write_async(v.id, add_credit_tx, v.id, payload)
+
+
+@router.get("/credits", response_model=list[CreditOut])
+async def get_credits(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE),
+    after: int | None = None,
+    status: str | None = None,
+    due_from: str | None = Query(None, alias="from"),
+    due_to: str | None = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
+    v: VendorPrincipal = Depends(get_current_vendor_async)
+):
+    async def produce(response: Response):
+        rows = await async_crud.list_credits(db, v.id, limit, after, status, due_from, due_to)
+        _set_cursor(response, rows, limit)
+        return rows_to_records(rows)
+    return await cached_read_async(request, db, v.id, produce)
+
+
+@router.post("/credits/{credit_id}/paid", response_model=CreditOut)
+async def pay_credit(credit_id: int, v: VendorPrincipal = Depends(get_current_vendor_async)):
+    out = await _write_async(v.id, pay_credit_tx, v.id, credit_id)
+    if not out:
+        raise HTTPException(status_code=404, detail="Credit not found")
+    return out
+
+
+@router.post("/sales", response_model=SaleOut)
+async def add_sale(payload: SaleCreate, v: VendorPrincipal = Depends(get_current_vendor_async)):
+    return await _write_async(v.id, add_sale_tx, v.id, payload)
+
+
+@router.get("/sales", response_model=list[SaleOut])
+async def get_sales(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE),
+    after: int | None = None,
+    date_from: str | None = Query(None, alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    mode: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    v: VendorPrincipal = Depends(get_current_vendor_async)
+):
+    async def produce(response: Response):
+        rows = await async_crud.list_sales(db, v.id, limit, after, date_from, date_to, mode)
+        _set_cursor(response, rows, limit)
+        return rows_to_records(rows)
+    return await cached_read_async(request, db, v.id, produce)
+
+
+@router.get("/kpis")
+async def get_kpis(request: Request, db: AsyncSession = Depends(get_async_db),
+                   v: VendorPrincipal = Depends(get_current_vendor_async)):
+    async def produce(_):
+        return await async_crud.kpis(db, v.id)
+    return await cached_read_async(request, db, v.id, produce)
+
+
+@router.get("/trustscore", response_model=TrustScoreResponse)
+async def trust_score(request: Request, db: AsyncSession = Depends(get_async_db),
+                      v: VendorPrincipal = Depends(get_current_vendor_async)):
+    async def produce(_):
+        score, tag, breakup = await run_in_threadpool(_sync_job, v.id, compute_trust_score, v.id, v.businessType)
+        return {"score": score, "tag": tag, "breakup": breakup}
+    salt = await db.run_sync(trust_score_salt, v.businessType)
+    return await cached_read_async(request, db, v.id, produce, salt)
+
+
+@router.get("/chain/verify/me")
+async def chain_verify_me(full: bool = False, db: AsyncSession = Depends(get_async_db),
+                          v: VendorPrincipal = Depends(get_current_vendor_async)):
+    ok, info = await run_in_threadpool(_sync_job, v.id, verify_chain, v.id, full)
+    return {"ok": ok, "info": info}
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+from config import BULK_MAX_ITEMS
 
 class SignupRequest(BaseModel):
     ownerName: str = Field(min_length=1)
@@ -25,6 +26,8 @@ class VendorMeResponse(BaseModel):
     city: str
     upi: Optional[str] = None
     profilePhotoUrl: Optional[str] = None
+    # {size: url} of the photo's thumbnails; written in the background right after the upload
+    profilePhotoThumbs: Dict[str, str] = {}
 
 class CustomerCreate(BaseModel):
     name: str = Field(min_length=1)
@@ -43,6 +46,9 @@ class CreditCreate(BaseModel):
     amount: float
     dueDate: Optional[str] = None
 
+class CreditBulkCreate(BaseModel):
+    items: List[CreditCreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+
 class CreditOut(BaseModel):
     id: int
     vendorId: int
@@ -57,6 +63,9 @@ class SaleCreate(BaseModel):
     mode: str
     amount: float
 
+class SaleBulkCreate(BaseModel):
+    items: List[SaleCreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+
 class SaleOut(BaseModel):
     id: int
     vendorId: int
@@ -67,4 +76,10 @@ class SaleOut(BaseModel):
 class TrustScoreResponse(BaseModel):
     score: int
     tag: str
-    breakup: Dict[str, int]
\ No newline at end of file
+    breakup: Dict[str, int]
+
+class BulkInsertResponse(BaseModel):
+    count: int
+    ids: List[int]
+    blockHash: str
+    merkleRoot: str
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import ChainEntry, ChainSegment
+from config import CHAIN_ARCHIVE_DIR
+
+# Archived chain blocks live in one append-only file pair per vendor:
+#   vendor_<id>.seg  frames of [u32 length][zlib(JSON lines)] of up to CHAIN_ARCHIVE_FRAME blocks
+#   vendor_<id>.idx  fixed 16-byte entries (first block id of frame, frame offset), memory-mapped
+# chain_segments rows say which byte / index ranges are committed; anything past them
+# is the tail of an interrupted archive run and is never read.
+
+FRAME_HEADER = struct.Struct("<I")
+INDEX_ENTRY = struct.Struct("<QQ")
+
+class SegmentError(ValueError):
+    def __init__(self, seg, msg: str):
+        super().__init__(f"vendor {seg.vendor_id} segment {seg.epoch}: {msg}")
+        self.vendor_id = seg.vendor_id
+        self.epoch = seg.epoch
+
+
+# row tuples everywhere in the chain code: same order as iter_chain_columns
+Block = namedtuple("Block", "id vendor_id action payload_hash prev_hash hash createdAt")
+
+
+def segment_paths(vendor_id: int):
+    base = os.path.join(CHAIN_ARCHIVE_DIR, f"vendor_{vendor_id}")
+    return base + ".seg", base + ".idx"
+
+
+def encode_frame(rows) -> bytes:
+    lines = "\n".join(
+        json.dumps([r[0], r[1], r[2], r[3], r[4], r[5].isoformat()], separators=(",", ":")) for r in rows
+    )
+    data = zlib.compress(lines.encode("utf-8"), 6)
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def _decode_frame(data: bytes) -> list:
+    out = []
+    for line in zlib.decompress(data).decode("utf-8").split("\n"):
+        i, action, payload_hash, prev_hash, h, created = json.loads(line)
+        out.append((i, action, payload_hash, prev_hash, h, datetime.fromisoformat(created)))
+    return out
+
+
+def read_segment(seg: ChainSegment) -> list:
+    """
+    All blocks of one segment as (id, action, payload_hash, prev_hash, hash, createdAt) tuples.
+    Raises SegmentError if the bytes on disk are not the ones that were archived.
+    """
+    path, _ = segment_paths(seg.vendor_id)
+    try:
+        with open(path, "rb") as f:
+            f.seek(seg.offset_start)
+            raw = f.read(seg.offset_end - seg.offset_start)
+    except FileNotFoundError:
+        raise SegmentError(seg, "segment file missing")
+    if hashlib.sha256(raw).hexdigest() != seg.sha256:
+        raise SegmentError(seg, "checksum mismatch")
+    rows, pos = [], 0
+    while pos < len(raw):
+        (n,) = FRAME_HEADER.unpack_from(raw, pos)
+        rows.extend(_decode_frame(raw[pos + FRAME_HEADER.size:pos + FRAME_HEADER.size + n]))
+        pos += FRAME_HEADER.size + n
+    return rows
+
+
+def find_in_segment(seg: ChainSegment, block_id: int):
+    """
+    One block via the mmap'd offset index: binary search for its frame, decompress only that frame.
+    """
+    seg_path, idx_path = segment_paths(seg.vendor_id)
+    try:
+        with open(idx_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as idx:
+            lo, hi = seg.index_first, seg.index_first + seg.index_count - 1
+            if hi < lo:
+                return None
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if INDEX_ENTRY.unpack_from(idx, mid * INDEX_ENTRY.size)[0] <= block_id:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            first_id, offset = INDEX_ENTRY.unpack_from(idx, lo * INDEX_ENTRY.size)
+        if first_id > block_id:
+            return None
+        with open(seg_path, "rb") as f:
+            f.seek(offset)
+            (n,) = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+            frame = _decode_frame(f.read(n))
+    except FileNotFoundError:
+        raise SegmentError(seg, "segment file missing")
+    except (struct.error, zlib.error, ValueError) as e:
+        # only the one frame is read, so there is no checksum: a frame that does not decode was changed
+        raise SegmentError(seg, f"unreadable frame ({e})")
+    return next((r for r in frame if r[0] == block_id), None)
+
+
+def archived_rows(db: Session, vendor_id: int, after_id: int = 0, until_id: int | None = None):
+    """
+    Archived blocks of a vendor with after_id < id <= until_id, oldest first, one segment at a time.
+    """
+    q = db.query(ChainSegment).filter(ChainSegment.vendor_id == vendor_id, ChainSegment.last_block_id > after_id)
+    if until_id is not None:
+        q = q.filter(ChainSegment.first_block_id <= until_id)
+    for seg in q.order_by(ChainSegment.epoch.asc()).all():
+        for r in read_segment(seg):
+            if r[0] > after_id and (until_id is None or r[0] <= until_id):
+                yield r
+
+
+def last_archived_id(db: Session, vendor_id: int) -> int:
+    return db.execute(
+        select(ChainSegment.last_block_id).where(ChainSegment.vendor_id == vendor_id)
+        .order_by(ChainSegment.epoch.desc()).limit(1)
+    ).scalar() or 0
+
+
+def get_block(db: Session, block_id: int):
+    """
+    Block by id from the live table or, failing that, the archive. None if unknown.
+    """
+    row = db.execute(
+        select(ChainEntry.id, ChainEntry.vendor_id, ChainEntry.action, ChainEntry.payload_hash,
+               ChainEntry.prev_hash, ChainEntry.hash, ChainEntry.createdAt).where(ChainEntry.id == block_id)
+    ).first()
+    if row:
+        return Block(*row)
+    # block ids are global, so ranges of different vendors can overlap
+    for seg in db.query(ChainSegment).filter(
+        ChainSegment.first_block_id <= block_id, ChainSegment.last_block_id >= block_id
+    ).all():
+        r = find_in_segment(seg, block_id)
+        if r:
+            return Block(r[0], seg.vendor_id, *r[1:])
+    return None
+
+
+def count_archived_after(db: Session, vendor_id: int, after_id: int) -> int:
+    total = 0
+    for seg in db.query(ChainSegment).filter(
+        ChainSegment.vendor_id == vendor_id, ChainSegment.last_block_id > after_id
+    ).all():
+        if seg.first_block_id > after_id:
+            total += seg.block_count
+        else:
+            total += sum(1 for r in read_segment(seg) if r[0] > after_id)
+    return total
+
+
+def previous_archived_id(db: Session, vendor_id: int, block_id: int):
+    seg = (
+        db.query(ChainSegment)
+        .filter(ChainSegment.vendor_id == vendor_id, ChainSegment.first_block_id < block_id)
+        .order_by(ChainSegment.epoch.desc())
+        .first()
+    )
+    if not seg:
+        return None
+    if seg.last_block_id < block_id:
+        return seg.last_block_id
+    return max((r[0] for r in read_segment(seg) if r[0] < block_id), default=None)
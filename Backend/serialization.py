@@ -0,0 +1,84 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson        # optional: ~5-10x faster than json for large lists
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack       # optional: Accept: application/msgpack
+except ImportError:
+    msgpack = None
+
+# Response bytes for the hot read paths. Handlers hand plain dicts/lists (or row
+# tuples via rows_to_records) straight to the encoder: no response_model round trip,
+# no jsonable_encoder walk.
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"{type(obj).__name__} is not serializable")
+
+
+def dumps_json(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(data) -> bytes:
+    return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+def encode(data, media_type: str = JSON) -> bytes:
+    return dumps_msgpack(data) if media_type == MSGPACK else dumps_json(data)
+
+
+def rows_to_records(rows) -> list:
+    """
+    Column-only query rows -> list of dicts, field names taken once from the first row.
+    """
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, r)) for r in rows]
+
+
+def negotiate(request: Request) -> str:
+    """
+    MessagePack when the client asks for it (and msgpack is installed), else JSON.
+    """
+    if msgpack is None:
+        return JSON
+    for part in request.headers.get("accept", "").split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        if media.lower() not in _MSGPACK_TYPES:
+            continue
+        q = next((p[2:] for p in params if p.startswith("q=")), "1")
+        try:
+            if float(q) > 0:
+                return MSGPACK
+        except ValueError:
+            pass
+    return JSON
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class: same output as JSONResponse, encoded with orjson when available.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
@@ -0,0 +1,210 @@
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, Request
+from jose import jwt, JWTError
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, shard_sessions
+from models import Vendor, VendorShard
+from config import SECRET_KEY, ALGORITHM, SHARD_PLACEMENT, SHARD_DIRECTORY_TTL
+
+# Horizontal partitioning by vendor: every row of a vendor (records, stats, chain) lives
+# on one shard. The vendor_shards directory on the home shard (shard 0) says which one,
+# allocates vendor ids so they stay unique across shards, and keeps mobiles unique.
+# New vendors are placed by SHARD_PLACEMENT; rebalance.py moves them afterwards.
+# With a single database none of this runs: everything is shard 0.
+
+
+def shard_count() -> int:
+    return len(shard_sessions)
+
+
+def is_sharded() -> bool:
+    return len(shard_sessions) > 1
+
+
+def hash_shard(vendor_id: int, shards: int | None = None) -> int:
+    # crc32 is stable across processes and Python versions (hash() is salted)
+    return zlib.crc32(str(vendor_id).encode("utf-8")) % (shards or shard_count())
+
+
+class ShardDirectory:
+    """
+    vendor_id -> (shard, state), read from vendor_shards and cached per process for
+    SHARD_DIRECTORY_TTL seconds. Vendors without an entry are on the home shard.
+    """
+
+    def __init__(self, ttl: float = SHARD_DIRECTORY_TTL):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, vendor_id: int):
+        item = self._data.get(vendor_id)
+        if item and item[1] > time.monotonic():
+            return item[0]
+        db = SessionLocal()
+        try:
+            row = db.get(VendorShard, vendor_id)
+            entry = (row.shard, row.state) if row else (0, "active")
+        finally:
+            db.close()
+        with self._lock:
+            self._data[vendor_id] = (entry, time.monotonic() + self.ttl)
+        return entry
+
+    def invalidate(self, vendor_id: int | None = None):
+        with self._lock:
+            if vendor_id is None:
+                self._data.clear()
+            else:
+                self._data.pop(vendor_id, None)
+
+
+directory = ShardDirectory()
+
+
+def shard_for(vendor_id: int) -> int:
+    if not is_sharded():
+        return 0
+    return directory.lookup(vendor_id)[0]
+
+
+def check_writable(vendor_id: int):
+    if is_sharded() and directory.lookup(vendor_id)[1] == "moving":
+        raise HTTPException(status_code=503, detail="Vendor data is being moved to another shard, retry shortly")
+
+
+def vendor_session(vendor_id: int) -> Session:
+    return shard_sessions[shard_for(vendor_id)]()
+
+
+def _token_vendor_id(request: Request):
+    header = request.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return int(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub"))
+    except (JWTError, ValueError, TypeError):
+        # get_current_vendor answers 401 for it
+        return None
+
+
+def request_shard(request: Request) -> int:
+    """
+    Shard for get_db: a vendor_id path parameter (the vendor the route reads), else the
+    token's vendor, else home.
+    """
+    try:
+        vendor_id = int(request.path_params["vendor_id"])
+    except (KeyError, ValueError):
+        vendor_id = _token_vendor_id(request)
+    if vendor_id is None:
+        return 0
+    return shard_for(vendor_id)
+
+
+def shard_for_mobile(mobile: str) -> int:
+    if not is_sharded():
+        return 0
+    db = SessionLocal()
+    try:
+        return db.query(VendorShard.shard).filter(VendorShard.mobile == mobile).scalar() or 0
+    finally:
+        db.close()
+
+
+def vendor_counts(db: Session) -> list:
+    counts = [0] * shard_count()
+    for shard, n in db.query(VendorShard.shard, func.count(VendorShard.vendorId)).group_by(VendorShard.shard):
+        if shard < len(counts):
+            counts[shard] = n
+    return counts
+
+
+def register_vendor(mobile: str):
+    """
+    Directory entry for a new vendor -> (vendor_id, shard). Raises ValueError if the
+    mobile is already registered on any shard.
+    """
+    db = SessionLocal()
+    try:
+        entry = VendorShard(mobile=mobile, shard=0, state="active")
+        db.add(entry)
+        db.flush()
+        if SHARD_PLACEMENT == "least":
+            counts = vendor_counts(db)
+            counts[0] -= 1   # the entry just added
+            entry.shard = counts.index(min(counts))
+        else:
+            entry.shard = hash_shard(entry.vendorId)
+        db.commit()
+        return entry.vendorId, entry.shard
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("Mobile already registered")
+    finally:
+        db.close()
+
+
+def forget_vendor(vendor_id: int):
+    # undo register_vendor when the signup transaction on the shard failed
+    db = SessionLocal()
+    try:
+        db.query(VendorShard).filter(VendorShard.vendorId == vendor_id).delete()
+        db.commit()
+    finally:
+        db.close()
+    directory.invalidate(vendor_id)
+
+
+def sync_directory() -> int:
+    """
+    Adds directory entries for vendors that have none (data from before sharding,
+    or shards filled by hand). Returns how many were added.
+    """
+    if not is_sharded():
+        return 0
+    home = SessionLocal()
+    try:
+        known = {vid for (vid,) in home.query(VendorShard.vendorId)}
+        added = 0
+        for shard, factory in enumerate(shard_sessions):
+            db = factory()
+            try:
+                rows = db.query(Vendor.id, Vendor.mobile).all()
+            finally:
+                db.close()
+            for vid, mobile in rows:
+                if vid not in known:
+                    home.add(VendorShard(vendorId=vid, mobile=mobile, shard=shard, state="active"))
+                    known.add(vid)
+                    added += 1
+        home.commit()
+        return added
+    finally:
+        home.close()
+
+
+def fan_out(fn, *args) -> list:
+    """
+    fn(db, shard, *args) on every shard in parallel, each with its own session;
+    results in shard order. Runs inline with a single database.
+    """
+    def run(shard: int):
+        db = shard_sessions[shard]()
+        try:
+            return fn(db, shard, *args)
+        finally:
+            db.close()
+
+    if not is_sharded():
+        return [run(0)]
+    with ThreadPoolExecutor(max_workers=shard_count(), thread_name_prefix="shard") as pool:
+        return list(pool.map(run, range(shard_count())))
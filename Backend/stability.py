@@ -0,0 +1,217 @@
+import math
+from collections import namedtuple
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional
+
+from config import STABILITY_WINDOW_WEEKS, STABILITY_MIN_WEEKS
+
+# Weekly revenue over a rolling window kept as running statistics (revenue_stats row),
+# so scoring is O(1) per vendor however long the history is. Any object with these
+# attributes works (the ORM row, or RevenueState built from a column query).
+RevenueState = namedtuple(
+    "RevenueState",
+    "weeks mean m2 sumXY firstWeek lastWeek lastValue activeDays lastActiveDays firstDay lastDay"
+)
+
+EPOCH_MONDAY = date(2000, 1, 3)
+
+# weights of the stability components (sum to 1)
+W_CONSISTENCY = 0.5
+W_ACTIVITY = 0.3
+W_TREND = 0.2
+MAX_GROWTH = 0.10  # +-10% per week maps to the ends of the trend scale
+
+
+def week_index(day: str) -> int:
+    return (date.fromisoformat(day) - EPOCH_MONDAY).days // 7
+
+
+def week_start(week: int) -> str:
+    return (EPOCH_MONDAY + timedelta(weeks=week)).isoformat()
+
+
+# ---------- Welford ----------
+
+def welford_add(n: int, mean: float, m2: float, x: float):
+    n += 1
+    d = x - mean
+    mean += d / n
+    return n, mean, m2 + d * (x - mean)
+
+
+def welford_remove(n: int, mean: float, m2: float, x: float):
+    if n <= 1:
+        return 0, 0.0, 0.0
+    n1 = n - 1
+    new_mean = (n * mean - x) / n1
+    return n1, new_mean, max(0.0, m2 - (x - mean) * (x - new_mean))
+
+
+def welford_add_zeros(n: int, mean: float, m2: float, k: int):
+    # Chan et al. merge with a block of k zero observations
+    if k <= 0:
+        return n, mean, m2
+    total = n + k
+    d = -mean
+    return total, mean + d * k / total, m2 + d * d * n * k / total
+
+
+def window_bounds(first: int, last: int, window: int = STABILITY_WINDOW_WEEKS):
+    return max(first, last - window + 1), last
+
+
+def apply_week(st, week: int, old: float, new: float, new_days: int,
+               week_values: Callable[[int, int], Dict[int, tuple]], window: int = STABILITY_WINDOW_WEEKS):
+    """
+    Revenue of `week` changes old -> new (old is 0 for a week without sales) and it
+    gains `new_days` active days. The window [max(firstWeek, lastWeek - window + 1), lastWeek]
+    slides forward when a later week shows up; week_values(lo, hi) returns
+    {week: (revenue, active_days)} for the weeks that leave it.
+    """
+    if not st.weeks or st.firstWeek is None:
+        st.weeks, st.mean, st.m2, st.sumXY = 1, new, 0.0, week * new
+        st.firstWeek = st.lastWeek = week
+        st.lastValue, st.activeDays, st.lastActiveDays = new, new_days, new_days
+        return
+
+    old_lo, old_hi = window_bounds(st.firstWeek, st.lastWeek, window)
+    first, last = min(st.firstWeek, week), max(st.lastWeek, week)
+    lo, hi = window_bounds(first, last, window)
+    n, mean, m2, sxy, active = st.weeks, st.mean, st.m2, st.sumXY or 0.0, st.activeDays or 0
+
+    # weeks sliding out at the front (only when the window moves forward)
+    if lo > old_lo:
+        gone_hi = min(lo - 1, old_hi)
+        values = week_values(old_lo, gone_hi)
+        for wk in range(old_lo, gone_hi + 1):
+            x, days = values.get(wk, (0.0, 0))
+            n, mean, m2 = welford_remove(n, mean, m2, x)
+            sxy -= wk * x
+            active -= days
+
+    # weeks entering: zeros, except the changed week itself
+    entering = []
+    if lo < old_lo:
+        entering.append((lo, min(old_lo - 1, hi)))
+    if hi > old_hi:
+        entering.append((max(old_hi + 1, lo), hi))
+    entered = False
+    for a, b in entering:
+        if a <= week <= b:
+            n, mean, m2 = welford_add_zeros(n, mean, m2, b - a)
+            n, mean, m2 = welford_add(n, mean, m2, new)
+            sxy += week * new
+            active += new_days
+            entered = True
+        else:
+            n, mean, m2 = welford_add_zeros(n, mean, m2, b - a + 1)
+
+    # changed week already inside the window
+    if not entered and old_lo <= week <= old_hi and lo <= week <= hi:
+        n, mean, m2 = welford_remove(n, mean, m2, old)
+        n, mean, m2 = welford_add(n, mean, m2, new)
+        sxy += week * (new - old)
+        active += new_days
+
+    if week > st.lastWeek:
+        st.lastValue, st.lastActiveDays = new, new_days
+    elif week == st.lastWeek:
+        st.lastValue, st.lastActiveDays = new, (st.lastActiveDays or 0) + new_days
+    st.weeks, st.mean, st.m2, st.sumXY, st.activeDays = n, mean, m2, sxy, max(0, active)
+    st.firstWeek, st.lastWeek = first, last
+
+
+# ---------- Features ----------
+
+def _index_sums(first: int, last: int):
+    # sum(x), sum(x^2) for x = first..last
+    def s1(k):
+        return k * (k + 1) // 2
+
+    def s2(k):
+        return k * (k + 1) * (2 * k + 1) // 6
+    return s1(last) - s1(first - 1), s2(last) - s2(first - 1)
+
+
+def stability_features(st, week_values: Callable[[int, int], Dict[int, tuple]], today: Optional[date] = None,
+                       window: int = STABILITY_WINDOW_WEEKS) -> Optional[Dict[str, float]]:
+    """
+    Rolling weekly revenue mean, coefficient of variation, active-day ratio and growth
+    trend (least-squares slope / mean) over the complete weeks of the `window` weeks up to
+    the current one (never before firstWeek); idle weeks since the last sale count as
+    zero weeks. The stored window ends at lastWeek, so weeks it has and this one doesn't
+    (or the reverse) are read with week_values(lo, hi) -> {week: (revenue, active_days)},
+    at most `window` weeks. None while fewer than STABILITY_MIN_WEEKS complete weeks exist.
+    """
+    if st is None or not st.weeks or st.firstWeek is None:
+        return None
+    lo, hi = window_bounds(st.firstWeek, st.lastWeek, window)
+    n, mean, m2, sxy, active = st.weeks, st.mean, st.m2, st.sumXY or 0.0, st.activeDays or 0
+
+    current = week_index((today or date.today()).isoformat())
+    new_lo, new_hi = max(st.firstWeek, current - window + 1), current - 1
+    if new_hi < new_lo:
+        return None
+
+    def fold(a: int, b: int, sign: int):
+        nonlocal n, mean, m2, sxy, active
+        if a > b:
+            return
+        if sign < 0 and a == b == st.lastWeek:
+            values = {a: (st.lastValue, st.lastActiveDays or 0)}
+        else:
+            values = week_values(a, b)
+        for wk in range(a, b + 1):
+            x, days = values.get(wk, (0.0, 0))
+            if sign > 0:
+                n, mean, m2 = welford_add(n, mean, m2, x)
+            else:
+                n, mean, m2 = welford_remove(n, mean, m2, x)
+            sxy += sign * wk * x
+            active += sign * days
+
+    if new_lo > hi or new_hi < lo:
+        # nothing in common: start empty
+        n, mean, m2, sxy, active = 0, 0.0, 0.0, 0.0, 0
+        fold(new_lo, min(new_hi, st.lastWeek), 1)
+    else:
+        fold(lo, new_lo - 1, -1)              # slid out at the front (idle vendor)
+        fold(new_hi + 1, hi, -1)              # the current, incomplete week
+        fold(new_lo, min(lo - 1, new_hi), 1)  # only when lastWeek is in the future
+    # weeks after lastWeek had no sales
+    zeros_from = max(new_lo, st.lastWeek + 1)
+    n, mean, m2 = welford_add_zeros(n, mean, m2, new_hi - zeros_from + 1)
+    lo, hi = new_lo, new_hi
+    if n < STABILITY_MIN_WEEKS:
+        return None
+
+    std = math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+    sx, sxx = _index_sums(lo, hi)
+    den = n * sxx - sx * sx
+    slope = (n * sxy - sx * (mean * n)) / den if den else 0.0
+
+    days = (hi - lo + 1) * 7
+    if lo == st.firstWeek and st.firstDay:
+        days -= (date.fromisoformat(st.firstDay) - date.fromisoformat(week_start(lo))).days
+    return {
+        "weeks": n,
+        "weeklyMean": round(mean, 2),
+        "weeklyStd": round(std, 2),
+        "cv": round(std / mean, 4) if mean > 0 else None,
+        "activeDayRatio": round(min(1.0, max(0, active) / days), 4) if days > 0 else 0.0,
+        "growth": round(slope / mean, 4) if mean > 0 else 0.0,
+    }
+
+
+def stability_score(features: Optional[Dict[str, float]], sale_count: int) -> int:
+    """
+    0..95. Without enough history falls back to the old heuristic 40 + 5 per sale (max 10 sales).
+    """
+    if features is None:
+        return int(round(min(95.0, 40.0 + 5.0 * min(int(sale_count or 0), 10))))
+    cv = features["cv"]
+    consistency = 0.0 if cv is None else max(0.0, 1.0 - min(cv, 1.0))
+    growth = max(-MAX_GROWTH, min(MAX_GROWTH, features["growth"]))
+    trend = (growth + MAX_GROWTH) / (2 * MAX_GROWTH)
+    raw = 100.0 * (W_CONSISTENCY * consistency + W_ACTIVITY * features["activeDayRatio"] + W_TREND * trend)
+    return int(round(max(0.0, min(95.0, raw))))
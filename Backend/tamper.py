@@ -1,92 +1,199 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 
-from database import get_db  # (agar error aaye to niche import fix section dekho)
+from database import get_db, shard_sessions  # (agar error aaye to niche import fix section dekho)
+from blockchain import load_checkpoint, check_chain, inclusion_proof
+from models import ChainProofRoot
+from segments import SegmentError, get_block, count_archived_after, previous_archived_id
+from audit import audit_slots, audit_stream
+from chain_writer import chain_writer
+from shards import fan_out, shard_for
 
 router = APIRouter(prefix="/chain", tags=["Tamper Detection"])
 
 
-def verify_chain_for_vendor(db: Session, vendor_id: int):
-    # Ordered by id is important
-    rows = db.execute(
-        text("""
-            SELECT id, vendor_id, prev_hash, hash, createdAt, action
-            FROM chain_entries
-            WHERE vendor_id = :vendor_id
-            ORDER BY id ASC
-        """),
-        {"vendor_id": vendor_id}
-    ).mappings().all()
+def _entry(db: Session, block_id: int):
+    # live row or archived segment
+    block = get_block(db, block_id)
+    return block._asdict() if block else None
 
-    if not rows:
-        return {
-            "vendor_id": vendor_id,
-            "total_entries": 0,
-            "is_valid": True,
-            "message": "No entries for this vendor"
-        }
 
-    # First row must have prev_hash == GENESIS
-    first = rows[0]
-    if (first["prev_hash"] or "").upper() != "GENESIS":
+def _count_after(db: Session, vendor_id: int, after_id: int) -> int:
+    live = db.execute(
+        text("SELECT COUNT(*) FROM chain_entries WHERE vendor_id = :vendor_id AND id > :after_id"),
+        {"vendor_id": vendor_id, "after_id": after_id}
+    ).scalar() or 0
+    return live + count_archived_after(db, vendor_id, after_id)
+
+
+def verify_chain_for_vendor(db: Session, vendor_id: int, full: bool = False):
+    # Signed checkpoint -> only blocks after it need checking (full=True ignores it)
+    cp = None if full else load_checkpoint(db, vendor_id)
+    after_id = cp.last_block_id if cp else 0
+    base_entries = cp.length if cp else 0
+    genesis = cp.last_hash if cp else "GENESIS"
+
+    # Batched pipeline: link check + full re-hash, chunk by chunk (ordered by id),
+    # archived segments first
+    try:
+        if cp:
+            # checkpointed block (live or archived) must still be there with the same hash
+            anchor = get_block(db, cp.last_block_id)
+            if not anchor or anchor.hash != cp.last_hash:
+                return {
+                    "vendor_id": vendor_id,
+                    "total_entries": base_entries,
+                    "checked_entries": 0,
+                    "is_valid": False,
+                    "broken_at_id": cp.last_block_id,
+                    "reason": "checkpointed block missing" if not anchor else "checkpointed block hash changed",
+                    "expected_hash": cp.last_hash,
+                    "found_hash": anchor.hash if anchor else None,
+                    "broken_entry": anchor._asdict() if anchor else None
+                }
+        checked, _, _, fault = check_chain(db, vendor_id, genesis, after_id)
+    except SegmentError as e:
         return {
             "vendor_id": vendor_id,
-            "total_entries": len(rows),
+            "total_entries": base_entries,
+            "checked_entries": 0,
             "is_valid": False,
-            "broken_at_id": first["id"],
-            "reason": "First entry prev_hash is not GENESIS",
-            "expected_prev_hash": "GENESIS",
-            "found_prev_hash": first["prev_hash"],
-            "first_entry": dict(first)
+            "broken_segment": e.epoch,
+            "reason": str(e)
         }
 
-    # Check linking
-    prev_hash = first["hash"]
-    for i in range(1, len(rows)):
-        cur = rows[i]
-        if cur["prev_hash"] != prev_hash:
+    if not fault:
+        if not checked:
             return {
                 "vendor_id": vendor_id,
-                "total_entries": len(rows),
-                "is_valid": False,
-                "broken_at_id": cur["id"],
-                "reason": "prev_hash mismatch (tamper suspected)",
-                "expected_prev_hash": prev_hash,
-                "found_prev_hash": cur["prev_hash"],
-                "broken_entry": dict(cur),
-                "previous_entry": dict(rows[i-1])
+                "total_entries": base_entries,
+                "checked_entries": 0,
+                "is_valid": True,
+                "message": "No new entries since checkpoint" if cp else "No entries for this vendor"
             }
-        prev_hash = cur["hash"]
+        return {
+            "vendor_id": vendor_id,
+            "total_entries": base_entries + checked,
+            "checked_entries": checked,
+            "is_valid": True,
+            "message": "Chain is valid"
+        }
 
-    return {
+    result = {
         "vendor_id": vendor_id,
-        "total_entries": len(rows),
-        "is_valid": True,
-        "message": "Chain is valid"
+        "total_entries": base_entries + _count_after(db, vendor_id, after_id),
+        "checked_entries": checked,
+        "is_valid": False,
+        "broken_at_id": fault["block_id"],
     }
+    broken = _entry(db, fault["block_id"])
+
+    if fault["reason"] == "hash":
+        result.update({
+            "reason": "hash mismatch (block content modified)",
+            "expected_hash": fault["expected"],
+            "found_hash": fault["found"],
+            "broken_entry": broken
+        })
+    elif checked == 0:
+        # First row must link to the checkpoint (or GENESIS)
+        result.update({
+            "reason": "First entry prev_hash does not match checkpoint" if cp else "First entry prev_hash is not GENESIS",
+            "expected_prev_hash": fault["expected"],
+            "found_prev_hash": fault["found"],
+            "first_entry": broken
+        })
+    else:
+        previous = db.execute(
+            text("""
+                SELECT id FROM chain_entries
+                WHERE vendor_id = :vendor_id AND id < :id
+                ORDER BY id DESC LIMIT 1
+            """),
+            {"vendor_id": vendor_id, "id": fault["block_id"]}
+        ).scalar() or previous_archived_id(db, vendor_id, fault["block_id"])
+        result.update({
+            "reason": "prev_hash mismatch (tamper suspected)",
+            "expected_prev_hash": fault["expected"],
+            "found_prev_hash": fault["found"],
+            "broken_entry": broken,
+            "previous_entry": _entry(db, previous) if previous else None
+        })
+    return result
+
+
+@router.get("/writer")
+def writer_stats():
+    # queue depth, batch sizes, flush / enqueue-to-commit latency of the chain writer
+    return chain_writer.stats()
 
 
 @router.get("/verify")
-def verify_all_vendors(db: Session = Depends(get_db)):
-    vendor_ids = db.execute(text("SELECT DISTINCT vendor_id FROM chain_entries")).scalars().all()
-
-    results = []
-    overall_ok = True
-
-    for vid in vendor_ids:
-        r = verify_chain_for_vendor(db, vid)
-        results.append(r)
-        if not r["is_valid"]:
-            overall_ok = False
-
-    return {
-        "overall_valid": overall_ok,
-        "vendors_checked": len(vendor_ids),
-        "results": results
-    }
+def verify_all_vendors(full: bool = False):
+    # NDJSON stream: vendors are audited in the shared process pool, verdicts arrive as chunks finish
+    if not audit_slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many chain audits running, retry later")
+    stream = audit_stream(full=full)
+    next(stream)
+    return StreamingResponse(stream, media_type="application/x-ndjson")
 
 
 @router.get("/verify/{vendor_id}")
-def verify_one_vendor(vendor_id: int, db: Session = Depends(get_db)):
-    return verify_chain_for_vendor(db, vendor_id)
\ No newline at end of file
+def verify_one_vendor(vendor_id: int, full: bool = False, db: Session = Depends(get_db)):
+    return verify_chain_for_vendor(db, vendor_id, full=full)
+
+def _proof_on(db: Session, shard: int, block_id: int):
+    try:
+        try:
+            proof = inclusion_proof(db, block_id)
+            db.commit()
+        except IntegrityError:
+            # another request sealed the same epoch first
+            db.rollback()
+            proof = inclusion_proof(db, block_id)
+    except SegmentError as e:
+        # the block or its epoch sits in archived bytes that changed on disk
+        db.rollback()
+        return {"block_id": block_id, "vendor_id": e.vendor_id, "valid": False,
+                "broken_segment": e.epoch, "reason": str(e)}
+    return proof
+
+
+@router.get("/proof/{block_id}")
+def chain_proof(block_id: int, vendor_id: int | None = None):
+    # inclusion proof of one entry; check offline with merkle.verify_proof(leaf, proof, root)
+    if vendor_id is not None:
+        shard = shard_for(vendor_id)
+        db = shard_sessions[shard]()
+        try:
+            found = [_proof_on(db, shard, block_id)]
+        finally:
+            db.close()
+        found = [p for p in found if p and p["vendor_id"] == vendor_id]
+    else:
+        # the block's shard is unknown: ask all of them (ids from before sharding can repeat)
+        found = [p for p in fan_out(_proof_on, block_id) if p]
+    if not found:
+        raise HTTPException(status_code=404, detail="Block not found")
+    if len(found) > 1:
+        raise HTTPException(status_code=409, detail="Block id exists on several shards, pass ?vendor_id=")
+    return found[0]
+
+
+@router.get("/roots/{vendor_id}")
+def chain_roots(vendor_id: int, db: Session = Depends(get_db)):
+    # published proof-epoch roots of a vendor
+    rows = (
+        db.query(ChainProofRoot)
+        .filter(ChainProofRoot.vendor_id == vendor_id)
+        .order_by(ChainProofRoot.epoch.asc())
+        .all()
+    )
+    return [
+        {"epoch": r.epoch, "first_block_id": r.first_block_id, "last_block_id": r.last_block_id,
+         "leaf_count": r.leaf_count, "root": r.root, "createdAt": r.createdAt}
+        for r in rows
+    ]
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+
+# must be set before anything imports config/database
+_tmp = tempfile.mkdtemp(prefix="trustchain_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+# a second shard, so routing, fan-out and moves run; vendors without a directory entry
+# stay on the home shard, which then works like the single-database setup
+os.environ["SHARD_URLS"] = f"sqlite:///{_tmp}/test_shard1.db"
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_tmp, "uploads"))
+os.environ.setdefault("CHAIN_ARCHIVE_DIR", os.path.join(_tmp, "chain_archive"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database import Base, SessionLocal, shard_engines
+from models import Vendor
+from shards import directory
+
+
+@pytest.fixture
+def db():
+    for eng in shard_engines:
+        Base.metadata.drop_all(bind=eng)
+        Base.metadata.create_all(bind=eng)
+    directory.invalidate()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def vendor(db):
+    v = Vendor(ownerName="Test", mobile="9000000000", passwordHash="x", businessType="Grocery", city="Pune")
+    db.add(v)
+    db.commit()
+    return v
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+import blockchain
+from archive import archive_vendor
+from blockchain import add_block, inclusion_proof, save_checkpoint, verify_chain
+from merkle import verify_proof
+from models import ChainEntry, ChainSegment
+from segments import SegmentError, get_block, segment_paths
+from tamper import chain_proof, verify_chain_for_vendor
+
+
+@pytest.fixture
+def archived(db, vendor, monkeypatch):
+    # 14 blocks in ranges of 4: ranges 0 and 1 go to the archive, range 2 stays live (keep 1)
+    monkeypatch.setattr(blockchain, "CHAIN_MERKLE_RANGE", 4)
+    ids = [add_block(db, vendor.id, "ADD_SALE", {"vendorId": vendor.id, "id": i, "amount": i}).id for i in range(14)]
+    db.commit()
+    hashes = [db.get(ChainEntry, i).hash for i in ids]
+    assert archive_vendor(db, vendor.id, keep_ranges=1) == 8
+    return vendor.id, ids, hashes
+
+
+def _flip_byte(path: str, offset: int):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        b = f.read(1)
+        f.seek(offset)
+        f.write(bytes([b[0] ^ 0xFF]))
+
+
+def test_archived_chain_still_verifies(db, archived):
+    vendor_id, ids, hashes = archived
+    assert db.query(ChainEntry).filter(ChainEntry.vendor_id == vendor_id).count() == 6
+    assert db.query(ChainSegment).filter(ChainSegment.vendor_id == vendor_id).count() == 2
+
+    ok, info = verify_chain(db, vendor_id, full=True)
+    assert ok and info["blocks"] == 14
+    r = verify_chain_for_vendor(db, vendor_id, full=True)
+    assert r["is_valid"] is True and r["total_entries"] == 14
+
+    assert get_block(db, ids[0]).hash == hashes[0]
+    proof = inclusion_proof(db, ids[0])
+    assert verify_proof(proof["leaf"], proof["proof"], proof["root"])
+
+
+def test_changed_segment_bytes_are_reported(db, archived):
+    vendor_id, ids, _ = archived
+    seg_path, _ = segment_paths(vendor_id)
+    seg = db.query(ChainSegment).filter(ChainSegment.vendor_id == vendor_id, ChainSegment.epoch == 0).one()
+    _flip_byte(seg_path, seg.offset_start + 8)
+
+    assert verify_chain(db, vendor_id, full=True) == (False, {"bad_segment": 0})
+    r = verify_chain_for_vendor(db, vendor_id, full=True)
+    assert r["is_valid"] is False and r["broken_segment"] == 0
+
+
+def test_missing_segment_file_is_reported(db, archived):
+    vendor_id, ids, _ = archived
+    for path in segment_paths(vendor_id):
+        os.remove(path)
+
+    r = verify_chain_for_vendor(db, vendor_id, full=True)
+    assert r["is_valid"] is False and r["reason"].endswith("segment file missing")
+    with pytest.raises(SegmentError):
+        get_block(db, ids[0])
+
+
+def test_archived_checkpoint_block_is_checked(db, archived):
+    vendor_id, ids, hashes = archived
+    # checkpoint on the last archived block: only the 6 live blocks are re-checked
+    save_checkpoint(db, vendor_id, ids[7], hashes[7], 8)
+    db.commit()
+    r = verify_chain_for_vendor(db, vendor_id)
+    assert r["is_valid"] is True and r["checked_entries"] == 6
+
+    # the anchor is read from its frame alone: a damaged frame is a broken verdict, not a crash
+    seg_path, _ = segment_paths(vendor_id)
+    seg = db.query(ChainSegment).filter(ChainSegment.vendor_id == vendor_id, ChainSegment.epoch == 1).one()
+    _flip_byte(seg_path, seg.offset_start + 8)
+    r = verify_chain_for_vendor(db, vendor_id)
+    assert r["is_valid"] is False and r["broken_segment"] == 1
+    ok, info = verify_chain(db, vendor_id)
+    assert not ok and info == {"bad_segment": 1}
+
+    proof = chain_proof(ids[7], vendor_id=vendor_id)
+    assert proof["valid"] is False and proof["broken_segment"] == 1
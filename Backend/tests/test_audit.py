@@ -0,0 +1,74 @@
+import asyncio
+import gc
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import audit
+from audit import audit_slots, stream_audit
+from blockchain import add_block
+from models import ChainEntry, Vendor
+from tamper import verify_all_vendors
+
+
+def _vendors(db, n: int) -> list:
+    ids = []
+    for i in range(n):
+        v = Vendor(ownerName=f"V{i}", mobile=f"90000000{i:02d}", passwordHash="x", businessType="Grocery", city="Pune")
+        db.add(v)
+        db.flush()
+        for j in range(3):
+            add_block(db, v.id, "ADD_SALE", {"vendorId": v.id, "id": j, "amount": j})
+        ids.append(v.id)
+    db.commit()
+    return ids
+
+
+def _lines(stream) -> list:
+    return [json.loads(line) for line in stream if line.strip()]
+
+
+def _body_lines(response) -> list:
+    async def drain():
+        return [chunk async for chunk in response.body_iterator]
+    return _lines(asyncio.run(drain()))
+
+
+@pytest.fixture
+def pool():
+    yield
+    audit.shutdown_pool()
+
+
+def test_parallel_audit_reports_tampered_vendor_and_reuses_pool(db, pool):
+    ids = _vendors(db, 3)
+    bad = db.query(ChainEntry).filter(ChainEntry.vendor_id == ids[1]).order_by(ChainEntry.id).first()
+    bad.action = "ADD_CREDIT"
+    db.commit()
+
+    lines = _lines(stream_audit(workers=2, chunk_size=1))
+    verdicts = {r["vendor_id"]: r["is_valid"] for r in lines if r["type"] == "result"}
+    assert verdicts == {ids[0]: True, ids[1]: False, ids[2]: True}
+    assert lines[-1]["type"] == "summary" and lines[-1]["overall_valid"] is False
+
+    first = audit._pool
+    assert first is not None
+    _lines(stream_audit(workers=2, chunk_size=1))
+    assert audit._pool is first
+
+
+def test_concurrent_audit_is_refused_until_the_stream_ends(db, pool):
+    _vendors(db, 1)
+    response = verify_all_vendors()
+    with pytest.raises(HTTPException) as e:
+        verify_all_vendors()
+    assert e.value.status_code == 429
+
+    # the slot is held by the primed stream; a response dropped before its body starts frees it
+    del response
+    gc.collect()
+    response = verify_all_vendors()
+    assert _body_lines(response)[-1]["overall_valid"] is True
+    assert audit_slots.acquire(blocking=False)
+    audit_slots.release()
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import chain_writer
+from chain_writer import ChainWriter
+from database import SessionLocal
+
+
+def _writer(monkeypatch, timeout: float) -> ChainWriter:
+    monkeypatch.setattr(chain_writer, "CHAIN_WRITER_TIMEOUT", timeout)
+    return ChainWriter(SessionLocal, max_batch=1, linger_ms=0)
+
+
+def test_timed_out_queued_job_never_runs(db, monkeypatch):
+    writer = _writer(monkeypatch, 0.1)
+    release, ran = threading.Event(), []
+    writer.submit(1, lambda db: release.wait(5))
+
+    with pytest.raises(HTTPException) as e:
+        writer.run(1, lambda db: ran.append("late"))
+    assert e.value.status_code == 503
+
+    release.set()
+    writer.run(1, lambda db: ran.append("next"))
+    assert ran == ["next"]
+
+
+def test_timed_out_running_job_is_waited_for(db, monkeypatch):
+    writer = _writer(monkeypatch, 0.05)
+
+    def slow(db):
+        time.sleep(0.2)
+        return "written"
+
+    assert writer.run(1, slow) == "written"
+    assert asyncio.run(writer.run_async(1, slow)) == "written"
+
+
+def test_async_timed_out_queued_job_never_runs(db, monkeypatch):
+    writer = _writer(monkeypatch, 0.1)
+    release, ran = threading.Event(), []
+    writer.submit(1, lambda db: release.wait(5))
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(writer.run_async(1, lambda db: ran.append("late")))
+    assert e.value.status_code == 503
+
+    release.set()
+    writer.run(1, lambda db: ran.append("next"))
+    assert ran == ["next"]
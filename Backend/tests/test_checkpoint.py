@@ -0,0 +1,83 @@
+from audit import audit_vendors
+from blockchain import add_block, load_checkpoint, verify_chain
+from models import ChainCheckpoint, ChainEntry
+from tamper import verify_chain_for_vendor
+
+
+def _chain(db, vendor_id: int, n: int) -> list:
+    ids = [add_block(db, vendor_id, "ADD_SALE", {"vendorId": vendor_id, "id": i, "amount": i}).id for i in range(n)]
+    db.commit()
+    return ids
+
+
+def _tamper_hash(db, block_id: int):
+    db.query(ChainEntry).filter(ChainEntry.id == block_id).update({"hash": "0" * 64}, synchronize_session=False)
+    db.commit()
+
+
+def test_checkpoint_limits_work_to_new_blocks(db, vendor):
+    _chain(db, vendor.id, 5)
+    ok, info = verify_chain(db, vendor.id)
+    assert ok and info["checked"] == 5
+
+    _chain(db, vendor.id, 3)
+    r = verify_chain_for_vendor(db, vendor.id)
+    assert r["is_valid"] is True
+    assert (r["checked_entries"], r["total_entries"]) == (3, 8)
+
+
+def test_changed_checkpoint_block_is_reported(db, vendor):
+    ids = _chain(db, vendor.id, 5)
+    assert verify_chain(db, vendor.id)[0]
+    cp = load_checkpoint(db, vendor.id)
+    assert cp.last_block_id == ids[-1]
+
+    _tamper_hash(db, ids[-1])
+
+    ok, info = verify_chain(db, vendor.id)
+    assert not ok and info == {"bad_block_id": ids[-1]}
+    r = verify_chain_for_vendor(db, vendor.id)
+    assert r["is_valid"] is False
+    assert r["broken_at_id"] == ids[-1]
+    assert r["expected_hash"] == cp.last_hash
+    # the global audit goes through the same function
+    [audited], _ = audit_vendors([vendor.id])
+    assert audited["is_valid"] is False and audited["broken_at_id"] == ids[-1]
+
+
+def test_deleted_checkpoint_block_is_reported(db, vendor):
+    ids = _chain(db, vendor.id, 5)
+    assert verify_chain(db, vendor.id)[0]
+    db.query(ChainEntry).filter(ChainEntry.id == ids[-1]).delete(synchronize_session=False)
+    db.commit()
+
+    r = verify_chain_for_vendor(db, vendor.id)
+    assert r["is_valid"] is False
+    assert r["reason"] == "checkpointed block missing"
+
+
+def test_tamper_after_checkpoint_is_reported(db, vendor):
+    _chain(db, vendor.id, 5)
+    assert verify_chain(db, vendor.id)[0]
+    ids = _chain(db, vendor.id, 3)
+
+    _tamper_hash(db, ids[1])
+
+    r = verify_chain_for_vendor(db, vendor.id)
+    assert r["is_valid"] is False
+    assert r["broken_at_id"] == ids[1]
+
+
+def test_forged_checkpoint_is_ignored(db, vendor):
+    ids = _chain(db, vendor.id, 5)
+    assert verify_chain(db, vendor.id)[0]
+    _tamper_hash(db, ids[2])
+    # moving the checkpoint past the tampered block without re-signing it
+    cp = db.get(ChainCheckpoint, vendor.id)
+    cp.length += 1
+    db.commit()
+
+    assert load_checkpoint(db, vendor.id) is None
+    r = verify_chain_for_vendor(db, vendor.id)
+    assert r["is_valid"] is False
+    assert r["broken_at_id"] == ids[2]
@@ -0,0 +1,120 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+import blockchain
+from blockchain import add_block, inclusion_proof
+from database import shard_sessions
+from merkle import verify_proof
+from models import ChainEntry, ChainProofRoot, Vendor, VendorShard
+from tamper import chain_proof
+
+
+def _chain(db, vendor_id: int, n: int) -> list:
+    ids = [add_block(db, vendor_id, "ADD_SALE", {"vendorId": vendor_id, "id": i, "amount": i}).id for i in range(n)]
+    db.commit()
+    return ids
+
+
+def test_first_proof_after_epoch_fills_is_sealed(db, vendor, monkeypatch):
+    monkeypatch.setattr(blockchain, "CHAIN_PROOF_EPOCH", 4)
+    ids = _chain(db, vendor.id, 11)
+
+    # no roots yet: this request seals epochs 0 and 1 and must answer from them
+    proof = inclusion_proof(db, ids[0])
+    root = db.query(ChainProofRoot).filter_by(vendor_id=vendor.id, epoch=0).one()
+    assert proof["sealed"] is True
+    assert proof["leaf_count"] == 4
+    assert proof["root"] == root.root
+    assert verify_proof(proof["leaf"], proof["proof"], proof["root"])
+
+    # same answer once the roots are committed
+    db.commit()
+    again = inclusion_proof(db, ids[0])
+    assert {k: again[k] for k in ("root", "leaf_count", "sealed", "index")} == \
+        {k: proof[k] for k in ("root", "leaf_count", "sealed", "index")}
+
+
+def test_open_epoch_proof_is_provisional(db, vendor, monkeypatch):
+    monkeypatch.setattr(blockchain, "CHAIN_PROOF_EPOCH", 4)
+    ids = _chain(db, vendor.id, 11)
+
+    proof = inclusion_proof(db, ids[9])
+    assert proof["sealed"] is False
+    assert proof["epoch"] == 2
+    assert proof["leaf_count"] == 3
+    assert verify_proof(proof["leaf"], proof["proof"], proof["root"])
+
+
+def test_edited_payload_breaks_sealed_proof(db, vendor, monkeypatch):
+    monkeypatch.setattr(blockchain, "CHAIN_PROOF_EPOCH", 4)
+    ids = _chain(db, vendor.id, 8)
+    good = inclusion_proof(db, ids[1])
+    db.commit()
+
+    db.query(ChainEntry).filter(ChainEntry.id == ids[2]).update({"payload_hash": "f" * 64}, synchronize_session=False)
+    db.commit()
+
+    # every block of the edited epoch now fails against the published root
+    bad = inclusion_proof(db, ids[1])
+    assert bad["valid"] is False
+    assert bad["root"] == good["root"] and bad["recomputed_root"] != good["root"]
+    # the other epoch is untouched
+    assert verify_proof(**{k: inclusion_proof(db, ids[5])[k] for k in ("leaf", "proof", "root")})
+
+
+def test_forged_leaf_or_path_does_not_verify(db, vendor, monkeypatch):
+    monkeypatch.setattr(blockchain, "CHAIN_PROOF_EPOCH", 4)
+    ids = _chain(db, vendor.id, 4)
+    proof = inclusion_proof(db, ids[2])
+
+    assert not verify_proof("0" * 64, proof["proof"], proof["root"])
+    other = inclusion_proof(db, ids[0])
+    assert not verify_proof(proof["leaf"], other["proof"], proof["root"])
+
+
+def _shard1_vendor(db) -> int:
+    s = shard_sessions[1]()
+    try:
+        v = Vendor(id=2, ownerName="Far", mobile="9000000002", passwordHash="x", businessType="Grocery", city="Pune")
+        s.add(v)
+        s.commit()
+        db.add(VendorShard(vendorId=2, mobile=v.mobile, shard=1, state="active"))
+        db.commit()
+        ids = _chain(s, 2, 3)
+    finally:
+        s.close()
+    return ids
+
+
+def test_proof_route_finds_block_on_its_shard(db, vendor):
+    _chain(db, vendor.id, 3)
+    ids = _shard1_vendor(db)
+
+    proof = chain_proof(ids[1])
+    assert proof["vendor_id"] == 2
+    assert verify_proof(proof["leaf"], proof["proof"], proof["root"])
+    assert chain_proof(ids[1], vendor_id=2)["root"] == proof["root"]
+
+    for block_id, vendor_id in ((ids[1], vendor.id), (10 ** 9, None)):
+        with pytest.raises(HTTPException) as e:
+            chain_proof(block_id, vendor_id=vendor_id)
+        assert e.value.status_code == 404
+
+
+def test_proof_route_refuses_ambiguous_pre_sharding_id(db, vendor):
+    ids = _chain(db, vendor.id, 3)
+    _shard1_vendor(db)
+    # an id from before sharding that exists on both shards
+    s = shard_sessions[1]()
+    try:
+        s.execute(insert(ChainEntry), [{"id": ids[0], "vendor_id": 2, "action": "ADD_SALE",
+                                        "payload_hash": "0" * 64, "prev_hash": "GENESIS", "hash": "0" * 64}])
+        s.commit()
+    finally:
+        s.close()
+
+    with pytest.raises(HTTPException) as e:
+        chain_proof(ids[0])
+    assert e.value.status_code == 409
+    assert chain_proof(ids[0], vendor_id=vendor.id)["vendor_id"] == vendor.id
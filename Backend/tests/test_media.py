@@ -0,0 +1,61 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+import media
+from media import UploadSizeLimit, photo_url, thumb_urls
+
+SHA = "ab" * 32
+
+
+def _client(limit: int):
+    app = FastAPI()
+    seen = []
+
+    @app.post("/upload")
+    def upload(photo: UploadFile = File(...)):
+        seen.append(len(photo.file.read()))
+        return {"ok": True}
+
+    app.add_middleware(UploadSizeLimit, paths=["/upload"], limit=limit)
+    return TestClient(app), seen
+
+
+def test_declared_oversized_body_is_refused_before_the_app():
+    client, seen = _client(1024)
+    r = client.post("/upload", files={"photo": ("a.png", b"x" * 4096, "image/png")})
+    assert r.status_code == 413
+    assert seen == []
+
+
+def test_chunked_oversized_body_is_refused():
+    client, seen = _client(1024)
+
+    def body():
+        for _ in range(8):
+            yield b"x" * 512
+
+    r = client.post("/upload", content=body(), headers={"content-type": "multipart/form-data; boundary=b"})
+    assert r.status_code == 413
+    assert seen == []
+
+
+def test_small_upload_passes():
+    client, seen = _client(1024)
+    r = client.post("/upload", files={"photo": ("a.png", b"x" * 100, "image/png")})
+    assert r.status_code == 200
+    assert seen == [100]
+
+
+def test_thumb_urls(monkeypatch):
+    url = photo_url(SHA, ".png")
+    monkeypatch.setattr(media, "Image", object())
+    monkeypatch.setattr(media, "PHOTO_THUMB_SIZES", [128, 512])
+    assert thumb_urls(url) == {
+        "128": f"/uploads/thumbs/{SHA}_128.png",
+        "512": f"/uploads/thumbs/{SHA}_512.png",
+    }
+    assert thumb_urls("/uploads/vendor_3.png") == {}
+    assert thumb_urls(None) == {}
+    # without Pillow no thumbnails are written, so none are advertised
+    monkeypatch.setattr(media, "Image", None)
+    assert thumb_urls(url) == {}
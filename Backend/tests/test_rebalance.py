@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import insert
+
+from blockchain import payload_digest, verify_chain
+from database import shard_sessions
+from ids import SHARD_ID_STRIDE
+from models import ChainEntry, Credit, Customer, IdRemap, Sale, Vendor, VendorShard
+from rebalance import move_vendor
+from routes import add_credit_tx, add_customer_tx, add_sale_tx
+from schemas import CreditCreate, CustomerCreate, SaleCreate
+from shards import directory, shard_for
+
+
+@pytest.fixture
+def home_vendor(db, vendor):
+    db.add(VendorShard(vendorId=vendor.id, mobile=vendor.mobile, shard=0, state="active"))
+    db.commit()
+    return vendor
+
+
+@pytest.fixture
+def target():
+    s = shard_sessions[1]()
+    yield s
+    s.close()
+
+
+def _ledger(db, vendor_id: int):
+    c = add_customer_tx(db, vendor_id, CustomerCreate(name="Asha"))
+    cr = add_credit_tx(db, vendor_id, CreditCreate(customerId=c["id"], amount=50.0, dueDate="2026-02-01"))
+    s = add_sale_tx(db, vendor_id, SaleCreate(date="2026-01-05", mode="cash", amount=20.0))
+    db.commit()
+    return c, cr, s
+
+
+def test_move_keeps_ids(db, home_vendor, target):
+    c, cr, s = _ledger(db, home_vendor.id)
+    assert c["id"] % SHARD_ID_STRIDE == 0
+    assert verify_chain(db, home_vendor.id)[0]
+
+    r = move_vendor(home_vendor.id, 1, wait=0)
+    assert r["moved"] and r["renumbered"] == {}
+    assert shard_for(home_vendor.id) == 1
+
+    assert target.get(Customer, c["id"]).name == "Asha"
+    assert target.get(Credit, cr["id"]).customerId == c["id"]
+    assert target.get(Sale, s["id"]).amount == 20.0
+    assert verify_chain(target, home_vendor.id, full=True)[0]
+    assert db.query(Customer).filter(Customer.vendorId == home_vendor.id).count() == 0
+
+    # rows added after the move sort after the copied ones and carry the target's tag
+    c2 = add_customer_tx(target, home_vendor.id, CustomerCreate(name="Ravi"))
+    target.commit()
+    assert c2["id"] > c["id"] and c2["id"] % SHARD_ID_STRIDE == 1
+    assert verify_chain(target, home_vendor.id)[0]
+
+
+def test_taken_ids_are_renumbered_and_recorded_on_the_chain(db, home_vendor, target):
+    c, cr, _ = _ledger(db, home_vendor.id)
+    first_block = db.query(ChainEntry.id).filter(ChainEntry.vendor_id == home_vendor.id).order_by(ChainEntry.id).first()[0]
+    # rows from before sharding on the target that happen to use the same ids
+    target.add(Vendor(id=99, ownerName="Old", mobile="9111111111", passwordHash="x", businessType="Other", city="X"))
+    target.flush()
+    target.execute(insert(Customer), [{"id": c["id"], "vendorId": 99, "name": "Old customer"}])
+    target.execute(insert(ChainEntry), [{"id": first_block, "vendor_id": 99, "action": "ADD_SALE",
+                                         "payload_hash": "0" * 64, "prev_hash": "GENESIS", "hash": "0" * 64}])
+    target.commit()
+
+    r = move_vendor(home_vendor.id, 1, wait=0)
+    assert r["renumbered"] == {"customers": 1, "chain_entries": r["blocks"]}
+
+    new_customer = target.query(Customer).filter(Customer.vendorId == home_vendor.id).one()
+    assert new_customer.id != c["id"]
+    assert target.get(Customer, c["id"]).vendorId == 99
+    assert target.get(Credit, cr["id"]).customerId == new_customer.id
+    assert verify_chain(target, home_vendor.id, full=True)[0]
+
+    # the REBALANCE block commits to the map kept in id_remaps
+    block = target.query(ChainEntry).filter(ChainEntry.vendor_id == home_vendor.id).order_by(ChainEntry.id.desc()).first()
+    assert block.action == "REBALANCE"
+    pairs = defaultdict(list)
+    for m in target.query(IdRemap).filter(IdRemap.vendorId == home_vendor.id).order_by(IdRemap.oldId):
+        assert m.blockId == block.id
+        pairs[m.tableName].append([m.oldId, m.newId])
+    assert pairs["customers"] == [[c["id"], new_customer.id]]
+    payload = {"vendorId": home_vendor.id, "fromShard": 0, "toShard": 1, "ids": dict(pairs)}
+    assert payload_digest(payload) == block.payload_hash
+
+
+def test_move_of_a_tampered_chain_is_refused(db, home_vendor, target):
+    _ledger(db, home_vendor.id)
+    block = db.query(ChainEntry).filter(ChainEntry.vendor_id == home_vendor.id).order_by(ChainEntry.id).first()
+    block.action = "DELETE_SALE"
+    db.commit()
+
+    with pytest.raises(ValueError, match="does not verify"):
+        move_vendor(home_vendor.id, 1, wait=0)
+    directory.invalidate()
+    assert shard_for(home_vendor.id) == 0
+    assert db.get(VendorShard, home_vendor.id).state == "active"
+    assert target.get(Vendor, home_vendor.id) is None
+    assert db.query(Customer).filter(Customer.vendorId == home_vendor.id).count() == 1
@@ -0,0 +1,83 @@
+import math
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+from crud import create_sale, revenue_week_values
+from models import RevenueStats
+from stability import stability_features, week_index, week_start
+from config import STABILITY_WINDOW_WEEKS, STABILITY_MIN_WEEKS
+
+START = date(2026, 1, 5)  # a Monday
+
+
+def _brute_force(sales: list, today: date, window: int = STABILITY_WINDOW_WEEKS):
+    # complete weeks of the `window` weeks up to today's, from the first sale's week on
+    weekly, days = defaultdict(float), defaultdict(set)
+    for day, amount in sales:
+        weekly[week_index(day)] += amount
+        days[week_index(day)].add(day)
+    first_day = min(d for d, _ in sales)
+    current = week_index(today.isoformat())
+    lo, hi = max(week_index(first_day), current - window + 1), current - 1
+    weeks = list(range(lo, hi + 1))
+    if len(weeks) < STABILITY_MIN_WEEKS:
+        return None
+    ys = [weekly.get(w, 0.0) for w in weeks]
+    n = len(ys)
+    mean = sum(ys) / n
+    std = math.sqrt(sum((y - mean) ** 2 for y in ys) / (n - 1))
+    mx = sum(weeks) / n
+    slope = sum((x - mx) * (y - mean) for x, y in zip(weeks, ys)) / sum((x - mx) ** 2 for x in weeks)
+    span = n * 7
+    if lo == week_index(first_day):
+        span -= (date.fromisoformat(first_day) - date.fromisoformat(week_start(lo))).days
+    return {
+        "weeks": n,
+        "weeklyMean": mean,
+        "weeklyStd": std,
+        "activeDayRatio": min(1.0, sum(len(days[w]) for w in weeks) / span),
+        "growth": slope / mean if mean > 0 else 0.0,
+    }
+
+
+def _assert_close(got: dict, want: dict):
+    assert got["weeks"] == want["weeks"]
+    for k in ("weeklyMean", "weeklyStd", "activeDayRatio", "growth"):
+        assert got[k] == pytest.approx(want[k], abs=0.011), k
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_features_match_brute_force_window(db, vendor, seed):
+    rng = random.Random(seed)
+    sales = []
+    for _ in range(120):
+        day = (START + timedelta(days=rng.randrange(20 * 7))).isoformat()
+        sales.append((day, float(rng.randrange(10, 500))))
+    # out of order on purpose: earlier weeks land after the window already slid
+    for day, amount in sales:
+        create_sale(db, vendor.id, day, "cash", amount)
+    db.commit()
+    st = db.get(RevenueStats, vendor.id)
+    last = max(date.fromisoformat(d) for d, _ in sales)
+
+    # active this week, last sale last week, idle for a few weeks, for 11 weeks, for longer than the window
+    for idle_weeks in (0, 1, 3, 11, 12, 13, 30):
+        today = last + timedelta(weeks=idle_weeks)
+        got = stability_features(st, revenue_week_values(db, vendor.id), today=today)
+        want = _brute_force(sales, today)
+        assert (got is None) == (want is None), idle_weeks
+        if want is not None:
+            _assert_close(got, want)
+
+
+def test_idle_vendor_window_stays_bounded(db, vendor):
+    for w in range(14):
+        create_sale(db, vendor.id, (START + timedelta(weeks=w)).isoformat(), "cash", 100.0 + w)
+    db.commit()
+    st = db.get(RevenueStats, vendor.id)
+    today = START + timedelta(weeks=13 + 11)
+    got = stability_features(st, revenue_week_values(db, vendor.id), today=today)
+    assert got["weeks"] == STABILITY_WINDOW_WEEKS - 1
@@ -1,8 +1,14 @@
+import hashlib
 import json
-from typing import Dict, Tuple
+import threading
+import time
+from typing import Dict, List, Tuple
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from models import TrustPolicy, Credit, Sale
+from models import TrustPolicy, VendorStats, RevenueStats
+from crud import rebuild_vendor_stats, rebuild_sales_daily, revenue_week_values
+from stability import stability_features, stability_score
+from config import POLICY_REFRESH_SECONDS
 
 DEFAULT_POLICIES = {
     "Kirana / Grocery": {"min": 35, "max": 95, "w": {"repay": 0.50, "stability": 0.30, "debt": 0.20}},
@@ -14,17 +20,77 @@ DEFAULT_POLICIES = {
 }
 
 def ensure_default_policies(db: Session):
-    for bt, cfg in DEFAULT_POLICIES.items():
-        row = db.query(TrustPolicy).filter(TrustPolicy.businessType == bt).first()
-        if not row:
-            row = TrustPolicy(
-                businessType=bt,
-                minScore=cfg["min"],
-                maxScore=cfg["max"],
-                weightsJson=json.dumps(cfg["w"])
-            )
-            db.add(row)
-    db.commit()
+    existing = {bt for (bt,) in db.query(TrustPolicy.businessType).all()}
+    missing = [bt for bt in DEFAULT_POLICIES if bt not in existing]
+    for bt in missing:
+        cfg = DEFAULT_POLICIES[bt]
+        db.add(TrustPolicy(
+            businessType=bt,
+            minScore=cfg["min"],
+            maxScore=cfg["max"],
+            weightsJson=json.dumps(cfg["w"])
+        ))
+    if missing:
+        db.commit()
+
+def _policy_from_row(row: TrustPolicy) -> dict:
+    try:
+        weights = json.loads(row.weightsJson or "{}")
+    except Exception:
+        weights = {}
+    return {
+        "min": int(row.minScore or 30),
+        "max": int(row.maxScore or 95),
+        "w": {
+            "repay": float(weights.get("repay", 0.55)),
+            "stability": float(weights.get("stability", 0.25)),
+            "debt": float(weights.get("debt", 0.20)),
+        },
+    }
+
+class PolicyRegistry:
+    """
+    TrustPolicy rows kept in memory. Reloaded after POLICY_REFRESH_SECONDS, or at once
+    when a TrustPolicy is inserted/updated/deleted through this process.
+    """
+
+    def __init__(self, ttl: int = POLICY_REFRESH_SECONDS):
+        self.ttl = ttl
+        self._policies = None
+        self._fingerprint = ""
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self, *_):
+        self._policies = None
+
+    def all(self, db: Session) -> Dict[str, dict]:
+        policies = self._policies
+        if policies is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return policies
+        with self._lock:
+            if self._policies is None or time.monotonic() - self._loaded_at >= self.ttl:
+                ensure_default_policies(db)
+                self._policies = {r.businessType: _policy_from_row(r) for r in db.query(TrustPolicy).all()}
+                self._fingerprint = hashlib.sha256(json.dumps(self._policies, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+                self._loaded_at = time.monotonic()
+            return self._policies
+
+    def fingerprint(self, db: Session) -> str:
+        # content hash of the loaded policies (same in every process); part of trust score ETags
+        self.all(db)
+        return self._fingerprint
+
+    def get(self, db: Session, business_type: str) -> dict:
+        policies = self.all(db)
+        return policies.get(business_type) or policies.get("Other") or {
+            "min": 30, "max": 95, "w": {"repay": 0.55, "stability": 0.25, "debt": 0.20}
+        }
+
+policy_registry = PolicyRegistry()
+
+for _evt in ("after_insert", "after_update", "after_delete"):
+    event.listen(TrustPolicy, _evt, policy_registry.invalidate)
 
 def _clamp(x: int, lo: int, hi: int) -> int:
     return max(lo, min(hi, x))
@@ -38,53 +104,84 @@ def _tag(score: int) -> str:
         return "Average"
     return "Risky"
 
-def compute_trust_score(db: Session, vendor_id: int, business_type: str) -> Tuple[int, str, Dict[str, int]]:
-    ensure_default_policies(db)
-
-    policy = db.query(TrustPolicy).filter(TrustPolicy.businessType == business_type).first()
-    if not policy:
-        policy = db.query(TrustPolicy).filter(TrustPolicy.businessType == "Other").first()
-
-    try:
-        weights = json.loads(policy.weightsJson or "{}")
-    except Exception:
-        weights = {}
-
-    w_repay = float(weights.get("repay", 0.55))
-    w_stability = float(weights.get("stability", 0.25))
-    w_debt = float(weights.get("debt", 0.20))
-
-    total_credits = db.query(func.count(Credit.id)).filter(Credit.vendorId == vendor_id).scalar() or 0
-    paid_credits = db.query(func.count(Credit.id)).filter(Credit.vendorId == vendor_id, Credit.status == "paid").scalar() or 0
-
-    repayment_rate = 0
-    if total_credits > 0:
-        repayment_rate = int(round((paid_credits / total_credits) * 100))
-
-    pending_amount = db.query(func.coalesce(func.sum(Credit.amount), 0.0)).filter(
-        Credit.vendorId == vendor_id, Credit.status != "paid"
-    ).scalar() or 0.0
-
-    debt_ratio = int(round(min(100.0, pending_amount / 100.0)))
-
-    last_sales = db.query(Sale.id).filter(Sale.vendorId == vendor_id).order_by(Sale.id.desc()).limit(10).all()
-    last_sales_count = len(last_sales)
-
-    stability = int(round(min(95.0, 40.0 + (last_sales_count * 5.0))))
-
-    raw = int(round(
-        (repayment_rate * w_repay) +
-        (stability * w_stability) +
-        ((100 - debt_ratio) * w_debt)
-    ))
+def feature_columns(credit_count, paid_count, pending, sale_count, revenue=None, week_values=None) -> Dict[str, list]:
+    """
+    Column-wise features from vendor_stats aggregates (one list entry per vendor).
+    revenue: revenue_stats rows (or None entries) for the weekly-revenue stability signal,
+    with week_values: each vendor's sales_daily lookup (crud.revenue_week_values).
+    """
+    revenue = revenue if revenue is not None else [None] * len(sale_count)
+    week_values = week_values if week_values is not None else [None] * len(revenue)
+    return {
+        "repayment_rate": [int(round((p / c) * 100)) if c else 0 for c, p in zip(credit_count, paid_count)],
+        "pending_amount": [float(x or 0.0) for x in pending],
+        "stability": [stability_score(stability_features(r, wv), n)
+                      for r, wv, n in zip(revenue, week_values, sale_count)],
+    }
 
-    score = _clamp(raw, int(policy.minScore or 30), int(policy.maxScore or 95))
-    tag = _tag(score)
+def score_columns(features: Dict[str, list], policies: List[dict]) -> Dict[str, list]:
+    """
+    Vectorised weighting -> clamping -> tagging. `policies[i]` applies to vendor i.
+    """
+    repay = features["repayment_rate"]
+    debt = [int(round(min(100.0, x / 100.0))) for x in features["pending_amount"]]
+    stability = features["stability"]
+
+    raw = [
+        int(round((r * p["w"]["repay"]) + (st * p["w"]["stability"]) + ((100 - d) * p["w"]["debt"])))
+        for r, st, d, p in zip(repay, stability, debt, policies)
+    ]
+    scores = [_clamp(x, p["min"], p["max"]) for x, p in zip(raw, policies)]
+
+    return {
+        "score": scores,
+        "tag": [_tag(x) for x in scores],
+        "repaymentRate": [_clamp(x, 0, 100) for x in repay],
+        "revenueStability": [_clamp(x, 0, 100) for x in stability],
+        "pendingDebtRatio": [_clamp(x, 0, 100) for x in debt],
+    }
 
+def _revenue_stats(db: Session, vendor_id: int):
+    rs = db.get(RevenueStats, vendor_id)
+    if not rs:
+        rebuild_sales_daily(db, [vendor_id])
+        db.commit()
+        rs = db.get(RevenueStats, vendor_id)
+    return rs
+
+def extract_features(db: Session, vendor_id: int) -> Dict[str, float]:
+    """
+    Repayment rate, pending amount and revenue stability from the vendor_stats and
+    revenue_stats rows -> two primary-key lookups, independent of history length.
+    """
+    st = db.get(VendorStats, vendor_id)
+    if not st:
+        rebuild_vendor_stats(db, [vendor_id])
+        db.commit()
+        st = db.get(VendorStats, vendor_id)
+
+    cols = feature_columns([st.creditCount or 0], [st.paidCount or 0], [st.pendingUdhaar], [st.saleCount],
+                           [_revenue_stats(db, vendor_id)], [revenue_week_values(db, vendor_id)])
+    return {k: v[0] for k, v in cols.items()}
+
+def score_features(features: Dict[str, float], policy: dict) -> Tuple[int, str, Dict[str, int]]:
+    cols = score_columns({k: [v] for k, v in features.items()}, [policy])
     breakup = {
-        "repaymentRate": int(_clamp(repayment_rate, 0, 100)),
-        "revenueStability": int(_clamp(stability, 0, 100)),
-        "pendingDebtRatio": int(_clamp(debt_ratio, 0, 100)),
+        "repaymentRate": cols["repaymentRate"][0],
+        "revenueStability": cols["revenueStability"][0],
+        "pendingDebtRatio": cols["pendingDebtRatio"][0],
+    }
+    return cols["score"][0], cols["tag"][0], breakup
+
+def stability_details(db: Session, vendor_id: int) -> dict:
+    st = db.get(VendorStats, vendor_id)
+    features = stability_features(_revenue_stats(db, vendor_id), revenue_week_values(db, vendor_id))
+    return {
+        "revenueStability": stability_score(features, st.saleCount if st else 0),
+        "source": "weekly_revenue" if features else "sales_count",
+        "features": features,
     }
 
-    return score, tag, breakup
\ No newline at end of file
+def compute_trust_score(db: Session, vendor_id: int, business_type: str) -> Tuple[int, str, Dict[str, int]]:
+    policy = policy_registry.get(db, business_type)
+    return score_features(extract_features(db, vendor_id), policy)
@@ -0,0 +1,57 @@
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import Vendor, VendorVersion
+
+# Per-vendor data version: a counter that goes up whenever a transaction changes
+# anything the vendor's read endpoints return. One UPDATE per vendor and transaction,
+# however many writes the transaction does (bulk jobs, group-committed batches).
+
+_BUMPED = "bumped_versions"
+
+
+def bump_data_version(db: Session, vendor_id: int):
+    bumped = db.info.setdefault(_BUMPED, set())
+    if vendor_id in bumped:
+        return
+    bumped.add(vendor_id)
+    n = db.execute(
+        update(VendorVersion).where(VendorVersion.vendorId == vendor_id).values(version=VendorVersion.version + 1),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    if not n:
+        db.execute(insert(VendorVersion).values(vendorId=vendor_id, version=1))
+
+
+def bump_data_versions(db: Session, vendor_ids=None):
+    """
+    Bulk variant for rebuilds; vendor_ids=None bumps every vendor.
+    """
+    if vendor_ids is not None:
+        for vid in vendor_ids:
+            bump_data_version(db, vid)
+        return
+    db.execute(update(VendorVersion).values(version=VendorVersion.version + 1),
+               execution_options={"synchronize_session": False})
+    missing = select(Vendor.id, 1).where(~select(VendorVersion.vendorId).where(VendorVersion.vendorId == Vendor.id).exists())
+    db.execute(insert(VendorVersion).from_select(["vendorId", "version"], missing))
+
+
+def _version_stmt(vendor_id: int):
+    return select(VendorVersion.version).where(VendorVersion.vendorId == vendor_id)
+
+
+def data_version(db: Session, vendor_id: int) -> int:
+    return db.execute(_version_stmt(vendor_id)).scalar() or 0
+
+
+async def data_version_async(db, vendor_id: int) -> int:
+    return (await db.execute(_version_stmt(vendor_id))).scalar() or 0
+
+
+def _reset(session, *_):
+    session.info.pop(_BUMPED, None)
+
+
+for _evt in ("after_commit", "after_rollback", "after_soft_rollback"):
+    event.listen(Session, _evt, _reset)